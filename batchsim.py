@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  batchsim.py
+#
+# NOTE!:
+# pip3 install numpy
+#
+# steps N independent pong matches at once.
+#
+# BatchSimulation follows exactly the same rules as simulation.Simulation
+# but every match lives in a row of a set of numpy arrays, so one call to
+# step() advances all of them. Use it for evaluating opponent policies
+# over many rallies, where stepping one Simulation at a time is too slow.
+#
+# inputs are given as an array of INPUT_ bitmasks, one per match. The
+# flag arrays (player_hit, wall_bounce, player_scored etc) say which
+# matches had that event during the last step.
+
+import numpy as np
+from noiseengine import NoiseEngine1D, BACKEND_AUTO
+from sweptcollision import MAX_BOUNCES
+from simulation import (Simulation, GAME_STATE_INTRO, GAME_STATE_IN_PROGRESS,
+                        GAME_STATE_SCORED, GAME_STATE_OVER, SCREEN_WIDTH,
+                        SCREEN_HEIGHT, INPUT_UP, INPUT_DOWN, INPUT_SERVE,
+                        WINNING_SCORE, SCORED_PAUSE_FRAMES)
+
+X = 0
+Y = 1
+
+# what each ball touched first in moveBalls
+HIT_NONE     = 0
+HIT_WALL     = 1
+HIT_PLAYER   = 2
+HIT_OPPONENT = 3
+
+#=======================================================================
+# BatchSimulation class
+#=======================================================================
+
+class BatchSimulation():
+
+    def __init__(self, count, seed=None, noise_backend=BACKEND_AUTO):
+
+        self.count = count
+        self.random = np.random.default_rng(seed)
+
+        # take the sizes, speeds and limits from a single simulation so
+        # the two can never drift apart
+        template = Simulation(0, noise_backend=noise_backend)
+        self.ball_size = template.ball.width
+        self.ball_mass = template.ball.mass
+        self.ball_start = (template.ball.position.x, template.ball.position.y)
+        self.bat_width = template.player.width
+        self.bat_height = template.player.height
+        self.bat_acceleration_step = template.player.acceleration_step
+        self.bat_max_y = template.player.maxposition_y
+        self.bat_start_y = template.player.start_position.y
+        self.player_x = template.player.start_position.x
+        self.opponent_x = template.opponent.start_position.x
+        self.player_maxspeed = template.player.maxspeedy
+        self.opponent_maxspeed = template.opponent.maxspeedy
+        self.ball_max_speed_x = template.ball_max_speed_x
+        self.ball_max_speed_y = template.ball_max_speed_y
+        self.ball_speed_step = template.ball_speed_step
+        self.wind_strength = template.wind_strength
+        # the batch always runs at the base tick rate
+        self.dt = template.dt
+
+        n = count
+        self.ball_position = np.empty((n, 2))
+        self.ball_position[:, X] = self.ball_start[X]
+        self.ball_position[:, Y] = self.ball_start[Y]
+        self.ball_velocity = np.zeros((n, 2))
+        self.ball_velocity[:, X] = -5.0
+        self.wind = np.zeros((n, 2))
+        self.player_y = np.full(n, self.bat_start_y, dtype=float)
+        self.player_previous_y = np.full(n, self.bat_start_y, dtype=float)
+        self.player_vy = np.zeros(n)
+        self.player_ay = np.zeros(n)
+        self.opponent_y = np.full(n, self.bat_start_y, dtype=float)
+        self.opponent_previous_y = np.full(n, self.bat_start_y, dtype=float)
+        self.opponent_vy = np.zeros(n)
+        self.opponent_ay = np.zeros(n)
+        self.player_score = np.zeros(n, dtype=np.int32)
+        self.opponent_score = np.zeros(n, dtype=np.int32)
+        self.gamestate = np.full(n, GAME_STATE_INTRO, dtype=np.int8)
+        self.scored_frames_elapsed = np.zeros(n, dtype=np.int32)
+        self.playerserve = np.ones(n, dtype=bool)
+        self.frame = 0
+
+        # one wind stream per match, just like a single Simulation
+        seeds = self.random.integers(1, 101, size=n)
+        self.noiseengines = [NoiseEngine1D(int(s), noise_backend) for s in seeds]
+
+        self.clearEvents()
+
+    def clearEvents(self):
+
+        n = self.count
+        self.wall_bounce = np.zeros(n, dtype=bool)
+        self.player_hit = np.zeros(n, dtype=bool)
+        self.opponent_hit = np.zeros(n, dtype=bool)
+        self.player_scored = np.zeros(n, dtype=bool)
+        self.opponent_scored = np.zeros(n, dtype=bool)
+        self.served = np.zeros(n, dtype=bool)
+
+    def resetPositions(self, mask):
+
+        # called at each serve for the matches in mask
+        count = int(np.count_nonzero(mask))
+        if count == 0:
+            return
+        bally = self.random.integers(-1, 2, size=count)
+        ballx = np.where(self.playerserve[mask], -4.0, 4.0)
+
+        self.ball_position[mask, X] = self.ball_start[X]
+        self.ball_position[mask, Y] = self.ball_start[Y]
+        self.ball_velocity[mask, X] = ballx
+        self.ball_velocity[mask, Y] = bally
+        self.player_y[mask] = self.bat_start_y
+        self.player_previous_y[mask] = self.bat_start_y
+        self.player_vy[mask] = 0
+        self.player_ay[mask] = 0
+        self.opponent_y[mask] = self.bat_start_y
+        self.opponent_previous_y[mask] = self.bat_start_y
+        self.opponent_vy[mask] = 0
+        self.opponent_ay[mask] = 0
+        self.wind[mask] = 0
+        self.served |= mask
+
+    def resetMatches(self, mask):
+
+        # start new matches straight away for everything in mask, as if
+        # the game over screen and the intro had both been served
+        self.player_score[mask] = 0
+        self.opponent_score[mask] = 0
+        self.scored_frames_elapsed[mask] = 0
+        self.gamestate[mask] = GAME_STATE_IN_PROGRESS
+        self.resetPositions(mask)
+
+    def switchGameState(self, mask):
+
+        intro = mask & (self.gamestate == GAME_STATE_INTRO)
+        over = mask & (self.gamestate == GAME_STATE_OVER)
+
+        self.gamestate[intro] = GAME_STATE_IN_PROGRESS
+        self.resetPositions(intro)
+
+        self.player_score[over] = 0
+        self.opponent_score[over] = 0
+        self.resetPositions(over)
+        self.gamestate[over] = GAME_STATE_INTRO
+
+    def setWind(self, mask):
+
+        # wind only changes on a bat hit so looping over just the
+        # matches that had one is cheap
+        strength = self.wind_strength
+        for i in np.flatnonzero(mask):
+            engine = self.noiseengines[i]
+            self.wind[i, X] = engine.next(100) * (strength / 4)
+            self.wind[i, Y] = engine.next() * strength
+
+    def batHit(self, mask):
+
+        self.setWind(mask)
+
+        vx = self.ball_velocity[:, X]
+        vy = self.ball_velocity[:, Y]
+        speedup = mask & (vx < self.ball_max_speed_x)
+        cap = mask & ~(vx < self.ball_max_speed_x)
+        vx[speedup] *= self.ball_speed_step
+        vx[cap] = self.ball_max_speed_x
+        vy[mask & (vy > self.ball_max_speed_y)] = self.ball_max_speed_y
+
+    def sweepAxis(self, a, asize, d, b, bsize):
+
+        # sweptcollision.sweepAxis for every match at once
+        with np.errstate(divide='ignore', invalid='ignore'):
+            near = (b - (a + asize)) / d
+            far = (b + bsize - a) / d
+        entry = np.where(d > 0, near, far)
+        exit = np.where(d > 0, far, near)
+
+        still = d == 0
+        apart = (a + asize <= b) | (a >= b + bsize)
+        entry = np.where(still, np.where(apart, np.inf, -np.inf), entry)
+        exit = np.where(still, np.where(apart, -np.inf, np.inf), exit)
+        return entry, exit
+
+    def sweepBat(self, bat_x, previous_y, y, dx, dy, elapsed, remaining, towards):
+
+        # Simulation.sweepBat for every match at once. returns the time
+        # of contact (inf for no contact) and the axis of contact
+        bat_move = y - previous_y
+        bat_y = previous_y + bat_move * elapsed
+
+        x_entry, x_exit = self.sweepAxis(self.ball_position[:, X], self.ball_size, dx, bat_x, self.bat_width)
+        y_entry, y_exit = self.sweepAxis(self.ball_position[:, Y], self.ball_size, dy - bat_move * remaining,
+                                         bat_y, self.bat_height)
+        entry = np.maximum(x_entry, y_entry)
+        exit = np.minimum(x_exit, y_exit)
+        touch = (entry <= exit) & (entry < 1) & (exit > 0)
+        axis = np.where(x_entry > y_entry, 0, 1)
+
+        # already overlapping counts as a hit on the face if the ball
+        # is heading into the bat
+        overlap = touch & (entry < 0)
+        touch &= ~overlap | towards
+        entry = np.where(overlap, 0.0, entry)
+        axis = np.where(overlap, 0, axis)
+
+        return np.where(touch, entry, np.inf), axis
+
+    def sweepWalls(self, dy):
+
+        # sweptcollision.sweepWalls for every match at once
+        y = self.ball_position[:, Y]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            top = (0 - y) / dy
+            bottom = (SCREEN_HEIGHT - (y + self.ball_size)) / dy
+        t = np.where(dy < 0, top, np.where(dy > 0, bottom, np.inf))
+        return np.where(t < 1, np.maximum(t, 0.0), np.inf)
+
+    def bounceOffWall(self, mask):
+
+        y = self.ball_position[:, Y]
+        vy = self.ball_velocity[:, Y]
+        y[mask & (vy < 0)] = 0
+        y[mask & ~(vy < 0)] = SCREEN_HEIGHT - self.ball_size
+        vy[mask] = -vy[mask]
+        self.wall_bounce |= mask
+
+    def bounceOffBat(self, mask, axis, bat_x, previous_y, y, elapsed, face_x):
+
+        ball_y = self.ball_position[:, Y]
+        vy = self.ball_velocity[:, Y]
+        bat_y = previous_y + (y - previous_y) * elapsed
+
+        # glanced off the top or bottom end of the bat
+        glance = mask & (axis == 1)
+        above = glance & (ball_y < bat_y)
+        below = glance & ~(ball_y < bat_y)
+        ball_y[above] = bat_y[above] - self.ball_size
+        ball_y[below] = bat_y[below] + self.bat_height
+        vy[glance] = -vy[glance]
+
+        # reflectAngle for the ones that hit the face
+        face = mask & (axis == 0)
+        vy[face] = ((ball_y[face] - bat_y[face]) / self.bat_height + -0.5) * 8
+        self.ball_velocity[face, X] = -self.ball_velocity[face, X]
+        self.ball_position[face, X] = face_x
+        self.batHit(face)
+        return face
+
+    def moveBalls(self, active):
+
+        # Simulation.moveBall for every match at once, each round of the
+        # loop handles the next bounce of every ball that has one
+        moving = active.copy()
+        remaining = np.ones(self.count)
+        vx = self.ball_velocity[:, X]
+        vy = self.ball_velocity[:, Y]
+
+        for bounce in range(MAX_BOUNCES):
+
+            if not moving.any():
+                break
+
+            dx = vx * self.dt * remaining
+            dy = vy * self.dt * remaining
+            elapsed = 1.0 - remaining
+
+            first = self.sweepWalls(dy)
+            hit = np.where(np.isfinite(first), HIT_WALL, HIT_NONE)
+            axis = np.ones(self.count, dtype=int)
+
+            t, a = self.sweepBat(self.player_x, self.player_previous_y, self.player_y,
+                                 dx, dy, elapsed, remaining, vx < 0)
+            closer = t < first
+            first = np.where(closer, t, first)
+            hit[closer] = HIT_PLAYER
+            axis[closer] = a[closer]
+
+            t, a = self.sweepBat(self.opponent_x, self.opponent_previous_y, self.opponent_y,
+                                 dx, dy, elapsed, remaining, vx > 0)
+            closer = t < first
+            first = np.where(closer, t, first)
+            hit[closer] = HIT_OPPONENT
+            axis[closer] = a[closer]
+
+            hit[~moving] = HIT_NONE
+            free = moving & (hit == HIT_NONE)
+            self.ball_position[free, X] += dx[free]
+            self.ball_position[free, Y] += dy[free]
+            moving &= ~free
+
+            self.ball_position[moving, X] += dx[moving] * first[moving]
+            self.ball_position[moving, Y] += dy[moving] * first[moving]
+            remaining[moving] *= 1.0 - first[moving]
+            elapsed = 1.0 - remaining
+
+            self.bounceOffWall(hit == HIT_WALL)
+            self.player_hit |= self.bounceOffBat(hit == HIT_PLAYER, axis, self.player_x, self.player_previous_y,
+                                                 self.player_y, elapsed, self.player_x + self.bat_width)
+            self.opponent_hit |= self.bounceOffBat(hit == HIT_OPPONENT, axis, self.opponent_x, self.opponent_previous_y,
+                                                   self.opponent_y, elapsed, self.opponent_x - self.ball_size)
+
+    def moveOpponent(self, active):
+
+        target = self.ball_position[:, Y] - self.bat_height // 2
+        down = active & (self.opponent_y < target)
+        up = active & (self.opponent_y > target)
+        self.opponent_ay[down] += self.bat_acceleration_step
+        self.opponent_ay[up] -= self.bat_acceleration_step
+
+    def checkBallInScorePosition(self, active):
+
+        x = self.ball_position[:, X]
+        opponent = active & (x < 0)
+        player = active & ~opponent & (x > SCREEN_WIDTH)
+        self.opponent_score[opponent] += 1
+        self.player_score[player] += 1
+        self.gamestate[opponent | player] = GAME_STATE_SCORED
+        self.opponent_scored |= opponent
+        self.player_scored |= player
+
+    def updateBats(self, active, y, vy, ay, maxspeed):
+
+        vy[active] += ay[active]
+        np.clip(vy, -maxspeed, maxspeed, out=vy, where=active)
+        y[active] += vy[active] * self.dt
+        ay[active] = 0
+
+        # constrain movement to screen bounds
+        low = active & (y < 0)
+        high = active & (y > self.bat_max_y)
+        y[low] = 0
+        y[high] = self.bat_max_y
+        vy[low | high] = 0
+
+    def updateScored(self, scored):
+
+        self.scored_frames_elapsed[scored] += 1
+        done = scored & (self.scored_frames_elapsed > SCORED_PAUSE_FRAMES)
+        self.scored_frames_elapsed[done] = 0
+        self.playerserve[done] = ~self.playerserve[done]
+        self.resetPositions(done)
+
+        won = (self.player_score == WINNING_SCORE) | (self.opponent_score == WINNING_SCORE)
+        self.gamestate[done & won] = GAME_STATE_OVER
+        self.gamestate[done & ~won] = GAME_STATE_IN_PROGRESS
+
+    def step(self, inputs=None, opponent_inputs=None):
+
+        # advance every match by one frame. opponent_inputs replaces
+        # the built in opponent with up/down bits for each match
+        self.clearEvents()
+        self.frame += 1
+        self.player_previous_y[:] = self.player_y
+        self.opponent_previous_y[:] = self.opponent_y
+
+        if inputs is not None:
+            inputs = np.asarray(inputs)
+            self.switchGameState((inputs & INPUT_SERVE) != 0)
+            self.player_ay[(inputs & INPUT_UP) != 0] -= self.bat_acceleration_step
+            self.player_ay[(inputs & INPUT_DOWN) != 0] += self.bat_acceleration_step
+
+        active = self.gamestate == GAME_STATE_IN_PROGRESS
+        scored = self.gamestate == GAME_STATE_SCORED
+
+        # the bats move first so that the balls can be swept
+        # against where they go during the tick
+        if opponent_inputs is None:
+            self.moveOpponent(active)
+        else:
+            opponent_inputs = np.asarray(opponent_inputs)
+            self.opponent_ay[active & ((opponent_inputs & INPUT_UP) != 0)] -= self.bat_acceleration_step
+            self.opponent_ay[active & ((opponent_inputs & INPUT_DOWN) != 0)] += self.bat_acceleration_step
+
+        self.updateBats(active, self.player_y, self.player_vy, self.player_ay, self.player_maxspeed)
+        self.updateBats(active, self.opponent_y, self.opponent_vy, self.opponent_ay, self.opponent_maxspeed)
+
+        # ball.applyForce(wind) then ball.update()
+        self.ball_velocity[active] += self.wind[active] / self.ball_mass * self.dt
+        self.moveBalls(active)
+
+        self.checkBallInScorePosition(active)
+
+        self.updateScored(scored)
+
+    def isOver(self):
+
+        return self.gamestate == GAME_STATE_OVER
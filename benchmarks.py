@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  benchmarks.py
+#
+# NOTE!:
+# pip3 install numpy pygame
+#
+# times the parts of the game that matter for frame rate, headless.
+#
+# simulation    ticks a second of the headless rules, and of Game.tick
+#               with the effects, sounds muted
+# particles     particlesystemController update and draw with 100, 1000
+#               and 10000 particals alive
+# starfield     StarField update and draw at a few star counts
+# trail         Balltrail update and draw
+# render        a whole frame (background, draw and flip) in each
+#               gamestate, with both renderers
+# startup       how long a fresh python takes to import pong.py, which
+#               loads every image and sound and builds the sprite cache
+#
+# it uses SDL's dummy video and audio drivers unless SDL_VIDEODRIVER or
+# SDL_AUDIODRIVER are already set, so it runs without a display. Run
+# it from the folder with the png and sounds folders in it.
+#
+# results can be saved as json and compared with an earlier run, say
+# one made before a change:
+# >python3 benchmarks.py --out before.json
+# >python3 benchmarks.py --compare before.json
+# >python3 benchmarks.py particles render --repeat 10
+
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import numpy as np
+import pygame
+import pong
+from simulation import (Simulation, BASE_TICK_RATE, INPUT_SERVE, SIDE_LEFT,
+                        GAME_STATE_INTRO, GAME_STATE_IN_PROGRESS,
+                        GAME_STATE_SCORED, GAME_STATE_OVER)
+from noiseengine import BACKEND_FAST
+from policies import ChasePolicy
+from renderers import FullScreenRenderer, DirtyRectRenderer
+
+GAMESTATE_NAMES = {GAME_STATE_INTRO: 'intro',
+                   GAME_STATE_IN_PROGRESS: 'in_progress',
+                   GAME_STATE_SCORED: 'scored',
+                   GAME_STATE_OVER: 'over'}
+
+PARTICLE_COUNTS = (100, 1000, 10000)
+STAR_COUNTS = (40, 1000, 10000)
+
+def timeIt(function, number, repeat):
+
+    # the median time of one call, over repeat runs of number calls.
+    # The median rather than the best so one lucky run doesn't hide a
+    # slow change
+    runs = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            function()
+        runs.append((time.perf_counter() - start) / number)
+    return statistics.median(runs)
+
+def playing(game, ticks):
+
+    # tick a game on until the ball is in play, the trail is full
+    # and there are particals about
+    chase = ChasePolicy()
+    chase.reset(game.sim, SIDE_LEFT)
+    game.muted = True
+    for i in range(ticks):
+        inputs = chase.act()
+        if game.sim.gamestate != GAME_STATE_IN_PROGRESS:
+            inputs |= INPUT_SERVE
+        game.tick(inputs)
+    return game
+
+def benchSimulation(repeat):
+
+    sim = Simulation(1, BASE_TICK_RATE, BACKEND_FAST)
+    chase = ChasePolicy()
+    chase.reset(sim, SIDE_LEFT)
+
+    def step():
+        inputs = chase.act()
+        if sim.gamestate != GAME_STATE_IN_PROGRESS:
+            inputs |= INPUT_SERVE
+        sim.step(inputs)
+
+    game = playing(pong.Game(1, noise_backend=BACKEND_FAST), 0)
+    game_chase = ChasePolicy()
+    game_chase.reset(game.sim, SIDE_LEFT)
+
+    def tick():
+        inputs = game_chase.act()
+        if game.sim.gamestate != GAME_STATE_IN_PROGRESS:
+            inputs |= INPUT_SERVE
+        game.tick(inputs)
+
+    return {'simulation_steps_per_s': 1 / timeIt(step, 2000, repeat),
+            'game_ticks_per_s': 1 / timeIt(tick, 500, repeat)}
+
+def benchParticles(repeat):
+
+    # the particals are put back after every few frames so that
+    # just as many are alive for every frame timed
+    results = {}
+    for count in PARTICLE_COUNTS:
+        psc = pong.particlesystemController(1)
+        while psc.engine.count < count:
+            psc.spawnBurstCircle(pong.SCREEN_WIDTH // 2, pong.SCREEN_HEIGHT // 2, min(100, count - psc.engine.count))
+        full = psc.snapshot()
+
+        def update():
+            psc.restore(full)
+            for i in range(4):
+                psc.update()
+
+        def draw():
+            psc.draw()
+
+        def restore():
+            psc.restore(full)
+
+        restore_time = timeIt(restore, 50, repeat)
+        results['update_ms_{}'.format(count)] = 1000 * (timeIt(update, 50, repeat) - restore_time) / 4
+        psc.restore(full)
+        results['draw_ms_{}'.format(count)] = 1000 * timeIt(draw, 50, repeat)
+    return results
+
+def benchStarfield(repeat):
+
+    results = {}
+    for count in STAR_COUNTS:
+        game = pong.Game(1, stars=count, noise_backend=BACKEND_FAST)
+        results['update_ms_{}'.format(count)] = 1000 * timeIt(game.starfield.update, 200, repeat)
+        results['draw_ms_{}'.format(count)] = 1000 * timeIt(game.drawStars, 50, repeat)
+    return results
+
+def benchTrail(repeat):
+
+    trail = pong.Balltrail(8)
+    for i in range(trail.length * trail.interval):
+        trail.update(i, i)
+    return {'update_ms': 1000 * timeIt(lambda: trail.update(100, 100), 2000, repeat),
+            'draw_ms': 1000 * timeIt(trail.draw, 500, repeat)}
+
+def benchRender(repeat):
+
+    # a whole frame in each gamestate, from a match that has been
+    # played for a while so there is a trail and particals to draw
+    results = {}
+    game = playing(pong.Game(1, noise_backend=BACKEND_FAST), 600)
+    # the game's own snapshot leaves out the particals, so they are
+    # put back too
+    snapshot = game.snapshot()
+    particles = game.psc.snapshot()
+
+    for renderer_name, renderer_class in (('full', FullScreenRenderer), ('dirty', DirtyRectRenderer)):
+        renderer = renderer_class(pong.screen, pong.COLOUR_BLACK)
+        for state, state_name in GAMESTATE_NAMES.items():
+            game.restore(snapshot)
+            game.psc.restore(particles)
+            game.sim.gamestate = state
+            if state == GAME_STATE_SCORED:
+                game.psc.spawnBurstDirection(1, 300, pong.particles_SPAWN_FROM_PLAYER, 20, 100)
+
+            def frame():
+                renderer.setBackground(game.getBackground())
+                renderer.begin()
+                renderer.end(game.draw(0.5))
+
+            results['{}_{}_ms'.format(renderer_name, state_name)] = 1000 * timeIt(frame, 100, repeat)
+    return results
+
+def benchStartup(repeat):
+
+    # each import is a new python so nothing is cached in memory. An
+    # empty python is timed too, to show how much is pong's own
+    def run(code):
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, env=os.environ)
+            times.append(time.perf_counter() - start)
+        return statistics.median(times)
+
+    python = run('pass')
+    imported = run('import pong')
+    return {'python_ms': 1000 * python,
+            'import_pong_ms': 1000 * imported,
+            'pong_only_ms': 1000 * (imported - python)}
+
+BENCHMARKS = {'simulation': benchSimulation,
+              'particles': benchParticles,
+              'starfield': benchStarfield,
+              'trail': benchTrail,
+              'render': benchRender,
+              'startup': benchStartup}
+
+def commit():
+
+    # the git commit being measured, if there is one
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def compare(before, after):
+
+    # per_s results are better bigger, the rest are times
+    for group, results in after.items():
+        print(group)
+        for name, value in results.items():
+            old = before.get(group, {}).get(name)
+            if old is None or old == 0:
+                print('  {:<26} {:>12.4f}'.format(name, value))
+                continue
+            change = (value - old) / old
+            better = change > 0 if name.endswith('per_s') else change < 0
+            print('  {:<26} {:>12.4f} {:>12.4f} {:>+8.1%} {}'.format(
+                name, old, value, change, 'better' if better else 'worse'))
+
+def main():
+
+    parser = argparse.ArgumentParser(description='benchmark pong headless')
+    parser.add_argument('benchmarks', nargs='*', metavar='BENCHMARK',
+                        help='benchmarks to run, from {} (default all)'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs of each measurement, the median is kept (default %(default)s)')
+    parser.add_argument('--out', metavar='FILE', help='save the results to FILE as json')
+    parser.add_argument('--compare', metavar='FILE', help='compare with results saved by --out')
+    args = parser.parse_args()
+
+    names = args.benchmarks or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark {!r}, choose from {}'.format(name, ', '.join(BENCHMARKS)))
+    results = {}
+    for name in names:
+        start = time.perf_counter()
+        results[name] = BENCHMARKS[name](args.repeat)
+        print('{} ({:.1f}s)'.format(name, time.perf_counter() - start), file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)
+        print('compared with {} ({})'.format(args.compare, before.get('commit')))
+        compare(before['results'], results)
+    else:
+        compare({}, results)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'commit': commit(),
+                       'time': datetime.datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(),
+                       'pygame': pygame.version.ver,
+                       'numpy': np.__version__,
+                       'machine': platform.machine(),
+                       'repeat': args.repeat,
+                       'results': results}, f, indent=2)
+    pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
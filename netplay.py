@@ -0,0 +1,722 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  netplay.py
+#
+# two player pong over UDP.
+#
+# the server runs the only real Simulation and is the final word on
+# everything. Players send it their key presses every tick (an empty
+# packet when there are none, so they aren't timed out) and it sends
+# back a snapshot of the match every tick, along with the last input of
+# theirs it has used.
+#
+# so that a player's own bat moves the moment a key is pressed, each
+# client also runs a copy of the simulation ahead of the server
+# (prediction). When a snapshot arrives the client goes back to it and
+# quickly replays the inputs the server has not seen yet to catch up
+# to where it was (reconciliation). The other player's keys can't be
+# known in advance, so they are guessed as nothing pressed.
+#
+# the first client to join plays the left bat and the second the right.
+# with nobody on the right the built in opponent plays it.
+#
+# one server can host many matches at once, each with its own
+# Simulation, all moved on by a single tick loop. Clients can ask for
+# a match by number or take the first free place.
+#
+# to play on one machine start a server and then the game twice:
+# >python3 netplay.py server
+# >python3 pong.py --connect 127.0.0.1:5005
+#
+# or, with no display, a server and two bots that press keys at
+# random and report latency and bandwidth:
+# >python3 netplay.py local --seconds 10
+#
+# to see how many matches one process can run:
+# >python3 netplay.py bench --matches 500
+
+import asyncio
+import argparse
+import collections
+import random
+import socket
+import struct
+import time
+from simulation import (Simulation, BASE_TICK_RATE, INPUT_NONE, INPUT_UP,
+                        INPUT_DOWN, INPUT_SERVE, GAME_STATE_IN_PROGRESS,
+                        SIDE_LEFT, SIDE_RIGHT, SplitMix64, snapshotFrame)
+from noiseengine import BACKEND_FAST
+from replay import NOISE_BACKENDS
+from stats import percentile
+
+DEFAULT_PORT = 5005
+
+# the message types, the first byte of every packet
+MSG_HELLO   = 1
+MSG_WELCOME = 2
+MSG_FULL    = 3
+MSG_INPUT   = 4
+MSG_STATE   = 5
+MSG_BYE     = 6
+
+MSG_TYPE = struct.Struct('<B')
+# match to join, 0 for any
+HELLO_FORMAT = struct.Struct('<BI')
+# side, seed, tick rate, noise backend, match
+WELCOME_HEADER = struct.Struct('<BBqHBI')
+# number of inputs that follow
+INPUT_HEADER = struct.Struct('<BB')
+# input sequence number and bits
+INPUT_RECORD = struct.Struct('<IB')
+# last input sequence used from this client, which sides have a player
+STATE_HEADER = struct.Struct('<BIB')
+
+# inputs are sent again in every packet until the server has used them,
+# up to this many, so a lost packet doesn't lose a key press
+MAX_RESENT_INPUTS = 8
+# the furthest a client will run ahead of the server, in seconds
+MAX_PREDICTION = 0.5
+# clients that haven't sent anything for this long are dropped
+CLIENT_TIMEOUT = 5.0
+CONNECT_TIMEOUT = 5.0
+# how many ticks the server's timing metrics cover
+METRICS_WINDOW = 600
+
+MOVE_BITS = INPUT_UP | INPUT_DOWN
+
+def parseAddress(text, default_port=DEFAULT_PORT):
+
+    # 'host:port' or 'host' to (host, port)
+    host, _, port = text.rpartition(':')
+    if not host:
+        return text, default_port
+    return host, int(port)
+
+def splitInputs(side, inputs, opponent_inputs):
+
+    # turn each side's input bits into the arguments of
+    # Simulation.step. Either side can serve. None for the other side
+    # means nobody is playing it, which is the built in opponent on the
+    # right and a bat that doesn't move on the left. A person on the
+    # right presses keys rather than holding them every tick like a
+    # policy, so their bat moves just like the left one
+    if side == SIDE_LEFT:
+        left, right = inputs, opponent_inputs
+    else:
+        left, right = opponent_inputs or INPUT_NONE, inputs
+    serve = (left | (right or 0)) & INPUT_SERVE
+    if right is not None:
+        right &= MOVE_BITS
+    return (left & MOVE_BITS) | serve, right, False
+
+#=======================================================================
+# Connection class
+# the server's view of one client
+#=======================================================================
+
+class Connection():
+
+    def __init__(self, address, side):
+
+        self.address = address
+        self.side = side
+        self.last_seq = 0
+        self.queue = collections.deque()
+        self.last_heard = time.perf_counter()
+        self.joined = self.last_heard
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def received(self, records):
+
+        # queue up any inputs newer than the ones already seen
+        for seq, bits in records:
+            if seq > self.last_seq:
+                self.last_seq = seq
+                self.queue.append(bits)
+
+    def nextInputs(self):
+
+        # one key press per tick so none are merged together
+        if self.queue:
+            return self.queue.popleft()
+        return INPUT_NONE
+
+    def stats(self):
+
+        seconds = max(time.perf_counter() - self.joined, 1e-9)
+        return {'side': self.side,
+                'bytes_in_per_second': self.bytes_in / seconds,
+                'bytes_out_per_second': self.bytes_out / seconds}
+
+
+#=======================================================================
+# Match class
+# one match on the server and the clients playing it
+#=======================================================================
+
+class Match():
+
+    def __init__(self, match_id, seed, tick_rate=BASE_TICK_RATE, noise_backend=BACKEND_FAST):
+
+        self.id = match_id
+        self.seed = seed
+        self.sim = Simulation(seed, tick_rate, noise_backend)
+        # the Connection playing each side
+        self.connections = {}
+        self.tick_times = collections.deque(maxlen=METRICS_WINDOW)
+
+    def freeSide(self):
+
+        # the first side nobody is playing, or None
+        for side in (SIDE_LEFT, SIDE_RIGHT):
+            if side not in self.connections:
+                return side
+        return None
+
+    def sides(self):
+
+        # a bit for each side that has a player
+        bits = 0
+        for side in self.connections:
+            bits |= 1 << side
+        return bits
+
+    def tick(self):
+
+        left = INPUT_NONE
+        right = None
+        if SIDE_LEFT in self.connections:
+            left = self.connections[SIDE_LEFT].nextInputs()
+        if SIDE_RIGHT in self.connections:
+            right = self.connections[SIDE_RIGHT].nextInputs()
+        return self.sim.step(*splitInputs(SIDE_LEFT, left, right))
+
+    def stats(self):
+
+        times = list(self.tick_times)
+        sim = self.sim
+        return {'match': self.id,
+                'frame': sim.frame,
+                'players': len(self.connections),
+                'score': '{} - {}'.format(sim.player_score, sim.opponent_score),
+                'tick_us_mean': 1e6 * sum(times) / len(times) if times else 0.0,
+                'tick_us_p95': 1e6 * percentile(times, 95),
+                'tick_us_max': 1e6 * max(times) if times else 0.0}
+
+
+#=======================================================================
+# NetworkServer class
+#=======================================================================
+
+class NetworkServer(asyncio.DatagramProtocol):
+
+    # hosts up to max_matches matches, all driven by one tick loop. A
+    # client joins the match it asks for, or the first one with a free
+    # side, or a new one. Matches are closed when their last client
+    # leaves
+
+    def __init__(self, seed=None, tick_rate=BASE_TICK_RATE, noise_backend=BACKEND_FAST, send_every=1, max_matches=1):
+
+        # every match gets its own seed from this one
+        self.random = SplitMix64(seed)
+        self.tick_rate = tick_rate
+        self.noise_backend = noise_backend
+        self.send_every = send_every
+        self.max_matches = max_matches
+        self.matches = {}
+        self.next_match = 1
+        # the (match, Connection) of each client address
+        self.clients = {}
+        # the stats of clients that have left
+        self.departed = collections.deque(maxlen=1000)
+        self.loop_times = collections.deque(maxlen=METRICS_WINDOW)
+        self.overruns = 0
+        self.transport = None
+        self.running = False
+
+    def connection_made(self, transport):
+
+        self.transport = transport
+
+    def send(self, connection, data):
+
+        connection.bytes_out += len(data)
+        self.transport.sendto(data, connection.address)
+
+    def datagram_received(self, data, address):
+
+        if not data:
+            return
+        kind = data[0]
+        client = self.clients.get(address)
+
+        if kind == MSG_HELLO:
+            if client is None:
+                kind, match_id = HELLO_FORMAT.unpack_from(data)
+                client = self.join(address, match_id)
+            if client is None:
+                self.transport.sendto(MSG_TYPE.pack(MSG_FULL), address)
+                return
+            match, connection = client
+            sim = match.sim
+            self.send(connection, WELCOME_HEADER.pack(MSG_WELCOME, connection.side, match.seed, sim.tick_rate,
+                                                      NOISE_BACKENDS.index(sim.noiseengine.backend), match.id) +
+                      sim.snapshot())
+
+        if client is None:
+            return
+        match, connection = client
+        connection.bytes_in += len(data)
+        connection.last_heard = time.perf_counter()
+
+        if kind == MSG_INPUT:
+            kind, count = INPUT_HEADER.unpack_from(data)
+            connection.received(INPUT_RECORD.unpack_from(data, INPUT_HEADER.size + i * INPUT_RECORD.size)
+                                for i in range(count))
+        elif kind == MSG_BYE:
+            self.leave(address)
+
+    def newMatch(self, match_id=0):
+
+        if not match_id:
+            while self.next_match in self.matches:
+                self.next_match += 1
+            match_id = self.next_match
+            self.next_match += 1
+        # keep the seed positive so it packs as a signed 64 bit number
+        match = Match(match_id, self.random.next() >> 1, self.tick_rate, self.noise_backend)
+        self.matches[match_id] = match
+        return match
+
+    def join(self, address, match_id=0):
+
+        # match_id 0 means any match. Returns (match, Connection)
+        # or None if there is no room
+        match = self.matches.get(match_id)
+        if match is None and match_id == 0:
+            match = next((match for match in self.matches.values() if match.freeSide() is not None), None)
+        if match is None:
+            if len(self.matches) >= self.max_matches:
+                return None
+            match = self.newMatch(match_id)
+
+        side = match.freeSide()
+        if side is None:
+            return None
+        connection = Connection(address, side)
+        match.connections[side] = connection
+        self.clients[address] = (match, connection)
+        return match, connection
+
+    def leave(self, address):
+
+        match, connection = self.clients.pop(address)
+        del match.connections[connection.side]
+        stats = connection.stats()
+        stats['match'] = match.id
+        self.departed.append(stats)
+        if not match.connections:
+            del self.matches[match.id]
+
+    def sendState(self, match):
+
+        data = match.sim.snapshot()
+        sides = match.sides()
+        for connection in match.connections.values():
+            self.send(connection, STATE_HEADER.pack(MSG_STATE, connection.last_seq, sides) + data)
+
+    def tick(self):
+
+        start = time.perf_counter()
+
+        # drop anyone who has gone quiet
+        for address, (match, connection) in list(self.clients.items()):
+            if start - connection.last_heard > CLIENT_TIMEOUT:
+                self.leave(address)
+
+        perf_counter = time.perf_counter
+        for match in self.matches.values():
+            match_start = perf_counter()
+            match.tick()
+            if match.sim.frame % self.send_every == 0:
+                self.sendState(match)
+            match.tick_times.append(perf_counter() - match_start)
+
+        elapsed = perf_counter() - start
+        self.loop_times.append(elapsed)
+        if elapsed > 1.0 / self.tick_rate:
+            self.overruns += 1
+
+    def metrics(self):
+
+        # how long the whole tick loop and each match take
+        loop_times = list(self.loop_times)
+        match_means = [sum(match.tick_times) / len(match.tick_times)
+                       for match in self.matches.values() if match.tick_times]
+        mean = sum(loop_times) / len(loop_times) if loop_times else 0.0
+        return {'matches': len(self.matches),
+                'clients': len(self.clients),
+                'tick_ms_mean': 1000 * mean,
+                'tick_ms_p95': 1000 * percentile(loop_times, 95),
+                'tick_ms_max': 1000 * max(loop_times) if loop_times else 0.0,
+                'match_tick_us_mean': 1e6 * sum(match_means) / len(match_means) if match_means else 0.0,
+                'match_tick_us_worst': 1e6 * max(match_means) if match_means else 0.0,
+                'load': mean * self.tick_rate,
+                'overruns': self.overruns}
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT, report=0):
+
+        # run every match at the tick rate until stop(), printing
+        # the metrics every report seconds if report is set
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(lambda: self, local_addr=(host, port))
+        tick_time = 1.0 / self.tick_rate
+        next_tick = loop.time()
+        next_report = next_tick + report
+        self.running = True
+
+        try:
+            while self.running:
+                # catch up on any ticks that are due, but not on
+                # more than a second of them after a stall
+                now = loop.time()
+                if now - next_tick > 1.0:
+                    next_tick = now
+                while now >= next_tick:
+                    self.tick()
+                    next_tick += tick_time
+                if report and now >= next_report:
+                    printStats('server', self.metrics())
+                    next_report = now + report
+                await asyncio.sleep(next_tick - loop.time())
+        finally:
+            transport.close()
+
+    def stop(self):
+
+        self.running = False
+
+
+class CountingTransport():
+
+    # stands in for the udp transport when benchmarking,
+    # it just counts what would have been sent
+
+    def __init__(self):
+
+        self.packets = 0
+        self.bytes = 0
+
+    def sendto(self, data, address):
+
+        self.packets += 1
+        self.bytes += len(data)
+
+
+#=======================================================================
+# NetworkClient class
+#=======================================================================
+
+class NetworkClient():
+
+    def __init__(self, address, match=0, timeout=CONNECT_TIMEOUT):
+
+        # match is the id of the match to join on the server, 0 for any
+        self.address = address
+        self.match = match
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.settimeout(0.25)
+        self.sim = None
+        self.seq = 0
+        # (seq, tick, bits) for every input the server hasn't used yet
+        self.pending = collections.deque()
+        self.sent_times = {}
+        self.latencies = collections.deque(maxlen=1000)
+        self.corrections = 0
+        self.opponent_connected = False
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.started = time.perf_counter()
+        self.connect(timeout)
+
+    def send(self, data):
+
+        self.bytes_out += len(data)
+        self.socket.sendto(data, self.address)
+
+    def connect(self, timeout):
+
+        # say hello until the server answers
+        give_up = time.perf_counter() + timeout
+        while time.perf_counter() < give_up:
+            self.send(HELLO_FORMAT.pack(MSG_HELLO, self.match))
+            try:
+                data, address = self.socket.recvfrom(4096)
+            except (socket.timeout, ConnectionResetError):
+                continue
+            self.bytes_in += len(data)
+            if data[0] == MSG_FULL:
+                raise ConnectionError('the server at {}:{} has no free match slot'.format(*self.address))
+            if data[0] == MSG_WELCOME:
+                kind, self.side, self.seed, self.tick_rate, backend, self.match = WELCOME_HEADER.unpack_from(data)
+                self.noise_backend = NOISE_BACKENDS[backend]
+                self.welcome_snapshot = data[WELCOME_HEADER.size:]
+                self.socket.setblocking(False)
+                return
+        raise ConnectionError('no answer from a server at {}:{}'.format(*self.address))
+
+    def attach(self, sim):
+
+        # use sim, which must have been made with this client's seed,
+        # tick rate and noise backend, as the predicted match
+        self.sim = sim
+        sim.restore(self.welcome_snapshot)
+
+    def makeSimulation(self):
+
+        self.attach(Simulation(self.seed, self.tick_rate, self.noise_backend))
+        return self.sim
+
+    def close(self):
+
+        self.send(MSG_TYPE.pack(MSG_BYE))
+        self.socket.close()
+
+    def receive(self):
+
+        # read every packet waiting, returns the newest state or None
+        newest = None
+        while True:
+            try:
+                data, address = self.socket.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return newest
+            except ConnectionResetError:
+                # a refused earlier packet, the server isn't there yet
+                continue
+            self.bytes_in += len(data)
+            if data[0] != MSG_STATE:
+                continue
+            kind, ack, sides = STATE_HEADER.unpack_from(data)
+            snapshot = data[STATE_HEADER.size:]
+            tick = snapshotFrame(snapshot)
+            if newest is None or tick >= newest[0]:
+                newest = (tick, ack, sides, snapshot)
+
+    def stepSim(self, inputs):
+
+        opponent_inputs = INPUT_NONE if self.opponent_connected else None
+        return self.sim.step(*splitInputs(self.side, inputs, opponent_inputs))
+
+    def reconcile(self, ack, sides, snapshot):
+
+        # go back to the server's state and replay the inputs it hasn't
+        # seen yet to get back to the tick the client was on
+        sim = self.sim
+        now = time.perf_counter()
+        while self.pending and self.pending[0][0] <= ack:
+            seq = self.pending.popleft()[0]
+            sent = self.sent_times.pop(seq, None)
+            if sent is not None:
+                self.latencies.append(now - sent)
+
+        self.opponent_connected = bool(sides & (1 << (1 - self.side)))
+        before = sim.snapshot()
+        tick = sim.frame
+        sim.restore(snapshot)
+        tick = min(tick, sim.frame + int(MAX_PREDICTION * self.tick_rate))
+
+        pending = list(self.pending)
+        i = 0
+        while sim.frame < tick:
+            # an input is replayed on the tick it was first used on,
+            # or straight away if that is already in the past
+            inputs = INPUT_NONE
+            if i < len(pending) and pending[i][1] <= sim.frame + 1:
+                inputs = pending[i][2]
+                i += 1
+            self.stepSim(inputs)
+
+        if sim.snapshot() != before:
+            self.corrections += 1
+
+    def step(self, inputs=INPUT_NONE):
+
+        # one tick of the predicted match, returns its events
+        state = self.receive()
+        if state is not None:
+            self.reconcile(*state[1:])
+
+        if inputs:
+            self.seq += 1
+            self.pending.append((self.seq, self.sim.frame + 1, inputs))
+            self.sent_times[self.seq] = time.perf_counter()
+
+        # sent every tick, even with no inputs in it, so the server
+        # doesn't take a player who isn't pressing anything for gone
+        records = list(self.pending)[-MAX_RESENT_INPUTS:]
+        self.send(INPUT_HEADER.pack(MSG_INPUT, len(records)) +
+                  b''.join(INPUT_RECORD.pack(seq, bits) for seq, tick, bits in records))
+
+        return self.stepSim(inputs)
+
+    def stats(self):
+
+        # input latency is from sending a key press to getting back a
+        # state from the server that includes it
+        seconds = max(time.perf_counter() - self.started, 1e-9)
+        latencies = list(self.latencies)
+        return {'match': self.match,
+                'side': self.side,
+                'inputs_confirmed': len(latencies),
+                'latency_ms_mean': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+                'latency_ms_p50': 1000 * percentile(latencies, 50),
+                'latency_ms_p95': 1000 * percentile(latencies, 95),
+                'corrections': self.corrections,
+                'bytes_in_per_second': self.bytes_in / seconds,
+                'bytes_out_per_second': self.bytes_out / seconds}
+
+
+def botInputs(generator, sim):
+
+    # random taps, serving now and then when there is no rally
+    inputs = generator.choice([INPUT_NONE] * 6 + [INPUT_UP, INPUT_DOWN])
+    if sim.gamestate != GAME_STATE_IN_PROGRESS and generator.random() < 0.02:
+        inputs |= INPUT_SERVE
+    return inputs
+
+async def runBot(address, seconds, seed=None, match=0):
+
+    # a headless client that presses keys at random. Connecting
+    # blocks, so it is done on another thread in case the server is
+    # running in this event loop
+    generator = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    client = await loop.run_in_executor(None, NetworkClient, address, match)
+    sim = client.makeSimulation()
+    tick_time = 1.0 / client.tick_rate
+    next_tick = loop.time()
+    end = next_tick + seconds
+
+    while loop.time() < end:
+        client.step(botInputs(generator, sim))
+        next_tick += tick_time
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+    stats = client.stats()
+    client.close()
+    return stats
+
+def printStats(name, stats):
+
+    print(name)
+    for key, value in stats.items():
+        print('  {}: {}'.format(key, round(value, 2) if isinstance(value, float) else value))
+
+async def runLocal(seconds, port, tick_rate, send_every):
+
+    # a server and two bots in one process
+    server = NetworkServer(tick_rate=tick_rate, send_every=send_every)
+    serving = asyncio.ensure_future(server.serve('127.0.0.1', port))
+    await asyncio.sleep(0.1)
+
+    address = ('127.0.0.1', port)
+    left = asyncio.ensure_future(runBot(address, seconds, 1))
+    await asyncio.sleep(0.1)
+    right = asyncio.ensure_future(runBot(address, seconds, 2))
+    results = await asyncio.gather(left, right)
+
+    for stats in server.departed:
+        printStats('server, client on side {}'.format(stats['side']), stats)
+    server.stop()
+    await serving
+
+    for stats in results:
+        printStats('client on side {}'.format(stats['side']), stats)
+
+def runBench(matches, seconds, tick_rate, send_every, seed=1):
+
+    # fill a server with matches of two bots each and run its tick loop
+    # as fast as it will go, without any real network. The bots' inputs
+    # go straight into each connection's queue
+    server = NetworkServer(seed, tick_rate, send_every=send_every, max_matches=matches)
+    server.transport = CountingTransport()
+    bots = []
+    for i in range(matches * 2):
+        match, connection = server.join(('bot', i))
+        bots.append((connection, match.sim, random.Random(seed + i)))
+
+    start = time.perf_counter()
+    for tick in range(int(seconds * tick_rate)):
+        now = time.perf_counter()
+        for connection, sim, generator in bots:
+            connection.received([(connection.last_seq + 1, botInputs(generator, sim))])
+            connection.last_heard = now
+        server.tick()
+    elapsed = time.perf_counter() - start
+
+    metrics = server.metrics()
+    metrics['matches_per_core'] = matches / metrics['load'] if metrics['load'] else 0.0
+    metrics['state_bytes_per_second'] = server.transport.bytes / seconds
+    metrics['seconds_to_run'] = elapsed
+    return metrics
+
+def main():
+
+    parser = argparse.ArgumentParser(description='two player pong over UDP')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('server', help='run a match server')
+    serve.add_argument('--host', default='0.0.0.0', help='address to listen on (default %(default)s)')
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on (default %(default)s)')
+    serve.add_argument('--seed', type=int, help='seed the match seeds come from (default random)')
+    serve.add_argument('--max-matches', type=int, default=1,
+                       help='most matches to host at once (default %(default)s)')
+    serve.add_argument('--report', type=float, default=0,
+                       help='print timing metrics every this many seconds')
+    serve.add_argument('--tick-rate', type=int, default=BASE_TICK_RATE,
+                       help='simulation ticks per second (default %(default)s)')
+    serve.add_argument('--send-every', type=int, default=1,
+                       help='ticks between state packets (default %(default)s)')
+
+    bot = commands.add_parser('bot', help='connect a headless client that presses keys at random')
+    bot.add_argument('--connect', default='127.0.0.1:{}'.format(DEFAULT_PORT), help='server host:port')
+    bot.add_argument('--seconds', type=float, default=10, help='how long to play (default %(default)s)')
+    bot.add_argument('--match', type=int, default=0, help='match to join (default any)')
+
+    local = commands.add_parser('local', help='run a server and two bots and report latency and bandwidth')
+    local.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to use (default %(default)s)')
+    local.add_argument('--seconds', type=float, default=10, help='how long to play (default %(default)s)')
+    local.add_argument('--tick-rate', type=int, default=BASE_TICK_RATE,
+                       help='simulation ticks per second (default %(default)s)')
+    local.add_argument('--send-every', type=int, default=1,
+                       help='ticks between state packets (default %(default)s)')
+
+    bench = commands.add_parser('bench', help='time a server full of bot matches with no network')
+    bench.add_argument('--matches', type=int, default=200, help='number of matches (default %(default)s)')
+    bench.add_argument('--seconds', type=float, default=10, help='match time to run (default %(default)s)')
+    bench.add_argument('--tick-rate', type=int, default=BASE_TICK_RATE,
+                       help='simulation ticks per second (default %(default)s)')
+    bench.add_argument('--send-every', type=int, default=1,
+                       help='ticks between state packets (default %(default)s)')
+    args = parser.parse_args()
+
+    if args.command == 'server':
+        server = NetworkServer(args.seed, args.tick_rate, send_every=args.send_every, max_matches=args.max_matches)
+        print('serving on {}:{}'.format(args.host, args.port))
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.report))
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'bot':
+        printStats('client', asyncio.run(runBot(parseAddress(args.connect), args.seconds, match=args.match)))
+    elif args.command == 'bench':
+        printStats('server', runBench(args.matches, args.seconds, args.tick_rate, args.send_every))
+    else:
+        asyncio.run(runLocal(args.seconds, args.port, args.tick_rate, args.send_every))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,52 +2,254 @@
 # -*- coding: utf-8 -*-
 #
 #  noiseengine.py
-# 
+#
 # NOTE!:
-# pip3 install opensimplex 
+# pip3 install opensimplex (optional)
 #
 # implements a simple 1D noise generator.
-# 
+#
 # call next to get a perlin random in range -1..1
 # call next with optional offset to get value ahead/behind the next val
 # this is good for random x/y position value
 # call nextMapped to get that value mapped to any range.
+#
+# call nextBlock / nextMappedBlock to get the next count values at once
+# and sample / sampleMapped for the values at any (even fractional)
+# positions along the noise.
+#
+# samples are worked out a chunk at a time and kept in a small table,
+# so OpenSimplex is only called once per sample point rather than on
+# every call. values between whole positions are interpolated.
+# if numpy is installed the block functions return numpy arrays,
+# otherwise lists.
+#
+# two backends make the noise. 'opensimplex' uses the opensimplex
+# package, which is only imported when it is first needed. 'fast' is
+# the built in FastNoise1D, a seeded 1D gradient noise that is much
+# quicker and needs nothing installed. The default 'auto' uses
+# opensimplex if it is installed and falls back to 'fast' if not.
+# the two backends give different (but equally smooth) noise for the
+# same seed.
+
+import math
+import random
 
 try:
-    from opensimplex import OpenSimplex
-except:
-    print ('opensimplex not found.')
-    print('To install opensimplex: pip3 install opensimplex')
+    import numpy as np
+except ImportError:
+    np = None
 
+# number of samples worked out in one go, and how many
+# chunks are kept before the oldest is thrown away
+CHUNK_SIZE = 256
+MAX_CHUNKS = 16
+
+# number of gradients FastNoise1D has before it repeats
+FAST_NOISE_PERIOD = 4096
+# gradient tables kept for reuse, the simulations only use seeds 1..100
+MAX_FAST_NOISE_TABLES = 128
+
+BACKEND_AUTO        = 'auto'
+BACKEND_OPENSIMPLEX = 'opensimplex'
+BACKEND_FAST        = 'fast'
+
+opensimplex_class = None
+# FastNoise1D's gradients for each seed, as (list, numpy array or None)
+fast_noise_tables = {}
+
+def fastNoiseTable(seed):
+
+    # making a table takes a couple of ms and a batch of simulations
+    # makes thousands of engines, so each seed's is only made once.
+    # the tables are never changed, so engines can share them
+    table = fast_noise_tables.get(seed)
+    if table is None:
+        if seed is not None and len(fast_noise_tables) >= MAX_FAST_NOISE_TABLES:
+            # dicts keep insertion order, so this is the oldest
+            del fast_noise_tables[next(iter(fast_noise_tables))]
+        generator = random.Random(seed)
+        gradients = [generator.uniform(-1, 1) for i in range(FAST_NOISE_PERIOD)]
+        table = (gradients, np.array(gradients) if np is not None else None)
+        if seed is not None:
+            fast_noise_tables[seed] = table
+    return table
+
+def loadOpenSimplex():
+
+    # import opensimplex the first time it is asked for.
+    # returns the OpenSimplex class or None if it is not installed
+    global opensimplex_class
+    if opensimplex_class is None:
+        try:
+            from opensimplex import OpenSimplex
+        except ImportError:
+            return None
+        opensimplex_class = OpenSimplex
+    return opensimplex_class
+
+
+class FastNoise1D():
+
+    # seeded 1D gradient (perlin) noise in the range -1..1.
+    # every whole position gets a random gradient and the noise
+    # is a smooth blend of the two gradients either side
 
-class NoiseEngine1D():
-    
     def __init__(self, seed=1):
-        
-        self.engine = OpenSimplex(seed)
+
+        self.gradients, self.gradient_array = fastNoiseTable(seed)
+
+    def noise(self, t):
+
+        i = math.floor(t)
+        f = t - i
+        g0 = self.gradients[i % FAST_NOISE_PERIOD] * f
+        g1 = self.gradients[(i + 1) % FAST_NOISE_PERIOD] * (f - 1)
+        # fade curve 6f^5 - 15f^4 + 10f^3
+        u = f * f * f * (f * (f * 6 - 15) + 10)
+        # the blend is at most 0.5 either way, so double it
+        return 2 * (g0 + u * (g1 - g0))
+
+    def noiseArray(self, t):
+
+        i = np.floor(t).astype(np.int64)
+        f = t - i
+        g0 = self.gradient_array[i % FAST_NOISE_PERIOD] * f
+        g1 = self.gradient_array[(i + 1) % FAST_NOISE_PERIOD] * (f - 1)
+        u = f * f * f * (f * (f * 6 - 15) + 10)
+        return 2 * (g0 + u * (g1 - g0))
+
+
+class NoiseEngine1D():
+
+    def __init__(self, seed=1, backend=BACKEND_AUTO):
+
         self.smoothness = 20
         self.x = 1
-        
+        self.chunks = {}
+
+        if backend not in (BACKEND_AUTO, BACKEND_FAST, BACKEND_OPENSIMPLEX):
+            raise ValueError('unknown noise backend {!r}'.format(backend))
+
+        OpenSimplex = None
+        if backend != BACKEND_FAST:
+            OpenSimplex = loadOpenSimplex()
+            if OpenSimplex is None and backend == BACKEND_OPENSIMPLEX:
+                raise ImportError('opensimplex not found. To install opensimplex: pip3 install opensimplex')
+
+        if OpenSimplex is None:
+            self.backend = BACKEND_FAST
+            self.engine = FastNoise1D(seed)
+            return
+
+        self.backend = BACKEND_OPENSIMPLEX
+        self.engine = OpenSimplex(seed)
+
+        # opensimplex 0.4 renamed noise2d to noise2 and added
+        # noise2array, which works out a whole chunk in one call
+        self.noise2d = getattr(self.engine, 'noise2d', None) or self.engine.noise2
+        self.noise2array = getattr(self.engine, 'noise2array', None) if np is not None else None
+
     def maprange(self, a, b, val):
-        
+
         # map val from range a to range b
         (a1, a2), (b1, b2) = a, b
         return  b1 + ((val - a1) * (b2 - b1) / (a2 - a1))
-        
+
+    def makeChunk(self, index):
+
+        # the noise at every whole position in chunk index
+        start = index * CHUNK_SIZE
+        smoothness = self.smoothness
+
+        if self.backend == BACKEND_FAST:
+            if np is not None:
+                return self.engine.noiseArray(np.arange(start, start + CHUNK_SIZE) / smoothness).tolist()
+            noise = self.engine.noise
+            return [noise((start + i) / smoothness) for i in range(CHUNK_SIZE)]
+
+        if self.noise2array is not None:
+            y = np.arange(start, start + CHUNK_SIZE) / smoothness
+            return self.noise2array(np.array([1.0]), y)[:, 0].tolist()
+
+        noise2d = self.noise2d
+        return [noise2d(1, (start + i) / smoothness) for i in range(CHUNK_SIZE)]
+
+    def getChunk(self, index):
+
+        chunk = self.chunks.get(index)
+        if chunk is None:
+            if len(self.chunks) >= MAX_CHUNKS:
+                # dicts keep insertion order, so this is the oldest
+                del self.chunks[next(iter(self.chunks))]
+            chunk = self.makeChunk(index)
+            self.chunks[index] = chunk
+        return chunk
+
+    def lookup(self, position):
+
+        # the noise at a whole position
+        index, i = divmod(position, CHUNK_SIZE)
+        return self.getChunk(index)[i]
+
+    def sampleAt(self, position):
+
+        # the noise at any position, fractional positions are
+        # interpolated between the whole positions either side
+        whole = int(position // 1)
+        fraction = position - whole
+        value = self.lookup(whole)
+        if fraction:
+            value += (self.lookup(whole + 1) - value) * fraction
+        return value
+
     def next(self, offset=0):
-        
+
         # return next value of noise
         self.x += 1
-        return self.engine.noise2d(1, (self.x + offset) / self.smoothness)
-        
+        return self.sampleAt(self.x + offset)
+
     def nextMapped(self, mn, mx, offset=0):
-        
+
         n = self.next(offset)
         return self.maprange((-1,1),(mn,mx),n)
-        
-    
 
+    def sample(self, positions):
+
+        # the noise at each of positions, without moving along
+        if np is None:
+            return [self.sampleAt(p) for p in positions]
+
+        positions = np.asarray(positions, dtype=float)
+        whole = np.floor(positions).astype(np.int64)
+        fraction = positions - whole
+
+        # look up only the whole positions needed, so a few positions
+        # far apart don't build a table of everything in between
+        needed = np.unique(np.concatenate([whole.ravel(), whole.ravel() + 1]))
+        table = np.array([self.lookup(p) for p in needed.tolist()], dtype=float)
+        low = table[np.searchsorted(needed, whole)]
+        high = table[np.searchsorted(needed, whole + 1)]
+        return low + (high - low) * fraction
+
+    def sampleMapped(self, mn, mx, positions):
+
+        n = self.sample(positions)
+        if np is None:
+            return [self.maprange((-1,1),(mn,mx),v) for v in n]
+        return self.maprange((-1,1),(mn,mx),n)
+
+    def nextBlock(self, count, offset=0):
 
+        # the same values as count calls to next(offset)
+        start = self.x + 1 + offset
+        self.x += count
+        if np is None:
+            return [self.lookup(p) for p in range(start, start + count)]
+        return self.sample(np.arange(start, start + count))
 
+    def nextMappedBlock(self, mn, mx, count, offset=0):
 
-        
+        n = self.nextBlock(count, offset)
+        if np is None:
+            return [self.maprange((-1,1),(mn,mx),v) for v in n]
+        return self.maprange((-1,1),(mn,mx),n)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  particleengine.py
+#
+# NOTE!:
+# pip3 install numpy
+#
+# a pooled partical store with no pygame dependency.
+#
+# instead of one object per partical, every partical is a row in a set
+# of preallocated numpy arrays (position, velocity, acceleration, alpha,
+# size and colour). Live particals are always packed into the first
+# count rows, so update() is a handful of array operations no matter how
+# many particals there are. Dead particals are squeezed out at the start
+# of each update and the arrays only grow when a burst does not fit.
+#
+# colour is an index into the palette passed to the constructor.
+
+import numpy as np
+from vector import Vector2Array
+
+#=======================================================================
+# ParticleEngine class
+#=======================================================================
+
+class ParticleEngine():
+
+    def __init__(self, width, height, palette, capacity=1024):
+
+        self.width = width
+        self.height = height
+        self.palette = palette
+        self.count = 0
+        self.capacity = 0
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+
+        # (re)allocate the pool keeping any live particals
+        n = self.count
+        position = Vector2Array(capacity)
+        velocity = Vector2Array(capacity)
+        acceleration = Vector2Array(capacity)
+        alpha = np.zeros(capacity)
+        size = np.zeros(capacity, dtype=np.int32)
+        colour = np.zeros(capacity, dtype=np.int32)
+
+        if self.capacity:
+            position[:n] = self.position[:n]
+            velocity[:n] = self.velocity[:n]
+            acceleration[:n] = self.acceleration[:n]
+            alpha[:n] = self.alpha[:n]
+            size[:n] = self.size[:n]
+            colour[:n] = self.colour[:n]
+
+        self.position = position
+        self.velocity = velocity
+        self.acceleration = acceleration
+        self.alpha = alpha
+        self.size = size
+        self.colour = colour
+        self.capacity = capacity
+
+    def spawn(self, x, y, angles, speeds, sizes, colour):
+
+        # add one partical per entry in angles (degrees), each starting
+        # at x, y and accelerating along its angle by its speed
+        count = len(angles)
+        if self.count + count > self.capacity:
+            capacity = self.capacity
+            while self.count + count > capacity:
+                capacity *= 2
+            self.allocate(capacity)
+
+        new = slice(self.count, self.count + count)
+        self.position[new].setFromValues(x, y)
+        self.velocity[new].zero()
+        acceleration = self.acceleration[new]
+        acceleration.setFromAngle(angles)
+        acceleration.mult(speeds)
+        self.alpha[new] = 255
+        self.size[new] = sizes
+        self.colour[new] = colour
+        self.count += count
+
+    def killAll(self):
+
+        self.count = 0
+
+    def compact(self):
+
+        # move the live particals to the front of the pool
+        n = self.count
+        position = self.position[:n]
+        live = ((self.alpha[:n] > 0) &
+                (position.x >= 0) & (position.x <= self.width) &
+                (position.y >= 0) & (position.y <= self.height))
+
+        alive = int(np.count_nonzero(live))
+        if alive == n:
+            return
+
+        self.position[:alive] = self.position[:n][live]
+        self.velocity[:alive] = self.velocity[:n][live]
+        self.acceleration[:alive] = self.acceleration[:n][live]
+        self.alpha[:alive] = self.alpha[:n][live]
+        self.size[:alive] = self.size[:n][live]
+        self.colour[:alive] = self.colour[:n][live]
+        self.count = alive
+
+    def update(self):
+
+        self.compact()
+
+        n = self.count
+        velocity = self.velocity[:n]
+        velocity.add(self.acceleration[:n])
+        self.position[:n].add(velocity)
+
+        # particals fade faster the quicker they fall
+        alpha = self.alpha[:n]
+        alpha -= np.abs(velocity.y)
+        np.maximum(alpha, 0, out=alpha)
+
+    def snapshot(self):
+
+        # copies of the live particals
+        n = self.count
+        return (self.position.data[:n].copy(), self.velocity.data[:n].copy(),
+                self.acceleration.data[:n].copy(), self.alpha[:n].copy(),
+                self.size[:n].copy(), self.colour[:n].copy())
+
+    def restore(self, snapshot):
+
+        position, velocity, acceleration, alpha, size, colour = snapshot
+        n = len(alpha)
+        if n > self.capacity:
+            self.count = 0
+            self.allocate(max(n, self.capacity * 2))
+
+        self.position.data[:n] = position
+        self.velocity.data[:n] = velocity
+        self.acceleration.data[:n] = acceleration
+        self.alpha[:n] = alpha
+        self.size[:n] = size
+        self.colour[:n] = colour
+        self.count = n
+
+    def isDead(self):
+
+        return self.count == 0
@@ -0,0 +1,621 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  policies.py
+#
+# computer players that can play either bat.
+#
+# a policy is asked for its input bits (INPUT_UP / INPUT_DOWN, the same
+# as a person's keys) every tick and passes them to Simulation.step
+# as inputs for the left bat or opponent_inputs for the right. 'chase'
+# on the right bat plays exactly like the built in opponent.
+#
+# to add one, subclass Policy and add it to POLICIES.
+#
+# each kind of policy says how much cpu time it may take each frame
+# (budget, in seconds), shared between however many ticks the frame
+# runs. The game runs its opponent inside a BudgetedPolicy, which gives
+# the policy what is left of the frame's budget as its deadline and
+# plays 'chase' in its place for the rest of the frame once it is
+# spent. A policy that still goes over is rested for a few frames. 'search' also looks at the deadline itself and carries its
+# work over to the next tick rather than run late. With no deadline (as
+# in tournaments) every policy plays the same way every time.
+#
+# 'learned' plays with weights fitted to copy 'predict':
+# >python3 policies.py fit --ticks 200000
+
+import argparse
+import collections
+import json
+import math
+import pathlib
+import random
+import time
+from simulation import (INPUT_NONE, INPUT_UP, INPUT_DOWN, SIDE_LEFT,
+                        SCREEN_WIDTH, SCREEN_HEIGHT, GAME_STATE_IN_PROGRESS,
+                        GAME_STATE_INTRO, INPUT_SERVE, EVENT_PLAYER_HIT,
+                        EVENT_OPPONENT_HIT, EVENT_PLAYER_SCORED,
+                        EVENT_OPPONENT_SCORED, SIDE_RIGHT, Simulation)
+from stats import percentile
+
+# most wall bounces followed when predicting where the ball will go
+MAX_PREDICTED_BOUNCES = 16
+
+# where the learned policy's weights are kept
+WEIGHTS_PATH = pathlib.Path().cwd().joinpath('weights', 'learned.json')
+
+# a policy that overruns its budget plays chase for this many frames,
+# doubled each time it overruns again straight away, up to the most
+BENCH_FRAMES = 4
+MAX_BENCH_FRAMES = 240
+
+def sideBat(sim, side):
+
+    if side == SIDE_LEFT:
+        return sim.player
+    return sim.opponent
+
+def chaseInputs(bat, y):
+
+    # the inputs that move a bat's middle towards y
+    target = y - bat.height // 2
+    if bat.position.y < target:
+        return INPUT_DOWN
+    elif bat.position.y > target:
+        return INPUT_UP
+    return INPUT_NONE
+
+def firstRoot(a, b, c):
+
+    # the smallest t > 0 where a*t*t + b*t + c == 0, or None
+    if abs(a) < 1e-12:
+        if b == 0:
+            return None
+        roots = (-c / b,)
+    else:
+        d = b * b - 4 * a * c
+        if d < 0:
+            return None
+        d = math.sqrt(d)
+        roots = ((-b - d) / (2 * a), (-b + d) / (2 * a))
+    roots = [t for t in roots if t > 1e-9]
+    return min(roots) if roots else None
+
+def travel(p, v, a, dt, c):
+
+    # the ball's velocity has a added to it at the start of every tick
+    # and then it moves by velocity * dt, so after t ticks it has
+    # moved dt * (v*t + a*t*(t+1)/2). Returns the first t it reaches
+    # c from p
+    return firstRoot(dt * a / 2, dt * (v + a / 2), p - c)
+
+def predictIntercept(sim, x):
+
+    # where the top of the ball will be when its left edge reaches x,
+    # bouncing off the top and bottom walls with the wind still
+    # blowing. Returns (ticks, y) or None if the wind turns it round
+    # before it gets there
+    ball = sim.ball
+    dt = sim.dt
+    ax = sim.wind.x / ball.mass * dt
+    ay = sim.wind.y / ball.mass * dt
+
+    ticks = travel(ball.position.x, ball.velocity.x, ax, dt, x)
+    if ticks is None:
+        return None
+
+    # the wind doesn't change between bat hits but each wall bounce
+    # turns the ball round while the wind keeps pushing the same way,
+    # so the path is worked out a piece at a time
+    bottom = SCREEN_HEIGHT - ball.height
+    y = ball.position.y
+    vy = ball.velocity.y
+    left = ticks
+    for bounce in range(MAX_PREDICTED_BOUNCES):
+        walls = [t for t in (travel(y, vy, ay, dt, 0), travel(y, vy, ay, dt, bottom)) if t is not None]
+        t = min(walls) if walls else None
+        if t is None or t >= left:
+            y += dt * (vy * left + ay * left * (left + 1) / 2)
+            break
+        y = 0 if vy + ay * t < 0 else bottom
+        vy = -(vy + ay * t)
+        left -= t
+
+    return ticks, min(max(y, 0), bottom)
+
+#=======================================================================
+# Policy class
+#=======================================================================
+
+class Policy():
+
+    name = 'idle'
+    kind = 'scripted'
+    # most seconds of cpu the policy may take each frame, shared by
+    # every tick the frame runs
+    budget = 0.0005
+
+    def __init__(self, seed=None):
+
+        self.random = random.Random(seed)
+        # when act should be done by, as time.perf_counter(), or None
+        # for no hurry
+        self.deadline = None
+
+    def reset(self, sim, side):
+
+        # called before each match
+        self.sim = sim
+        self.side = side
+        self.bat = sideBat(sim, side)
+
+    def act(self):
+
+        # the input bits for this tick
+        return INPUT_NONE
+
+
+class ChasePolicy(Policy):
+
+    # the built in opponent, keeps the middle of the bat level with
+    # the ball
+
+    name = 'chase'
+
+    def act(self):
+
+        return chaseInputs(self.bat, self.sim.ball.position.y)
+
+
+class LazyPolicy(ChasePolicy):
+
+    # chases the ball only when it is coming towards this bat
+
+    name = 'lazy'
+
+    def act(self):
+
+        velocity = self.sim.ball.velocity.x
+        if (velocity < 0) != (self.side == SIDE_LEFT):
+            return INPUT_NONE
+        return ChasePolicy.act(self)
+
+
+class RandomPolicy(Policy):
+
+    # taps up and down at random, about as well as a cat would play
+
+    name = 'random'
+
+    def act(self):
+
+        return self.random.choice((INPUT_NONE, INPUT_NONE, INPUT_UP, INPUT_DOWN))
+
+
+class PredictPolicy(Policy):
+
+    # works out where the ball will reach this bat, wind and wall
+    # bounces included, and waits there. The sums are only done again
+    # when something changes the ball's path: a bat hit (which sets
+    # new wind), a serve or a point. In between it costs no more
+    # than chase. It aims the ball at the end of the bat furthest from
+    # the other bat, which sends it away at a steep angle
+
+    name = 'predict'
+    kind = 'predictive'
+
+    # how far off the middle of the bat to hit the ball, as a
+    # fraction of the bat's height
+    aim = 0.35
+
+    def reset(self, sim, side):
+
+        Policy.reset(self, sim, side)
+        bat = self.bat
+        if side == SIDE_LEFT:
+            self.face_x = bat.position.x + bat.width
+            self.other = sim.opponent
+        else:
+            self.face_x = bat.position.x - sim.ball.width
+            self.other = sim.player
+        self.key = None
+        self.target = None
+        self.predictions = 0
+
+    def predict(self):
+
+        # where the top of the bat should be, or None if the ball
+        # is going away
+        sim = self.sim
+        ball = sim.ball
+        bat = self.bat
+        coming = (ball.velocity.x < 0) == (self.side == SIDE_LEFT)
+        if not coming:
+            return None
+        intercept = predictIntercept(sim, self.face_x)
+        if intercept is None:
+            return None
+        ticks, y = intercept
+        self.predictions += 1
+
+        # hit the ball with the end of the bat away from the other bat
+        centre = y + ball.height / 2 - bat.height / 2
+        if self.other.position.y + self.other.height / 2 < SCREEN_HEIGHT / 2:
+            return centre - bat.height * self.aim
+        return centre + bat.height * self.aim
+
+    def act(self):
+
+        sim = self.sim
+        ball = sim.ball
+        key = (sim.gamestate, sim.player_score, sim.opponent_score,
+               sim.wind.x, sim.wind.y, ball.velocity.x < 0)
+        if key != self.key:
+            self.key = key
+            self.target = self.predict()
+
+        bat = self.bat
+        target = self.target
+        if target is None:
+            # wait in the middle for the ball to come back
+            target = (SCREEN_HEIGHT - bat.height) / 2
+        if bat.position.y < target - 1:
+            return INPUT_DOWN
+        elif bat.position.y > target + 1:
+            return INPUT_UP
+        return INPUT_NONE
+
+
+class SearchPolicy(Policy):
+
+    # tries hitting the ball with different parts of the bat by playing
+    # the rest of the rally forward on the match itself (snapshot, step,
+    # restore) and picks the one that sends the ball back steepest
+    # without missing. The other bat is played by chase. The search
+    # starts again whenever the ball's path changes and is spread over
+    # as many ticks as the deadline needs, chasing the ball meanwhile
+
+    name = 'search'
+    kind = 'search'
+    budget = 0.004
+
+    # where on the bat to try hitting the ball, from its middle
+    offsets = (-36, -24, -12, 0, 12, 24, 36)
+    # longest a rally is played forward for, in ticks
+    horizon = 600
+    # steps between looks at the clock
+    check_every = 8
+
+    def reset(self, sim, side):
+
+        Policy.reset(self, sim, side)
+        if side == SIDE_LEFT:
+            self.hit, self.missed = EVENT_PLAYER_HIT, EVENT_OPPONENT_SCORED
+            self.other = sim.opponent
+        else:
+            self.hit, self.missed = EVENT_OPPONENT_HIT, EVENT_PLAYER_SCORED
+            self.other = sim.player
+        self.key = None
+        self.offset = 0
+        self.pending = []
+        self.running = None
+        self.results = {}
+        self.searches = 0
+        self.rollout_ticks = 0
+        # how long check_every steps took last time
+        self.stride = 0.0
+
+    def coming(self):
+
+        return (self.sim.ball.velocity.x < 0) == (self.side == SIDE_LEFT)
+
+    def inputs(self, offset):
+
+        # (left, right) inputs for one step of a rollout
+        sim = self.sim
+        ball_y = sim.ball.position.y + sim.ball.height / 2
+        ours = chaseInputs(self.bat, ball_y + offset)
+        theirs = chaseInputs(self.other, ball_y)
+        if self.side == SIDE_LEFT:
+            return ours, theirs
+        return theirs, ours
+
+    def rollout(self):
+
+        # carry on with the rollout in self.running until it ends or
+        # the deadline passes. Returns True when it has ended
+        sim = self.sim
+        offset, state, ticks = self.running
+        sim.restore(state)
+        deadline = self.deadline
+        score = None
+        last = None
+
+        while score is None:
+            if ticks >= self.horizon or not self.coming():
+                score = 0.0
+                break
+            if deadline is not None and ticks % self.check_every == 0:
+                # stop if there isn't time for another check_every steps
+                now = time.perf_counter()
+                if last is not None:
+                    self.stride = now - last
+                if now + self.stride > deadline:
+                    self.running = (offset, sim.snapshot(), ticks)
+                    return False
+                last = now
+            ticks += 1
+            self.rollout_ticks += 1
+            for event, x, y in sim.step(*self.inputs(offset)):
+                if event == self.hit:
+                    # steeper is harder to return, and the middle of the
+                    # bat is safer when it makes no difference
+                    score = 1000.0 + abs(sim.ball.velocity.y) - abs(offset) / 100
+                elif event == self.missed:
+                    score = -1000.0 + ticks
+
+        self.results[offset] = score
+        self.running = None
+        return True
+
+    def search(self):
+
+        # work through the rollouts still to do, on the match itself.
+        # Each new rollout starts from the match as it is now, as the
+        # bats will have moved on since the search began
+        sim = self.sim
+        state = sim.snapshot()
+        events = sim.events
+        try:
+            while self.pending or self.running is not None:
+                if self.running is None:
+                    self.running = (self.pending.pop(), state, 0)
+                if not self.rollout():
+                    return
+            self.offset = max(self.results, key=self.results.get)
+        finally:
+            sim.restore(state)
+            sim.events = events
+
+    def act(self):
+
+        sim = self.sim
+        ball = sim.ball
+        key = (sim.gamestate, sim.player_score, sim.opponent_score,
+               sim.wind.x, sim.wind.y, ball.velocity.x < 0)
+        if key != self.key:
+            self.key = key
+            self.offset = 0
+            self.results = {}
+            self.running = None
+            self.pending = []
+            if sim.gamestate == GAME_STATE_IN_PROGRESS and self.coming():
+                self.pending = list(self.offsets)
+                self.searches += 1
+
+        if self.pending or self.running is not None:
+            self.search()
+
+        if not self.coming():
+            return chaseInputs(self.bat, SCREEN_HEIGHT / 2)
+        return chaseInputs(self.bat, ball.position.y + ball.height / 2 + self.offset)
+
+
+def features(sim, side):
+
+    # what the learned policy sees, turned round for the left bat so
+    # that the same weights play both sides. x is measured from the
+    # bat's face. A linear policy can't work out where the ball will
+    # reach the bat for itself, so that is given to it too
+    ball = sim.ball
+    bat = sideBat(sim, side)
+    other = sideBat(sim, 1 - side)
+    if side == SIDE_LEFT:
+        face_x = bat.position.x + bat.width
+        x = ball.position.x - face_x
+        vx, wind_x = -ball.velocity.x, -sim.wind.x
+    else:
+        face_x = bat.position.x - ball.width
+        x = face_x - ball.position.x
+        vx, wind_x = ball.velocity.x, sim.wind.x
+    intercept = None
+    if vx > 0:
+        intercept = predictIntercept(sim, face_x)
+    coming = intercept is not None
+    if coming:
+        intercept = (intercept[1] + ball.height / 2) / SCREEN_HEIGHT
+    else:
+        intercept = 0.5
+    return [1.0,
+            x / SCREEN_WIDTH,
+            vx / 8,
+            (ball.position.y + ball.height / 2) / SCREEN_HEIGHT,
+            ball.velocity.y / 8,
+            intercept,
+            float(coming),
+            (other.position.y + other.height / 2) / SCREEN_HEIGHT * coming,
+            wind_x / 0.4,
+            sim.wind.y / 0.4]
+
+
+class LearnedPolicy(Policy):
+
+    # a linear guess at where the middle of the bat should be, with
+    # weights from WEIGHTS_PATH made by fitWeights
+
+    name = 'learned'
+    kind = 'learned'
+    budget = 0.001
+
+    weights = None
+
+    def reset(self, sim, side):
+
+        Policy.reset(self, sim, side)
+        if LearnedPolicy.weights is None:
+            if not WEIGHTS_PATH.exists():
+                raise ValueError('no weights at {}, make them with: python3 policies.py fit'.format(WEIGHTS_PATH))
+            with open(WEIGHTS_PATH) as f:
+                LearnedPolicy.weights = json.load(f)['weights']
+
+    def act(self):
+
+        x = features(self.sim, self.side)
+        target = sum(w * v for w, v in zip(self.weights, x)) * SCREEN_HEIGHT
+        return chaseInputs(self.bat, target)
+
+
+POLICIES = {policy.name: policy for policy in (Policy, ChasePolicy, LazyPolicy, RandomPolicy, PredictPolicy,
+                                               SearchPolicy, LearnedPolicy)}
+
+def makePolicy(name, seed=None):
+
+    try:
+        policy = POLICIES[name]
+    except KeyError:
+        raise ValueError('unknown policy {!r}, choose from {}'.format(name, ', '.join(sorted(POLICIES))))
+    return policy(seed)
+
+#=======================================================================
+# BudgetedPolicy class
+# keeps a policy to its cpu budget
+#=======================================================================
+
+class BudgetedPolicy():
+
+    # call startFrame at the start of every frame, the ticks run
+    # before the next call share the policy's budget. A policy that
+    # goes over it plays chase for the next few frames, for longer
+    # each time it goes over again
+
+    def __init__(self, policy, budget=None):
+
+        self.policy = policy
+        self.budget = policy.budget if budget is None else budget
+        self.fallback = ChasePolicy()
+        self.name = policy.name
+        # cpu time the policy has taken this frame
+        self.spent = 0.0
+        self.overran = False
+        self.benched = 0
+        self.bench_frames = BENCH_FRAMES
+        self.ticks = 0
+        self.overruns = 0
+        self.fallback_ticks = 0
+        self.times = collections.deque(maxlen=1000)
+
+    def reset(self, sim, side):
+
+        self.policy.reset(sim, side)
+        self.fallback.reset(sim, side)
+
+    def startFrame(self):
+
+        if self.overran:
+            # rest it for a while, longer each time it happens again
+            self.benched = self.bench_frames
+            self.bench_frames = min(self.bench_frames * 2, MAX_BENCH_FRAMES)
+        elif self.benched > 0:
+            self.benched -= 1
+        else:
+            self.bench_frames = BENCH_FRAMES
+        self.overran = False
+        self.spent = 0.0
+
+    def act(self):
+
+        self.ticks += 1
+        remaining = self.budget - self.spent
+        if self.benched > 0 or remaining <= 0:
+            # resting, or nothing left this frame. chase costs next
+            # to nothing
+            self.fallback_ticks += 1
+            return self.fallback.act()
+
+        start = time.perf_counter()
+        self.policy.deadline = start + remaining
+        inputs = self.policy.act()
+        elapsed = time.perf_counter() - start
+        self.spent += elapsed
+        self.times.append(elapsed)
+        if elapsed > remaining:
+            self.overruns += 1
+            self.overran = True
+        return inputs
+
+    def stats(self):
+
+        times = list(self.times)
+        return {'policy': self.name,
+                'budget_ms': 1000 * self.budget,
+                'ticks': self.ticks,
+                'overruns': self.overruns,
+                'fallback_ticks': self.fallback_ticks,
+                'act_ms_p50': 1000 * percentile(times, 50),
+                'act_ms_p99': 1000 * percentile(times, 99),
+                'act_ms_max': 1000 * max(times) if times else 0.0}
+
+
+def fitWeights(ticks, seed=1):
+
+    # fit LearnedPolicy's weights to copy where predict puts its bat,
+    # playing predict against chase on both sides, by least squares
+    import numpy as np
+
+    rows = []
+    targets = []
+    sim = None
+    teacher = PredictPolicy()
+    other = ChasePolicy()
+    for tick in range(ticks):
+        if sim is None or sim.isOver():
+            seed += 1
+            sim = Simulation(seed)
+            side = seed % 2
+            teacher.reset(sim, side)
+            other.reset(sim, 1 - side)
+
+        action = teacher.act()
+        if sim.gamestate == GAME_STATE_IN_PROGRESS:
+            target = teacher.target
+            if target is None:
+                target = (SCREEN_HEIGHT - teacher.bat.height) / 2
+            rows.append(features(sim, side))
+            targets.append((target + teacher.bat.height / 2) / SCREEN_HEIGHT)
+
+        bits = [action, other.act()]
+        if side == SIDE_RIGHT:
+            bits.reverse()
+        if sim.gamestate == GAME_STATE_INTRO:
+            bits[0] |= INPUT_SERVE
+        sim.step(*bits)
+
+    x = np.array(rows)
+    y = np.array(targets)
+    weights = np.linalg.lstsq(x, y, rcond=None)[0]
+    error = float(np.sqrt(np.mean((x @ weights - y) ** 2)) * SCREEN_HEIGHT)
+    return weights.tolist(), error, len(rows)
+
+def main():
+
+    parser = argparse.ArgumentParser(description='computer players for pong')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    fit = commands.add_parser('fit', help='fit the learned policy to copy predict')
+    fit.add_argument('--ticks', type=int, default=200000, help='ticks of play to learn from (default %(default)s)')
+    fit.add_argument('--seed', type=int, default=1, help='seed of the first match (default %(default)s)')
+    fit.add_argument('--out', default=str(WEIGHTS_PATH), help='where to write the weights (default %(default)s)')
+    args = parser.parse_args()
+
+    weights, error, samples = fitWeights(args.ticks, args.seed)
+    path = pathlib.Path(args.out)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'teacher': PredictPolicy.name, 'samples': samples, 'rms_error': error,
+                   'weights': weights}, f, indent=1)
+    print('fitted on {} ticks, {:.1f} pixels from where predict puts its bat on average, written to {}'.format(
+        samples, error, path))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,33 @@
 import pygame
-import math
 import random
 import pathlib
-from noiseengine import NoiseEngine1D
+import argparse
+import time
+import numpy as np
+from noiseengine import NoiseEngine1D, BACKEND_AUTO, BACKEND_FAST, BACKEND_OPENSIMPLEX
 from vector import Vector2
+from particleengine import ParticleEngine
+from spritecache import SpriteCache
+from starfield import StarField, STAR_MAX_SIZE
+from renderers import FullScreenRenderer, DirtyRectRenderer
+from replay import Replay, ReplayRecorder, MIN_SEED, MAX_SEED
+from snapshots import SnapshotRing
+from netplay import NetworkClient, parseAddress, printStats, SIDE_LEFT, SIDE_RIGHT
+from rollback import RollbackSession, UdpTransport, DEFAULT_INPUT_DELAY
+from policies import POLICIES, makePolicy, BudgetedPolicy
+from profiler import Profiler, ProfilerOverlay
+from simulation import (Simulation, GAME_STATE_INTRO, GAME_STATE_IN_PROGRESS,
+                        GAME_STATE_SCORED, GAME_STATE_OVER, SCREEN_WIDTH,
+                        SCREEN_HEIGHT, INPUT_NONE, INPUT_UP,
+                        INPUT_DOWN, INPUT_SERVE, EVENT_WALL_BOUNCE,
+                        EVENT_PLAYER_HIT, EVENT_OPPONENT_HIT,
+                        EVENT_PLAYER_SCORED, EVENT_OPPONENT_SCORED,
+                        EVENT_SERVE, BASE_TICK_RATE)
   
 # ======================================================================
 # constants to help code readability
 # ======================================================================
 
-GAME_STATE_INTRO       = 0
-GAME_STATE_IN_PROGRESS = 1
-GAME_STATE_SCORED      = 2
-GAME_STATE_OVER        = 3
-SCREEN_WIDTH = 1200
-SCREEN_HEIGHT = 600
-ORIGINX = SCREEN_WIDTH // 2
-ORIGINY = SCREEN_HEIGHT // 2
 COLOUR_BLACK  = [0,0,0]
 COLOUR_WHITE  = [255,255,255]
 COLOUR_STARS  = [100,50,255]
@@ -25,6 +36,15 @@ COLOUR_RED    = [255,0,0]
 
 particles_SPAWN_FROM_OPPONENT = 180
 particles_SPAWN_FROM_PLAYER   = 0
+particles_ALPHA_STEP          = 8
+
+# the longest real time step the game loop will catch up on in one go
+MAX_FRAME_TIME = 0.25
+
+# how far back the game can be rewound, and how far each
+# press of the rewind key goes, in seconds
+REWIND_SECONDS = 10
+REWIND_STEP = 1
 
 # ======================================================================
 # setup pygame
@@ -94,394 +114,148 @@ for loc in image_offsets:
     img = image_pong_numbers.subsurface(loc)
     image_numbers.append(img)
     
+# ======================================================================
+# build the sprite cache
+# ======================================================================
+# every small square the stars, particals and ball trail draw with is
+# made here once, so nothing allocates a surface while the game runs
 
-#=======================================================================
-# some utility functions
-#=======================================================================
+particles_SIZES = [1, 2, 3, 4]
+particles_PALETTE = [COLOUR_YELLOW, COLOUR_RED]
+TRAIL_LENGTH = 31
+TRAIL_INTERVAL = 3
 
-def maprange( a, b, val):
-    # map val from range a to range b
-    (a1, a2), (b1, b2) = a, b
-    return  b1 + ((val - a1) * (b2 - b1) / (a2 - a1)) 
-        
-def clamp(n, minn, maxn):
-        
-    if n < minn:
-        return minn
-    elif n > maxn:
-        return maxn
-    else:
-        return n
-        
-#=======================================================================
-# Partical class
-#=======================================================================
-
-class Partical():
-    
-    def __init__(self, pos, angle, speed, size, colour):
-        
-        self.pos = Vector2(pos.x, pos.y)
-        self.vel = Vector2(0, 0)
-        self.acc = Vector2(0,0)     
-        self.size = size
-        self.alpha = 255   
-        self.acc.setFromAngle(angle)
-        self.acc.mult(speed)
-        self.image = pygame.Surface([self.size, self.size])
-        self.image.fill(colour)
-        self.image.set_alpha(self.alpha)
-        
-    def update(self):
-        
-        self.vel.add(self.acc)
-        self.pos.add(self.vel)
-        self.alpha -= abs(self.vel.y)
-        self.alpha = max(0,self.alpha)
-        self.image.set_alpha(self.alpha)
-        
-    def draw(self):
-        
-        screen.blit(self.image, (self.pos.x, self.pos.y))
-        
-    def isOffScreen(self):
-        
-        return (self.pos.x < 0) or (self.pos.x > SCREEN_WIDTH) or (self.pos.y < 0) or (self.pos.y > SCREEN_HEIGHT)
-        
-    def isDead(self):
-        
-        return (self.alpha <= 0) or (self.isOffScreen())
+def trailRamp(length):
     
+    # the trail colours from oldest to newest sample
+    top = max(1, length - 1)
+    return [[100, 60 * i // top, 100 + 60 * i // top] for i in range(length)]
 
-#=======================================================================
-# particlesystem class
-#=======================================================================
-
-class particlesystem():
-    
-    def __init__(self, x, y, mx = 20):
-        
-        self.pos = Vector2(x, y)
-        self.particles = []
-        self.max_particles = mx
-        
-    def killAll(self):
-        
-        self.particles = []
-        
-    def burstDirection(self, angle, spread):
-        
-        self.killAll()
-        for n in range(0, self.max_particles):
-            # vary the angle a little bit
-            angle = (angle + random.uniform(-spread, spread)) % 360
-            speed = random.uniform(0.1, 0.7)
-            size = random.randint(1, 4)
-            p = Partical(self.pos, angle, speed, size, COLOUR_YELLOW)
-            self.particles.append(p)
-            
-    def burstCircle(self):
-        
-        self.killAll()
-        step = 360 // self.max_particles
-        for n in range(0, self.max_particles):
-            angle = n * step
-            speed = random.uniform(0.1, 0.7)
-            size = random.randint(1, 4)
-            colour = COLOUR_RED
-            p = Partical(self.pos, angle, speed, size, colour)
-            self.particles.append(p)
-            
-    def update(self):
-        
-        cp = [p for p in self.particles if not p.isDead()]
-        self.particles = cp
-        for p in self.particles:
-            p.update()
-            p.draw()
-        
-    def isDead(self):
-        
-        return len(self.particles) == 0
-        
+sprites = SpriteCache(particles_ALPHA_STEP)
+sprites.build(particles_SIZES, [COLOUR_STARS])
+sprites.build(particles_SIZES, particles_PALETTE, faded=True)
+sprites.build([1], trailRamp(TRAIL_LENGTH))
 
 #=======================================================================
 # particlesystemController class
+# spawns bursts into a pooled ParticleEngine and draws them in one go
 #=======================================================================
 
 class particlesystemController():
     
-    def __init__(self):
+    def __init__(self, seed=None):
         
-        self.systems = []
+        self.palette = particles_PALETTE
+        self.engine = ParticleEngine(SCREEN_WIDTH, SCREEN_HEIGHT, self.palette)
+        self.random = np.random.default_rng(seed)
+        # particals are drawn from the pre-faded squares in the sprite
+        # cache, indexed by [colour][size][alpha level]
+        self.images = sprites.table(particles_SIZES, self.palette)
         
-    def spawn(self, x, y, mx):
+    def spawn(self, x, y, angles, colour):
         
-        system = particlesystem(x, y, mx)
-        self.systems.append(system)
-        return system
+        count = len(angles)
+        speeds = self.random.uniform(0.1, 0.7, count)
+        sizes = self.random.integers(1, 5, count)
+        self.engine.spawn(x, y, angles, speeds, sizes, colour)
         
     def spawnBurstDirection(self, x, y, angle, spread, max_particles = 20):
         
-        system = self.spawn(x, y, max_particles)
-        system.burstDirection(angle, spread)
+        # each partical varies the angle of the last one a little bit
+        angles = (angle + np.cumsum(self.random.uniform(-spread, spread, max_particles))) % 360
+        self.spawn(x, y, angles, 0)
         
     def spawnBurstCircle(self, x, y, max_particles = 20):
         
-        system = self.spawn(x, y, max_particles)
-        system.burstCircle()
+        step = 360 // max_particles
+        angles = np.arange(max_particles) * step
+        self.spawn(x, y, angles, 1)
         
     def killAll(self):
         
-        self.systems = []
-    
-    def update(self):
-        
-        cp = [ps for ps in self.systems if not ps.isDead()]
-        self.systems = cp
-        for s in self.systems:
-            s.update()       
-
-        
-#=======================================================================
-# Star class
-#=======================================================================
-
-class Star():
-    
-    def __init__(self):
-        
-        self.position = Vector2(random.randint(0, SCREEN_WIDTH), random.randint(0, SCREEN_HEIGHT))
-        self.velocity = Vector2(0.0, 1 + random.random() * 10)
-        self.size = random.randint(1,4)
-        self.image = pygame.Surface([self.size, self.size])
-        self.rect = self.image.get_rect()
-        self.image.fill(COLOUR_STARS)
-
-    def reset(self):
-        
-        self.position.y = 0
-        self.position.x = random.randint(0, SCREEN_WIDTH)
-        self.velocity.y = 1 + random.random() * 10
-        
-    def update(self):
-        
-        # add a little to vel each frame to make it look a bit 
-        # like gravity is pulling it down like rain
-        # reset() will set vel back to a baseline
-        
-        self.velocity.y += 0.05
-        self.position.add(self.velocity)
-        self.rect.x = self.position.x
-        self.rect.y = self.position.y
+        self.engine.killAll()
         
     def draw(self):
         
-        screen.blit(self.image, self.rect)
-
-
-#=======================================================================
-# Starfield class
-#=======================================================================
-
-class StarField():
-    
-    def __init__(self):
-        
-        self.stars = []
-        self.max_stars = 40
-        
-        for i in range(0, self.max_stars):
-            star = Star()
-            self.stars.append(star)
-            
-    def update(self):
+        engine = self.engine
+        n = engine.count
+        if n == 0:
+            return []
         
-        for star in self.stars:
-            star.update()
-            
-            if star.position.y > SCREEN_HEIGHT:
-                star.reset()
-                
-    def draw(self):
-        
-        for star in self.stars:
-            star.draw()
-
-
-#=======================================================================
-# Player class
-#=======================================================================
-
-class Player():
+        levels = (engine.alpha[:n] * sprites.top // 255).astype(np.int32)
+        images = self.images
+        return screen.blits([(images[colour][size][level], (x, y)) for size, colour, level, (x, y) in
+                             zip(engine.size[:n].tolist(), engine.colour[:n].tolist(), levels.tolist(), engine.position.data[:n].tolist())])
     
-    def __init__(self, x, y, w, h, maxspeed):
-        
-        self.width = w
-        self.height = h
-        self.maxspeedy = maxspeed
-        self.maxposition_y = SCREEN_HEIGHT - self.height
-        self.start_position = Vector2(x, y)
-        self.position = Vector2(self.start_position.x, self.start_position.y)
-        self.velocity = Vector2(0,0)
-        self.acceleration = Vector2(0,0)
-        self.acceleration_step = 1.5
-        self.rect = pygame.Rect([self.position.x, self.position.y, self.width, self.height])
-        self.image = pygame.Surface([self.width, self.height])
-        self.image.fill(COLOUR_WHITE)
-        
-    def reset(self):
-        
-        self.position = Vector2(self.start_position.x, self.start_position.y)
-        self.velocity.mult(0)
-        self.acceleration.mult(0)
-        
-    def up(self):
-        
-        self.acceleration.y -= self.acceleration_step
-        
-    def down(self):
-        
-        self.acceleration.y += self.acceleration_step
-        
-    def constrain(self):
-        
-        # constrain movement to screen bounds
-        if self.position.y < 0:
-            self.position.y = 0
-            self.velocity.y = 0
-        elif self.position.y > self.maxposition_y:
-            self.position.y = self.maxposition_y
-            self.velocity.y = 0
-            
     def update(self):
         
-        self.velocity.add(self.acceleration)
+        self.engine.update()
         
-        # limit the speed
-        self.velocity.y = clamp(self.velocity.y, -self.maxspeedy, self.maxspeedy)
-
-        # add velocity to position   
-        self.position.add(self.velocity)
-        # clear out the accumulated acceleration 
-        self.acceleration.mult(0)
+    def snapshot(self):
         
-        self.constrain()
-            
-        self.rect.x = self.position.x
-        self.rect.y = self.position.y
+        return self.engine.snapshot(), self.random.bit_generator.state
         
-    def draw(self):
+    def restore(self, snapshot):
         
-        screen.blit(self.image, self.rect)
-
+        engine, state = snapshot
+        self.engine.restore(engine)
+        self.random.bit_generator.state = state
 
+        
 #=======================================================================
 # Balltrail class
 #=======================================================================
 
 class Balltrail():
     
-    def __init__(self, size):
+    # the last length ball positions, one taken every interval frames,
+    # kept in a fixed size ring buffer so adding a sample never has to
+    # shift the others along
+    
+    def __init__(self, size, length=TRAIL_LENGTH, interval=TRAIL_INTERVAL):
         
         self.size = size
         self.pad = self.size // 2
-        self.current_frame = 0
-        self.last_frame = 0
-        self.max_length = 30
-        self.trail = []
+        self.length = length
+        self.interval = interval
+        self.frames = 0
+        self.samples = np.zeros((length, 2))
+        self.head = 0
+        self.count = 0
+        # one pre-made pixel for each step of the colour ramp,
+        # the oldest sample is drawn with the first
+        self.images = [sprites.get(1, colour) for colour in trailRamp(length)]
         
     def reset(self):
         
-        self.trail.clear()
+        self.head = 0
+        self.count = 0
         
     def update(self, x, y):
         
-        self.current_frame += 1
+        self.frames += 1
         
-        # record a ball position every 3 frames
-        if self.current_frame - self.last_frame > 2:
-            
-            self.last_frame = self.current_frame
+        # record a ball position every interval frames
+        if self.frames >= self.interval:
             
-            if len(self.trail) > self.max_length:
-                # remove the oldest item
-                self.trail.pop(0)
-            
-            # and add the current position of the ball    
-            self.trail.append( (x, y) )
-        
-    def draw(self):
-        
-        alpha = 0
-
-        for r in self.trail:
-            pygame.draw.rect(screen, [100, alpha, 100 + alpha], [r[0] + self.pad,r[1] + self.pad, 1 , 1])
-            alpha += 2
-        
+            self.frames = 0
+            # overwrite the oldest sample once the buffer is full
+            self.samples[self.head] = (x + self.pad, y + self.pad)
+            self.head = (self.head + 1) % self.length
+            self.count = min(self.count + 1, self.length)
         
-#=======================================================================
-# Ball class
-#=======================================================================
-
-class Ball():
-    
-    def __init__(self, size):
-        
-        self.mass = 8
-        self.width = size
-        self.height = size
-        self.position = Vector2(SCREEN_WIDTH // 2 - self.width // 2, SCREEN_HEIGHT // 2 - self.height // 2)
-        self.velocity = Vector2(-5,0)
-        self.acceleration = Vector2(0,0)
-        self.rect = pygame.Rect([self.position.x,self.position.y, self.width, self.height])
-        self.image = pygame.Surface([self.width, self.height])
-        self.image.fill(COLOUR_WHITE)
-        self.balltrail = Balltrail(size)
-
-    def reset(self):
-        
-        self.balltrail.reset()
-        
-        bally = random.randint(-1,1)
-        ballx = 4
-        
-        if game.playerserve:
-            ballx = -ballx
-        
-        self.position = Vector2(SCREEN_WIDTH // 2 - self.width // 2, SCREEN_HEIGHT // 2 - self.height // 2)
-        self.velocity = Vector2(ballx,bally) 
-        
-    def applyForce(self, f):
-        
-        # make a copy to preserve the original vector values
-        fcopy = f.getCopy()
-        # divide the force by our mass
-        fcopy.div(self.mass)
-        self.acceleration.add(fcopy)
-
-    def update(self):
-        
-        # add acceleration to velocity
-        self.velocity.add(self.acceleration)
-        
-        # add it to our position vector and we move a bit towards target
-        self.position.add(self.velocity)
+    def positions(self):
         
-        # important to clear out the accumulated acceleration each frame
-        self.acceleration.mult(0)
+        # the samples from oldest to newest
+        if self.count < self.length:
+            return self.samples[:self.count]
+        return np.roll(self.samples, -self.head, axis=0)
         
-        self.rect.x = self.position.x
-        self.rect.y = self.position.y
-    
-        self.balltrail.update(self.position.x,self.position.y)
-
     def draw(self):
         
-        self.balltrail.draw()
-        screen.blit(self.image, self.rect)
+        return screen.blits(list(zip(self.images, self.positions().tolist())))
+        
         
-
 #=======================================================================
 # Arena class draws the game borders and scoreboard
 #=======================================================================
@@ -495,329 +269,551 @@ class Arena():
         self.position = Vector2(SCREEN_WIDTH // 2 - self.width // 2, 0)
         self.player_score_position = Vector2((SCREEN_WIDTH // 2) - 300, (SCREEN_HEIGHT // 2)-52)
         self.opponent_score_position = Vector2((SCREEN_WIDTH // 2) + 180, (SCREEN_HEIGHT // 2)-52)
+        self.background = None
+        self.scores = None
 
     def update(self):
         
         pass
         
-    def draw(self):
+    def getBackground(self, surface, player_score, opponent_score):
+        
+        # the centre line and scores only change when someone scores,
+        # so they are drawn once onto a background the size of surface
+        # and moving things are drawn over the top of it each frame
+        # a new surface is made each time so that renderers can tell
+        # the background has changed
+        scores = (player_score, opponent_score)
+        size = surface.get_size()
         
-        pygame.draw.rect(screen,[100,100,100],[self.position.x,self.position.y, self.width, self.height])
+        if self.background is None or self.background.get_size() != size or scores != self.scores:
+            self.background = pygame.Surface(size).convert()
+            self.background.fill(COLOUR_BLACK)
+            self.draw(self.background, player_score, opponent_score)
+            self.scores = scores
+            
+        return self.background
+        
+    def draw(self, surface, player_score, opponent_score):
         
-        screen.blit(image_numbers[game.player_score % 10 ], (self.player_score_position.x, self.player_score_position.y))
-        screen.blit(image_numbers[game.opponent_score % 10 ], (self.opponent_score_position.x, self.opponent_score_position.y))
+        return [pygame.draw.rect(surface,[100,100,100],[self.position.x,self.position.y, self.width, self.height]),
+                surface.blit(image_numbers[player_score % 10 ], (self.player_score_position.x, self.player_score_position.y)),
+                surface.blit(image_numbers[opponent_score % 10 ], (self.opponent_score_position.x, self.opponent_score_position.y))]
 
 
 #=======================================================================
 # Game class 
-# Handles collisions and constraints and player movement
+# Draws the simulation and turns its events into sounds and particals
 #=======================================================================
 
 class Game():
 
-    def __init__(self):
-        
-        # player size and limits
-        playerwidth = 20
-        playerheight = 80
-        playerspeed = 3.0
-        opponentspeed = 2.8
-        ballsize = 8
-        player_edge_offset = 10
-
-        # ball limits
-        self.ball_max_speed_x = 8.0
-        self.ball_max_speed_y = 8.0
-        self.ball_speed_step = 1.2
-        
-        # these are the x positions that the ball is reset to following
-        # a rectscollide with either bat to prevent ball going through bat
-        self.ball_rebound_player_x = player_edge_offset + playerwidth + ballsize
-        self.ball_rebound_opponent_x = SCREEN_WIDTH - (player_edge_offset + playerwidth) - ballsize
-        
-        self.playerserve = True # this toggles who serves
-        
-        self.gamestate = GAME_STATE_INTRO
-        self.scored_frames_elapsed = 0
-        self.player_score = 0
-        self.opponent_score = 0
-        self.wind = Vector2(0,0)
-        self.wind_strength = 0.4
-        
-        self.player      = Player(player_edge_offset, (SCREEN_HEIGHT // 2) - playerheight // 2, playerwidth, playerheight, playerspeed)
-        self.opponent    = Player(SCREEN_WIDTH - (player_edge_offset + playerwidth), (SCREEN_HEIGHT // 2) - playerheight // 2, playerwidth, playerheight, opponentspeed)
-        self.ball        = Ball(ballsize)
-        self.arena       = Arena()
-        self.noiseengine = NoiseEngine1D(random.randint(1,100))
-        self.starfield   = StarField()
-        self.psc         = particlesystemController()
-        
-    def checkcollisionBallEdges(self):
+    def __init__(self, seed=None, tick_rate=BASE_TICK_RATE, stars=40, star_layers=1,
+                 trail_length=TRAIL_LENGTH, trail_interval=TRAIL_INTERVAL,
+                 noise_backend=BACKEND_AUTO):
         
-        # if the ball is at or past either the top or bottom edges of
-        # the court, reverse the y velocity and bring its position back
-        # within the bounds of the court. This 'bounces' the ball
-        # back off the edges
+        # everything random in a game, the effects included, comes from
+        # this one seed so a recorded match looks the same when replayed
+        if seed is None:
+            seed = random.randrange(2**63)
+        self.seed        = seed
+        effects          = random.Random(seed)
         
-        if (self.ball.position.y < 0) or (self.ball.position.y > SCREEN_HEIGHT-self.ball.height):
-            if self.ball.position.y < 0:
-                self.ball.position.y = 0
-                self.ball.velocity.y = -self.ball.velocity.y
-            else:
-                self.ball.position.y = SCREEN_HEIGHT-self.ball.height
-                self.ball.velocity.y = -self.ball.velocity.y
+        self.sim         = Simulation(seed, tick_rate, noise_backend)
+        self.arena       = Arena()
+        self.balltrail   = Balltrail(self.sim.ball.width, trail_length, trail_interval)
+        # the title screens get their own noise so that drawing them
+        # does not change the wind in the simulation
+        self.noiseengine = NoiseEngine1D(effects.randint(1,100), self.sim.noiseengine.backend)
+        self.randoff1    = 0
+        self.randoff2    = 0
+        self.effect_frames = 0.0
+        self.starfield   = StarField(SCREEN_WIDTH, SCREEN_HEIGHT, stars, star_layers, effects.randrange(2**32))
+        self.star_images = self.makeStarImages()
+        self.psc         = particlesystemController(effects.randrange(2**32))
+        self.recorder    = None
+        self.network     = None
+        self.opponent    = None
+        self.muted       = False
+        # times every part of every frame, F3 shows them
+        self.profiler    = Profiler()
+        # a snapshot of the game after every tick for rewinding
+        self.snapshots   = SnapshotRing(REWIND_SECONDS * tick_rate)
+        self.snapshots.push(self.snapshot())
+        self.bat_image   = pygame.Surface([self.sim.player.width, self.sim.player.height])
+        self.bat_image.fill(COLOUR_WHITE)
+        self.ball_image  = pygame.Surface([self.sim.ball.width, self.sim.ball.height])
+        self.ball_image.fill(COLOUR_WHITE)
+        
+    def makeStarImages(self):
+        
+        # a square of every star size in each layer's colour
+        images = []
+        for layer in range(self.starfield.layers):
+            colour = self.starfield.layerColour(COLOUR_STARS, layer)
+            images.append([None] + [sprites.get(size, colour) for size in range(1, STAR_MAX_SIZE + 1)])
+        return images
+        
+    def drawStars(self):
+        
+        return self.starfield.draw(screen, self.star_images)
+        
+    def playSound(self, sound):
+        
+        if not self.muted:
+            sound.play()
+            
+    def handleEvents(self, events):
+        
+        # play the sounds and spawn the partical systems for
+        # everything that happened in the last simulation step
+        for event, x, y in events:
+            
+            if event == EVENT_WALL_BOUNCE:
+                self.playSound(sound_blip2)
+                self.psc.spawnBurstCircle(x, y)
+            elif event == EVENT_PLAYER_HIT:
+                self.playSound(sound_blip)
+                self.psc.spawnBurstDirection(30, y, particles_SPAWN_FROM_PLAYER, 4)
+            elif event == EVENT_OPPONENT_HIT:
+                self.playSound(sound_blip)
+                self.psc.spawnBurstDirection(SCREEN_WIDTH-30, y, particles_SPAWN_FROM_OPPONENT, 4)
+            elif event == EVENT_OPPONENT_SCORED:
+                self.playSound(sound_score)
+                self.psc.spawnBurstDirection(1, y, particles_SPAWN_FROM_PLAYER, 20, 100)
+            elif event == EVENT_PLAYER_SCORED:
+                self.playSound(sound_score)
+                self.psc.spawnBurstDirection(SCREEN_WIDTH-1, y, particles_SPAWN_FROM_OPPONENT, 20, 100)
+            elif event == EVENT_SERVE:
+                self.playSound(sound_boom)
+                self.balltrail.reset()
+                self.psc.spawnBurstCircle(x, y, 100)
                 
-            sound_blip2.play()
-            self.psc.spawnBurstCircle(self.ball.position.x, self.ball.position.y)
-            
-    def checkcollisionBats(self):
-        
-        # check if ball is colliding with either bat. 
-        # if true reflect ball velocity x
-        # use the reflectAngle function to work out how much
-        # to add to the y velocity.
-
-        if self.ball.rect.colliderect(self.player.rect):
-            
-            # work out where on the bat the ball hit here
-            self.ball.velocity.y = self.reflectAngle(self.player)
-            self.ball.velocity.x = -self.ball.velocity.x 
-            
-            # a fudge to stop ball penetrating bat at higher ball speeds
-            self.ball.position.x = self.ball_rebound_player_x
-            self.batHit()
-            # spawn a partical system
-            self.psc.spawnBurstDirection(30, self.ball.position.y, particles_SPAWN_FROM_PLAYER, 4)
-            
-        elif self.ball.rect.colliderect(self.opponent.rect):
-            
-            self.ball.velocity.y = self.reflectAngle(self.opponent)
-            self.ball.velocity.x = -self.ball.velocity.x
-            self.ball.position.x = self.ball_rebound_opponent_x
-            self.batHit()
-            self.psc.spawnBurstDirection(SCREEN_WIDTH-30, self.ball.position.y, particles_SPAWN_FROM_OPPONENT, 4)
-            
-    def batHit(self):
-        
-        # called when the ball has hit either bat
-        sound_blip.play()
-        self.setWind()
-        
-        # increase the ball x velocity each hit
-        # but keep it limited to x max speed
-        if self.ball.velocity.x < self.ball_max_speed_x:
-            self.ball.velocity.x *= self.ball_speed_step
-        else:
-            self.ball.velocity.x = self.ball_max_speed_x
-            
-        # reflectangle has already been applied so just
-        # keep vel y within bounds
-        if self.ball.velocity.y > self.ball_max_speed_y:
-            self.ball.velocity.y = self.ball_max_speed_y
-            
-    def setWind(self):
-        
-        # gets a random direction and strength for the wind effect
-        # the effect is mostly on the balls vertical movement
-        # called when the ball hits a bat
-        self.wind.x = self.noiseengine.next(100) * (self.wind_strength / 4)
-        self.wind.y = self.noiseengine.next() * self.wind_strength
-        
-    def reflectAngle(self, player):
-        
-        # returns an y velocity to reflect the ball at. 
-        # subtract paddle y pos from ball y pos to get the position that
-        # the ball is on the paddle 
-        # then / by player height to get a normalised 0 to 1.0 value
-        # then add -0.5 to shift the range from -0.5 to 0.5 which
-        # can then be multiplied to produce a y velocity for the ball
-        
-        return (((self.ball.position.y - player.position.y) / player.height) + -0.5) * 8
-        
-    def moveOpponent(self):
-        
-        # TODO:
-        # Make the enemy more intelligent.
-        # seek to position towards one end of bat for more angle
-        
-        if self.opponent.position.y < self.ball.position.y - self.opponent.height // 2:
-            self.opponent.down()
-        elif self.opponent.position.y > self.ball.position.y - self.opponent.height // 2:
-            self.opponent.up()
-            
-    def checkBallInScorePosition(self):
-    
-        # if true score and reset game
-    
-        if self.ball.position.x < 0:
-            self.opponent_score += 1
-            self.psc.spawnBurstDirection(1, self.ball.position.y, particles_SPAWN_FROM_PLAYER, 20, 100)
-            sound_score.play()
-            self.gamestate = GAME_STATE_SCORED
-        elif self.ball.position.x > SCREEN_WIDTH:
-            self.player_score += 1
-            self.psc.spawnBurstDirection(SCREEN_WIDTH-1, self.ball.position.y, particles_SPAWN_FROM_OPPONENT, 20, 100)
-            sound_score.play()
-            self.gamestate = GAME_STATE_SCORED
-            
-    def resetFromScore(self):
+    def update(self, dt):
         
-        # called after a score has been made
-        # reset the player positions and 
-        # zero the wind effect and
-        # toggle the server
+        # the stars, particals, trail and title jitter are all tuned
+        # in 60Hz frames, so step them once for every whole frame of
+        # simulation time whatever the tick or render rate is
+        sim = self.sim
+        self.effect_frames += dt
         
-        self.playerserve = not self.playerserve
-        self.resetPositions()
+        profiler = self.profiler
         
-        # check if either player has won the game
-        # and switch the gamestate to gameover if it has
-        
-        if self.player_score == 5 or self.opponent_score == 5:
-            self.gamestate = GAME_STATE_OVER
-        else:
-            self.gamestate = GAME_STATE_IN_PROGRESS
-            
-    def resetFromWin(self):
-        
-        # called after a game win
-        # resets score and positions etc
-        self.player_score = 0
-        self.opponent_score = 0
-        self.resetPositions()
-            
-    def resetPositions(self):
-        
-        # called at each serve
-        self.ball.reset()
-        self.player.reset()
-        self.opponent.reset()
-        self.wind.mult(0)
-        self.psc.spawnBurstCircle(ORIGINX, ORIGINY, 100)
-        sound_boom.play()
-        
-    def switchGameState(self):
-        
-        if self.gamestate == GAME_STATE_INTRO:
-            
-            self.gamestate = GAME_STATE_IN_PROGRESS
-            image_pong_title.set_alpha(75)
-            self.resetPositions()
+        while self.effect_frames >= 1:
             
-        elif self.gamestate == GAME_STATE_OVER:
-            
-            self.resetFromWin()
-            self.gamestate = GAME_STATE_INTRO
+            self.effect_frames -= 1
+            self.randoff1 = self.noiseengine.next()
+            self.randoff2 = self.noiseengine.next(1000)
+            profiler.lap('titles')
+            self.starfield.update()
+            profiler.lap('starfield')
+            self.psc.update()
+            profiler.lap('particles')
             
+            if sim.gamestate == GAME_STATE_IN_PROGRESS:
+                self.balltrail.update(sim.ball.position.x, sim.ball.position.y)
+                profiler.lap('trail')
+                
     def drawGameOver(self):
         
-        randoff1 = self.noiseengine.next()
-        randoff2 = self.noiseengine.next(1000)
+        randoff1 = self.randoff1
+        randoff2 = self.randoff2
         jitter = 10
         
         image_pong_game.set_alpha(150 + randoff1 * 50)
         image_pong_over.set_alpha(150 + randoff2 * 50)
         
-        screen.blit(image_pong_game, (200 + randoff1 * jitter, 150 + randoff2 * jitter))
-        screen.blit(image_pong_over, (400 + randoff2 * jitter, 250 + randoff1 * jitter))
+        return [screen.blit(image_pong_game, (200 + randoff1 * jitter, 150 + randoff2 * jitter)),
+                screen.blit(image_pong_over, (400 + randoff2 * jitter, 250 + randoff1 * jitter))]
         
     def drawGameWon(self):
         
-        randoff1 = self.noiseengine.next()
-        randoff2 = self.noiseengine.next(1000)
+        randoff1 = self.randoff1
+        randoff2 = self.randoff2
         jitter = 10
         
         image_pong_you.set_alpha(100 + randoff1 * 50)
         image_pong_won.set_alpha(100 + randoff2 * 50)
         
-        screen.blit(image_pong_you, (200 + randoff1 * jitter, 150 + randoff2 * jitter))
-        screen.blit(image_pong_won, (400 + randoff2 * jitter, 250 + randoff1 * jitter))
+        return [screen.blit(image_pong_you, (200 + randoff1 * jitter, 150 + randoff2 * jitter)),
+                screen.blit(image_pong_won, (400 + randoff2 * jitter, 250 + randoff1 * jitter))]
         
     def drawGameIntro(self):
         
-        randoff1 = self.noiseengine.next()
-        randoff2 = self.noiseengine.next(1000)
+        randoff1 = self.randoff1
+        randoff2 = self.randoff2
         jitter = 10
         
         image_pong_title.set_alpha(200 + randoff1 * 50)
         
-        screen.blit(image_pong_title, (200 + randoff1 * jitter, 200 + randoff2 * jitter))
+        return [screen.blit(image_pong_title, (200 + randoff1 * jitter, 200 + randoff2 * jitter))]
+        
+    def interpolate(self, previous, current, alpha):
+        
+        # where something is drawn between the last two ticks
+        return (round(previous.x + (current.x - previous.x) * alpha),
+                round(previous.y + (current.y - previous.y) * alpha))
+        
+    def drawBat(self, player, alpha):
+        
+        return screen.blit(self.bat_image, self.interpolate(player.previous_position, player.position, alpha))
+        
+    def drawBall(self, alpha):
+        
+        ball = self.sim.ball
+        rects = self.balltrail.draw()
+        rects.append(screen.blit(self.ball_image, self.interpolate(ball.previous_position, ball.position, alpha)))
+        return rects
 
-    def draw(self):
+    def getBackground(self):
         
-        if self.gamestate == GAME_STATE_INTRO:
-            
-            self.starfield.update()
-            self.starfield.draw()
-            self.drawGameIntro()
+        # the arena and scoreboard are a cached background layer while
+        # a match is being played, None means a plain black screen
+        sim = self.sim
+        if sim.gamestate in (GAME_STATE_IN_PROGRESS, GAME_STATE_SCORED):
+            return self.arena.getBackground(screen, sim.player_score, sim.opponent_score)
+        return None
+        
+    def draw(self, alpha=1.0):
+        
+        # draws everything that moves over the background
+        # alpha is how far we are between the last tick and the next
+        # returns a list of every rect that was drawn to
+        sim = self.sim
+        profiler = self.profiler
+        rects = []
+        
+        if sim.gamestate == GAME_STATE_INTRO:
             
-        elif self.gamestate == GAME_STATE_IN_PROGRESS:
+            rects += self.drawStars()
+            profiler.lap('draw_stars')
+            rects += self.drawGameIntro()
+            profiler.lap('draw_titles')
             
-            self.checkcollisionBallEdges()
-            self.checkcollisionBats()
-            self.moveOpponent()
-            self.checkBallInScorePosition()
-            self.arena.update()
-            self.ball.applyForce(self.wind)
-            self.ball.update()
-            self.player.update()
-            self.opponent.update()
-            self.starfield.update()
-            self.starfield.draw()
-            self.arena.draw()
-            self.player.draw()
-            self.opponent.draw()
-            self.ball.draw()
-            self.psc.update()
+        elif sim.gamestate == GAME_STATE_IN_PROGRESS:
             
-        elif self.gamestate == GAME_STATE_SCORED:
+            rects += self.drawStars()
+            profiler.lap('draw_stars')
+            rects.append(self.drawBat(sim.player, alpha))
+            rects.append(self.drawBat(sim.opponent, alpha))
+            rects += self.drawBall(alpha)
+            profiler.lap('draw_sprites')
+            rects += self.psc.draw()
+            profiler.lap('draw_particles')
             
-            self.arena.draw()
-            self.starfield.update()
-            self.starfield.draw()
-            self.psc.update()
-            self.scored_frames_elapsed += 1
+        elif sim.gamestate == GAME_STATE_SCORED:
             
-            if self.scored_frames_elapsed > 180:
-                self.scored_frames_elapsed = 0
-                self.resetFromScore()
+            rects += self.drawStars()
+            profiler.lap('draw_stars')
+            rects += self.psc.draw()
+            profiler.lap('draw_particles')
                 
-        elif self.gamestate == GAME_STATE_OVER:
+        elif sim.gamestate == GAME_STATE_OVER:
             
-            self.starfield.update()
-            self.starfield.draw()
+            rects += self.drawStars()
+            profiler.lap('draw_stars')
             
-            if self.player_score > self.opponent_score:
-                self.drawGameWon()
+            if sim.player_score > sim.opponent_score:
+                rects += self.drawGameWon()
             else:
-                self.drawGameOver()
+                rects += self.drawGameOver()
+            profiler.lap('draw_titles')
+                
+        return rects
                 
-    def run(self):
+    def record(self):
+        
+        # start logging every tick's inputs, call before run()
+        self.recorder = ReplayRecorder(self.seed, self.sim.tick_rate, self.sim.noiseengine.backend)
+        return self.recorder
+        
+    def snapshot(self):
+        
+        # the simulation and the few numbers the titles and effects
+        # are worked out from. The stars, particals and trail are left
+        # out, they are only for show and copying them every tick
+        # costs far more than the simulation itself
+        return (self.sim.snapshot(), self.noiseengine.x, self.randoff1,
+                self.randoff2, self.effect_frames)
+        
+    def restore(self, snapshot):
+        
+        (sim, self.noiseengine.x, self.randoff1,
+         self.randoff2, self.effect_frames) = snapshot
+        self.sim.restore(sim)
+        
+    def connect(self, client):
+        
+        # play a networked match, client (a NetworkClient or a
+        # RollbackSession for the same seed, tick rate and noise
+        # backend) runs the simulation
+        client.attach(self.sim)
+        self.network = client
+        
+    def setOpponent(self, policy):
+        
+        # policy plays the right bat instead of the built in opponent,
+        # kept to its cpu budget if it isn't already
+        if not isinstance(policy, BudgetedPolicy):
+            policy = BudgetedPolicy(policy)
+        policy.reset(self.sim, SIDE_RIGHT)
+        self.opponent = policy
+        
+    def rewind(self, ticks):
+        
+        # go back up to ticks ticks. A recording carries on from the
+        # rewound tick as if the ticks after it never happened.
+        # the server decides what happens in a networked match so
+        # it can't be rewound
+        if self.network is not None:
+            return
+        self.restore(self.snapshots.rewind(ticks))
+        # the stars and particals carry on, but the trail would
+        # leave a line back to where the ball was
+        self.balltrail.reset()
+        if self.recorder is not None:
+            self.recorder.truncate(self.sim.frame)
+        
+    def tick(self, inputs):
+        
+        # advance the simulation and the effects by one tick
+        profiler = self.profiler
+        if self.recorder is not None:
+            self.recorder.record(inputs)
+        if self.network is not None:
+            events = self.network.step(inputs)
+            profiler.lap('network')
+        elif self.opponent is not None:
+            opponent_inputs = self.opponent.act()
+            profiler.lap('ai')
+            events = self.sim.step(inputs, opponent_inputs)
+            profiler.lap('physics')
+        else:
+            events = self.sim.step(inputs)
+            profiler.lap('physics')
+        self.handleEvents(events)
+        profiler.lap('events')
+        self.update(self.sim.dt)
+        if self.network is None:
+            self.snapshots.push(self.snapshot())
+            profiler.lap('snapshot')
+        
+    def fastForward(self, replay, ticks):
+        
+        # play up to ticks more ticks of replay without drawing
+        # or making a sound
+        self.muted = True
+        end = min(self.sim.frame + ticks, len(replay))
+        while self.sim.frame < end:
+            self.tick(replay.inputs[self.sim.frame])
+        self.muted = False
+        
+    def run(self, fps=60, dirty_rects=False, replay=None):
+        
+        # the simulation runs at a fixed tick rate, and as many ticks
+        # as fit in the real time that has passed are run before each
+        # frame is drawn. Anything left over is used to draw the ball
+        # and bats part way between the last two ticks.
+        # fps of 0 draws frames as fast as possible
+        # dirty_rects only redraws and updates the parts of the screen
+        # that change, instead of filling and flipping all of it
+        # given a replay the inputs come from it instead of the
+        # keyboard, and the game stops when it runs out
+        
+        if dirty_rects:
+            renderer = DirtyRectRenderer(screen, COLOUR_BLACK)
+        else:
+            renderer = FullScreenRenderer(screen, COLOUR_BLACK)
+        profiler = self.profiler
+        overlay = ProfilerOverlay(profiler, fps)
         
         done = False
+        inputs = INPUT_NONE
+        tick_time = 1.0 / self.sim.tick_rate
+        accumulator = 0.0
+        frames = 0
+        start = previous = time.perf_counter()
         
         while not done:
-    
+            
+            profiler.frame()
             for event in pygame.event.get(): 
                 if event.type == pygame.QUIT:  
                     done = True
                 if event.type == pygame.KEYDOWN:
                     if (event.key == pygame.K_ESCAPE):
                         done = True
+                    elif (event.key == pygame.K_LEFT):
+                        self.rewind(REWIND_STEP * self.sim.tick_rate)
+                        renderer.invalidate()
+                    elif (event.key == pygame.K_F3):
+                        overlay.toggle()
+                        renderer.invalidate()
                     elif (event.key == pygame.K_SPACE):
-                        game.switchGameState()
+                        inputs |= INPUT_SERVE
                     elif (event.key == pygame.K_UP):
-                        game.player.up()
+                        inputs |= INPUT_UP
                     elif (event.key == pygame.K_DOWN):
-                        game.player.down()
+                        inputs |= INPUT_DOWN
+                        
+            now = time.perf_counter()
+            # don't try to catch up after a long stall
+            accumulator += min(now - previous, MAX_FRAME_TIME)
+            previous = now
+            profiler.lap('input')
+            
+            if self.opponent is not None:
+                # the opponent's budget is shared by every tick this
+                # frame, however many it takes to catch up
+                self.opponent.startFrame()
+            
+            while accumulator >= tick_time:
+                if replay is not None:
+                    if self.sim.frame >= len(replay):
+                        done = True
+                        break
+                    inputs = replay.inputs[self.sim.frame]
+                self.tick(inputs)
+                # keys only act on the first tick after they are pressed
+                inputs = INPUT_NONE
+                accumulator -= tick_time
                         
-            screen.fill(COLOUR_BLACK)
-            game.draw()
-            clock.tick(60)
-            pygame.display.flip()
+            renderer.setBackground(self.getBackground())
+            renderer.begin()
+            profiler.lap('draw_background')
+            rects = self.draw(accumulator / tick_time)
+            rects += overlay.draw(screen)
+            profiler.lap('draw_overlay')
+            clock.tick(fps)
+            profiler.lap('wait')
+            renderer.end(rects)
+            profiler.lap('present')
+            frames += 1
+            
+        return frames / (time.perf_counter() - start)
         
         
 
-game = Game()
-game.run()
-pygame.quit()
+def main():
+    
+    parser = argparse.ArgumentParser(description='Pong 2020')
+    parser.add_argument('--tick-rate', type=int, default=BASE_TICK_RATE,
+                        help='simulation ticks per second (default %(default)s)')
+    parser.add_argument('--fps', type=int, default=60,
+                        help='frames drawn per second (default %(default)s)')
+    parser.add_argument('--uncapped', action='store_true',
+                        help='draw frames as fast as possible and report the frame rate')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='only redraw the parts of the screen that change')
+    parser.add_argument('--stars', type=int, default=40,
+                        help='number of stars in the background (default %(default)s)')
+    parser.add_argument('--star-layers', type=int, default=1,
+                        help='number of parallax layers the stars are spread over (default %(default)s)')
+    parser.add_argument('--trail-length', type=int, default=TRAIL_LENGTH,
+                        help='number of points in the ball trail (default %(default)s)')
+    parser.add_argument('--trail-interval', type=int, default=TRAIL_INTERVAL,
+                        help='frames between ball trail points (default %(default)s)')
+    parser.add_argument('--seed', type=int,
+                        help='seed for everything random in the match (default random)')
+    parser.add_argument('--noise-backend', default=BACKEND_AUTO,
+                        choices=[BACKEND_AUTO, BACKEND_FAST, BACKEND_OPENSIMPLEX],
+                        help='what makes the wind noise (default %(default)s)')
+    parser.add_argument('--record', metavar='FILE',
+                        help='save a replay of the match to FILE')
+    parser.add_argument('--playback', metavar='FILE',
+                        help='play back the replay in FILE')
+    parser.add_argument('--fast-forward', type=int, default=0, metavar='TICKS',
+                        help='skip the first TICKS ticks of a playback without drawing them')
+    parser.add_argument('--connect', metavar='HOST:PORT',
+                        help='play a two player match on a netplay.py server')
+    parser.add_argument('--match', type=int, default=0,
+                        help='match to join on the --connect server (default the first with room)')
+    parser.add_argument('--peer', metavar='HOST:PORT',
+                        help='play a two player match directly with another game, which needs --seed and --listen')
+    parser.add_argument('--listen', type=int, metavar='PORT',
+                        help='port to hear the --peer game on')
+    parser.add_argument('--side', choices=['left', 'right'], default='left',
+                        help='which bat to play with --peer (default %(default)s)')
+    parser.add_argument('--input-delay', type=int, default=DEFAULT_INPUT_DELAY,
+                        help='ticks before a key press is used with --peer (default %(default)s)')
+    parser.add_argument('--opponent', choices=sorted(POLICIES),
+                        help='computer policy to play against instead of the built in opponent')
+    parser.add_argument('--budget-ms', type=float,
+                        help='cpu time the --opponent may take each frame (default the policy\'s own)')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write how long every part of every frame took to FILE, as csv or .json')
+    args = parser.parse_args()
+    
+    if (args.connect or args.peer) and (args.record or args.playback):
+        parser.error('--connect and --peer can not be used with --record or --playback')
+    if args.connect and args.peer:
+        parser.error('--connect and --peer can not be used together')
+    if args.peer and (args.seed is None or args.listen is None):
+        parser.error('--peer needs --listen and the same --seed on both games')
+    if args.opponent and (args.connect or args.peer or args.record or args.playback):
+        parser.error('--opponent can not be used with --connect, --peer, --record or --playback')
+    if args.seed is not None and not MIN_SEED <= args.seed <= MAX_SEED:
+        parser.error('--seed must be from {} to {}'.format(MIN_SEED, MAX_SEED))
+    if args.trail_length < 1:
+        parser.error('--trail-length must be at least 1')
+    if args.star_layers < 1:
+        parser.error('--star-layers must be at least 1')
+    
+    replay = None
+    client = None
+    seed, tick_rate, noise_backend = args.seed, args.tick_rate, args.noise_backend
+    if args.playback:
+        replay = Replay.load(args.playback)
+        seed, tick_rate, noise_backend = replay.seed, replay.tick_rate, replay.noise_backend
+    if args.connect:
+        client = NetworkClient(parseAddress(args.connect), args.match)
+        seed, tick_rate, noise_backend = client.seed, client.tick_rate, client.noise_backend
+    if args.peer:
+        # both games must make the same wind, the built in noise is
+        # the same everywhere whether opensimplex is installed or not
+        side = SIDE_LEFT if args.side == 'left' else SIDE_RIGHT
+        client = RollbackSession(UdpTransport(args.listen, parseAddress(args.peer)), side, args.input_delay)
+        if noise_backend == BACKEND_AUTO:
+            noise_backend = BACKEND_FAST
+    
+    game = Game(seed, tick_rate, stars=args.stars, star_layers=args.star_layers,
+                trail_length=args.trail_length, trail_interval=args.trail_interval,
+                noise_backend=noise_backend)
+    if args.record:
+        recorder = game.record()
+    if client is not None:
+        game.connect(client)
+    if args.profile:
+        game.profiler.startTrace()
+    if args.opponent:
+        budget = None if args.budget_ms is None else args.budget_ms / 1000
+        game.setOpponent(BudgetedPolicy(makePolicy(args.opponent, game.seed), budget))
+    if replay is not None and args.fast_forward:
+        game.fastForward(replay, args.fast_forward)
+    
+    fps = 0
+    if replay is None or game.sim.frame < len(replay):
+        fps = game.run(0 if args.uncapped else args.fps, args.dirty_rects, replay)
+    pygame.quit()
+    
+    if client is not None:
+        printStats('network', client.stats())
+        client.close()
+    if game.opponent is not None:
+        printStats('opponent', game.opponent.stats())
+    if args.profile:
+        game.profiler.report()
+        game.profiler.dump(args.profile)
+    if args.record:
+        recorder.save(args.record, game.sim)
+    if replay is not None and game.sim.frame == len(replay):
+        if replay.matches(game.sim):
+            print('playback matches the recording')
+        else:
+            print('playback does NOT match the recording')
+    if args.uncapped:
+        print('average frame rate: {:.1f} fps'.format(fps))
+    
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  pongenv.py
+#
+# NOTE!:
+# pip3 install numpy
+# pip3 install gymnasium (optional, for action_space / observation_space)
+#
+# pong as a reinforcement learning environment, with the same reset and
+# step calls as gymnasium.
+#
+# the agent plays the left bat. Each step it picks an action (0 nothing,
+# 1 up, 2 down), which is held for frame_skip ticks. It gets a reward of
+# 1 when it scores and -1 when the opponent does, and the episode ends
+# when someone has won the match. The pause after each point and the
+# serve are skipped, so every step is spent playing.
+#
+# the observation is a float32 array of the ball's position and
+# velocity, each bat's position and velocity and the wind, scaled to
+# roughly -1..1 (see OBSERVATION_NAMES). With pixels=True it is instead
+# a small greyscale picture of the court.
+#
+# observations are written into the same array every step rather than
+# making a new one, so copy them if they need to be kept.
+#
+# PongEnv runs one match on a Simulation. BatchPongEnv runs count of them
+# in lockstep on a BatchSimulation, taking an array of actions and giving
+# back arrays of observations, rewards and dones, and starts a new match
+# as soon as one ends.
+#
+# to see how many steps a second a random agent gets:
+# >python3 pongenv.py
+# >python3 pongenv.py --count 256 --pixels
+
+import argparse
+import time
+import numpy as np
+from simulation import (Simulation, SplitMix64, SCREEN_WIDTH, SCREEN_HEIGHT,
+                        BASE_TICK_RATE, INPUT_NONE, INPUT_UP, INPUT_DOWN,
+                        INPUT_SERVE, SIDE_RIGHT, GAME_STATE_SCORED, SCORED_PAUSE_FRAMES,
+                        EVENT_PLAYER_SCORED, EVENT_OPPONENT_SCORED)
+from batchsim import BatchSimulation
+from noiseengine import BACKEND_FAST
+from policies import makePolicy
+
+try:
+    from gymnasium import spaces
+except ImportError:
+    spaces = None
+
+ACTION_NONE = 0
+ACTION_UP   = 1
+ACTION_DOWN = 2
+ACTION_INPUTS = np.array([INPUT_NONE, INPUT_UP, INPUT_DOWN], dtype=np.int64)
+
+OBSERVATION_NAMES = ['ball_x', 'ball_y', 'ball_vx', 'ball_vy',
+                     'player_y', 'player_vy', 'opponent_y', 'opponent_vy',
+                     'wind_x', 'wind_y']
+
+# what each observation is divided by
+BALL_SPEED_SCALE = 8.0
+BAT_SPEED_SCALE = 3.0
+WIND_SCALE = 0.4
+
+# the size of the pixel observation, a tenth of the screen
+PIXEL_SCALE = 10
+PIXEL_SIZE = (SCREEN_HEIGHT // PIXEL_SCALE, SCREEN_WIDTH // PIXEL_SCALE)
+
+# a match between two bats that never miss could go on forever
+DEFAULT_MAX_TICKS = 60 * 60 * BASE_TICK_RATE
+
+def makeSpaces(pixels):
+
+    # the gymnasium spaces if gymnasium is installed
+    if spaces is None:
+        return None, None
+    if pixels:
+        observation = spaces.Box(0, 255, PIXEL_SIZE, np.uint8)
+    else:
+        observation = spaces.Box(-np.inf, np.inf, (len(OBSERVATION_NAMES),), np.float32)
+    return spaces.Discrete(len(ACTION_INPUTS)), observation
+
+#=======================================================================
+# PixelRenderer class
+#=======================================================================
+
+class PixelRenderer():
+
+    # draws the court small and in greyscale on an offscreen surface.
+    # pygame is only imported when it is first needed and no window
+    # is opened
+
+    def __init__(self):
+
+        import pygame
+        self.pygame = pygame
+        height, width = PIXEL_SIZE
+        self.surface = pygame.Surface((width, height), depth=8)
+        self.surface.set_palette([(i, i, i) for i in range(256)])
+
+    def rect(self, x, y, width, height):
+
+        s = PIXEL_SCALE
+        return (int(x // s), int(y // s), max(1, int(width // s)), max(1, int(height // s)))
+
+    def draw(self, out, ball_x, ball_y, ball_size, player_x, player_y,
+             opponent_x, opponent_y, bat_width, bat_height):
+
+        # draw into the surface and copy it into out
+        surface = self.surface
+        surface.fill(0)
+        surface.fill(100, self.rect(SCREEN_WIDTH // 2 - 1, 0, 2, SCREEN_HEIGHT))
+        surface.fill(255, self.rect(player_x, player_y, bat_width, bat_height))
+        surface.fill(255, self.rect(opponent_x, opponent_y, bat_width, bat_height))
+        surface.fill(255, self.rect(ball_x, ball_y, ball_size, ball_size))
+        out[:] = self.pygame.surfarray.pixels2d(surface).T
+
+
+#=======================================================================
+# PongEnv class
+#=======================================================================
+
+class PongEnv():
+
+    def __init__(self, seed=None, opponent=None, frame_skip=1, pixels=False, max_ticks=DEFAULT_MAX_TICKS):
+
+        # opponent is the name of a policy in policies.py to play the
+        # right bat, or None for the built in opponent
+        self.random = SplitMix64(seed)
+        self.opponent_name = opponent
+        self.opponent = None
+        self.frame_skip = frame_skip
+        self.pixels = pixels
+        self.max_ticks = max_ticks
+        self.sim = None
+        self.action_space, self.observation_space = makeSpaces(pixels)
+
+        if pixels:
+            self.renderer = PixelRenderer()
+            self.observation = np.zeros(PIXEL_SIZE, dtype=np.uint8)
+        else:
+            self.renderer = None
+            self.observation = np.zeros(len(OBSERVATION_NAMES), dtype=np.float32)
+
+    def reset(self, seed=None, options=None):
+
+        # start a new match, returns (observation, info)
+        if seed is None:
+            seed = self.random.next() >> 1
+        self.sim = Simulation(seed, BASE_TICK_RATE, BACKEND_FAST)
+        if self.opponent_name is not None:
+            self.opponent = makePolicy(self.opponent_name, seed)
+            self.opponent.reset(self.sim, SIDE_RIGHT)
+        self.sim.step(INPUT_SERVE)
+        return self.observe(), {'seed': seed}
+
+    def observe(self):
+
+        sim = self.sim
+        if self.pixels:
+            ball = sim.ball
+            self.renderer.draw(self.observation, ball.position.x, ball.position.y, ball.width,
+                               sim.player.position.x, sim.player.position.y,
+                               sim.opponent.position.x, sim.opponent.position.y,
+                               sim.player.width, sim.player.height)
+            return self.observation
+
+        o = self.observation
+        o[0] = sim.ball.position.x / SCREEN_WIDTH
+        o[1] = sim.ball.position.y / SCREEN_HEIGHT
+        o[2] = sim.ball.velocity.x / BALL_SPEED_SCALE
+        o[3] = sim.ball.velocity.y / BALL_SPEED_SCALE
+        o[4] = sim.player.position.y / SCREEN_HEIGHT
+        o[5] = sim.player.velocity.y / BAT_SPEED_SCALE
+        o[6] = sim.opponent.position.y / SCREEN_HEIGHT
+        o[7] = sim.opponent.velocity.y / BAT_SPEED_SCALE
+        o[8] = sim.wind.x / WIND_SCALE
+        o[9] = sim.wind.y / WIND_SCALE
+        return o
+
+    def step(self, action):
+
+        # returns (observation, reward, terminated, truncated, info)
+        sim = self.sim
+        inputs = int(ACTION_INPUTS[action])
+        reward = 0.0
+
+        for i in range(self.frame_skip):
+            opponent_inputs = None if self.opponent is None else self.opponent.act()
+            for event, x, y in sim.step(inputs, opponent_inputs):
+                if event == EVENT_PLAYER_SCORED:
+                    reward += 1.0
+                elif event == EVENT_OPPONENT_SCORED:
+                    reward -= 1.0
+            if sim.gamestate == GAME_STATE_SCORED:
+                # skip the pause and serve the next point
+                sim.scored_frames_elapsed = sim.scored_pause_ticks
+                sim.step()
+                break
+
+        terminated = sim.isOver()
+        truncated = not terminated and sim.frame >= self.max_ticks
+        return self.observe(), reward, terminated, truncated, {}
+
+    def close(self):
+
+        pass
+
+
+#=======================================================================
+# BatchPongEnv class
+#=======================================================================
+
+class BatchPongEnv():
+
+    def __init__(self, count, seed=None, frame_skip=1, pixels=False, max_ticks=DEFAULT_MAX_TICKS):
+
+        self.count = count
+        self.frame_skip = frame_skip
+        self.pixels = pixels
+        self.max_ticks = max_ticks
+        self.batch = BatchSimulation(count, seed, BACKEND_FAST)
+        self.action_space, self.observation_space = makeSpaces(pixels)
+
+        # everything step returns, reused every step
+        self.ticks = np.zeros(count, dtype=np.int64)
+        self.rewards = np.zeros(count, dtype=np.float32)
+        self.paused = np.zeros(count, dtype=bool)
+        self.terminated = np.zeros(count, dtype=bool)
+        self.truncated = np.zeros(count, dtype=bool)
+        if pixels:
+            self.renderer = PixelRenderer()
+            self.observations = np.zeros((count,) + PIXEL_SIZE, dtype=np.uint8)
+        else:
+            self.renderer = None
+            self.observations = np.zeros((count, len(OBSERVATION_NAMES)), dtype=np.float32)
+
+    def reset(self, seed=None, options=None):
+
+        # a seed starts every match again from a new BatchSimulation
+        # made with it, so a seeded reset always plays out the same
+        if seed is not None:
+            self.batch = BatchSimulation(self.count, seed, BACKEND_FAST)
+        everything = np.ones(self.count, dtype=bool)
+        self.batch.resetMatches(everything)
+        self.ticks[:] = 0
+        return self.observe(), {}
+
+    def observe(self):
+
+        batch = self.batch
+        if self.pixels:
+            for i in range(self.count):
+                self.renderer.draw(self.observations[i], batch.ball_position[i, 0], batch.ball_position[i, 1],
+                                   batch.ball_size, batch.player_x, batch.player_y[i],
+                                   batch.opponent_x, batch.opponent_y[i], batch.bat_width, batch.bat_height)
+            return self.observations
+
+        o = self.observations
+        np.divide(batch.ball_position[:, 0], SCREEN_WIDTH, out=o[:, 0], casting='unsafe')
+        np.divide(batch.ball_position[:, 1], SCREEN_HEIGHT, out=o[:, 1], casting='unsafe')
+        np.divide(batch.ball_velocity, BALL_SPEED_SCALE, out=o[:, 2:4], casting='unsafe')
+        np.divide(batch.player_y, SCREEN_HEIGHT, out=o[:, 4], casting='unsafe')
+        np.divide(batch.player_vy, BAT_SPEED_SCALE, out=o[:, 5], casting='unsafe')
+        np.divide(batch.opponent_y, SCREEN_HEIGHT, out=o[:, 6], casting='unsafe')
+        np.divide(batch.opponent_vy, BAT_SPEED_SCALE, out=o[:, 7], casting='unsafe')
+        np.divide(batch.wind, WIND_SCALE, out=o[:, 8:10], casting='unsafe')
+        return o
+
+    def step(self, actions, opponent_actions=None):
+
+        # actions is an array of one action per match. opponent_actions
+        # plays the right bats too, otherwise the built in opponent does.
+        # matches that end are started again straight away, so the
+        # observations returned for them are from their new match
+        batch = self.batch
+        inputs = ACTION_INPUTS[actions]
+        opponent_inputs = None if opponent_actions is None else ACTION_INPUTS[opponent_actions]
+        rewards = self.rewards
+        rewards[:] = 0
+
+        # like PongEnv, a match that scores plays no more of the frame
+        # skip. It stays paused with its keys let go until the end
+        paused = self.paused
+        paused[:] = False
+        for i in range(self.frame_skip):
+            batch.step(np.where(paused, INPUT_NONE, inputs), opponent_inputs)
+            rewards += batch.player_scored
+            rewards -= batch.opponent_scored
+            paused |= batch.gamestate == GAME_STATE_SCORED
+            batch.scored_frames_elapsed[paused] = 0
+        # skip the pause and serve the next point
+        batch.scored_frames_elapsed[paused] = SCORED_PAUSE_FRAMES
+        batch.updateScored(paused)
+        self.ticks += self.frame_skip
+
+        np.copyto(self.terminated, batch.isOver())
+        np.greater_equal(self.ticks, self.max_ticks, out=self.truncated)
+        self.truncated &= ~self.terminated
+        done = self.terminated | self.truncated
+        if done.any():
+            batch.resetMatches(done)
+            self.ticks[done] = 0
+
+        return self.observe(), rewards, self.terminated, self.truncated, {}
+
+    def close(self):
+
+        pass
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='time the pong environment with a random agent')
+    parser.add_argument('--count', type=int, default=1,
+                        help='matches run together, more than 1 uses BatchPongEnv (default %(default)s)')
+    parser.add_argument('--steps', type=int, default=20000, help='steps to time (default %(default)s)')
+    parser.add_argument('--frame-skip', type=int, default=1, help='ticks per step (default %(default)s)')
+    parser.add_argument('--pixels', action='store_true', help='use pixel observations')
+    parser.add_argument('--seed', type=int, default=1, help='seed (default %(default)s)')
+    args = parser.parse_args()
+
+    random = np.random.default_rng(args.seed)
+    episodes = 0
+    start = time.perf_counter()
+
+    if args.count == 1:
+        env = PongEnv(args.seed, frame_skip=args.frame_skip, pixels=args.pixels)
+        env.reset()
+        for i in range(args.steps):
+            observation, reward, terminated, truncated, info = env.step(random.integers(len(ACTION_INPUTS)))
+            if terminated or truncated:
+                episodes += 1
+                env.reset()
+    else:
+        env = BatchPongEnv(args.count, args.seed, frame_skip=args.frame_skip, pixels=args.pixels)
+        env.reset()
+        for i in range(args.steps // args.count):
+            observations, rewards, terminated, truncated, info = env.step(
+                random.integers(len(ACTION_INPUTS), size=args.count))
+            episodes += int(np.count_nonzero(terminated | truncated))
+
+    elapsed = time.perf_counter() - start
+    steps = args.steps // args.count * args.count
+    print('{} steps in {:.2f}s, {:.0f} steps/s ({:.1f} million an hour), {} episodes'.format(
+        steps, elapsed, steps / elapsed, steps / elapsed * 3600 / 1e6, episodes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  profiler.py
+#
+# times where each frame goes.
+#
+# the game calls frame() at the start of every frame and lap(name) after
+# each part of it, which adds the time since the last lap to name. A
+# part run more than once in a frame (the simulation when it catches up
+# on several ticks, say) is added up, so each frame ends up with one
+# time for each part. Reading the clock is all a lap costs, so the game
+# always does it.
+#
+# the last window frames are kept for percentiles and the on screen
+# overlay. With trace on every frame is also kept so that it can be
+# written out with dump() as csv, or json if the file name ends in .json:
+# >python3 pong.py --profile trace.csv
+#
+# F3 in the game shows the overlay.
+
+import collections
+import csv
+import json
+import time
+
+# frames kept for the percentiles and the graph
+PROFILE_WINDOW = 600
+# most frames a trace keeps, an hour at 60 frames a second
+TRACE_FRAMES = 60 * 60 * 60
+# parts of the frame that are spent waiting rather than working
+IDLE_SECTIONS = ('wait',)
+
+OVERLAY_WIDTH = 300
+OVERLAY_GRAPH_HEIGHT = 80
+OVERLAY_LINE_HEIGHT = 14
+# where the right hand ends of the p50, p95 and p99 columns are
+OVERLAY_COLUMNS = (170, 230, 290)
+# the graph's scale, in ms from the bottom to the top
+OVERLAY_GRAPH_MS = 40
+
+COLOUR_OVERLAY = (0, 0, 0)
+COLOUR_TEXT = (200, 200, 200)
+COLOUR_BAR = (0, 160, 0)
+COLOUR_BAR_SLOW = (220, 40, 40)
+COLOUR_BUDGET = (220, 220, 0)
+
+#=======================================================================
+# Profiler class
+#=======================================================================
+
+class Profiler():
+
+    def __init__(self, window=PROFILE_WINDOW, trace=False):
+
+        self.window = window
+        self.sections = []
+        self.history = {}
+        self.totals = collections.deque(maxlen=window)
+        self.work = collections.deque(maxlen=window)
+        self.current = {}
+        self.frames = 0
+        self.trace = collections.deque(maxlen=TRACE_FRAMES) if trace else None
+        self.started = None
+        self.last = None
+
+    def frame(self):
+
+        # finish the frame that was going and start the next
+        now = time.perf_counter()
+        if self.started is not None:
+            total = now - self.started
+            idle = 0.0
+            for name in self.sections:
+                spent = self.current.get(name, 0.0)
+                self.history[name].append(spent)
+                if name in IDLE_SECTIONS:
+                    idle += spent
+            self.totals.append(total)
+            self.work.append(total - idle)
+            if self.trace is not None:
+                self.trace.append((self.frames, total, dict(self.current)))
+            self.frames += 1
+        self.current.clear()
+        self.started = self.last = now
+
+    def lap(self, name):
+
+        # add the time since the last lap to name
+        now = time.perf_counter()
+        if self.last is None:
+            self.last = now
+            return
+        current = self.current
+        if name in current:
+            current[name] += now - self.last
+        else:
+            if name not in self.history:
+                self.sections.append(name)
+                self.history[name] = collections.deque([0.0] * len(self.totals), maxlen=self.window)
+            current[name] = now - self.last
+        self.last = now
+
+    def startTrace(self):
+
+        if self.trace is None:
+            self.trace = collections.deque(maxlen=TRACE_FRAMES)
+
+    def percentiles(self, values):
+
+        # sorted once rather than once for each percentile
+        values = sorted(values)
+        if not values:
+            return {'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+        last = len(values) - 1
+        return {'mean_ms': 1000 * sum(values) / len(values),
+                'p50_ms': 1000 * values[min(last, len(values) * 50 // 100)],
+                'p95_ms': 1000 * values[min(last, len(values) * 95 // 100)],
+                'p99_ms': 1000 * values[min(last, len(values) * 99 // 100)],
+                'max_ms': 1000 * values[last]}
+
+    def series(self, name):
+
+        # the last window frame times of 'frame', 'work' or a section
+        if name == 'frame':
+            return self.totals
+        if name == 'work':
+            return self.work
+        return self.history[name]
+
+    def names(self):
+
+        return ['frame', 'work'] + self.sections
+
+    def summary(self):
+
+        # percentiles over the last window frames of the whole frame,
+        # the part of it that wasn't waiting, and each section
+        return {name: self.percentiles(self.series(name)) for name in self.names()}
+
+    def dump(self, path):
+
+        # write the trace as csv, or as json with the summary
+        rows = list(self.trace) if self.trace is not None else []
+        if str(path).endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump({'sections': self.sections,
+                           'summary': self.summary(),
+                           'frames': [dict(frame=n, total_ms=1000 * total,
+                                           **{name: 1000 * times.get(name, 0.0) for name in self.sections})
+                                      for n, total, times in rows]}, f)
+            return
+
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'total_ms'] + self.sections)
+            for n, total, times in rows:
+                writer.writerow([n, round(1000 * total, 4)] +
+                                [round(1000 * times.get(name, 0.0), 4) for name in self.sections])
+
+    def report(self):
+
+        print('{:<16} {:>8} {:>8} {:>8} {:>8}'.format('ms', 'p50', 'p95', 'p99', 'max'))
+        for name, times in self.summary().items():
+            print('{:<16} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f}'.format(
+                name, times['p50_ms'], times['p95_ms'], times['p99_ms'], times['max_ms']))
+
+
+#=======================================================================
+# ProfilerOverlay class
+# the profiler's numbers and a graph of frame times, on screen
+#=======================================================================
+
+class ProfilerOverlay():
+
+    def __init__(self, profiler, target_fps=60):
+
+        import pygame
+        self.pygame = pygame
+        self.profiler = profiler
+        self.budget = 1.0 / target_fps if target_fps else None
+        self.font = pygame.font.Font(None, 16)
+        self.graph = pygame.Surface((OVERLAY_WIDTH, OVERLAY_GRAPH_HEIGHT)).convert()
+        self.graph.fill(COLOUR_OVERLAY)
+        self.text = None
+        self.words = {}
+        self.row = 0
+        self.graphed = profiler.frames
+        self.visible = False
+
+    def toggle(self):
+
+        self.visible = not self.visible
+
+    def word(self, text):
+
+        # each name and each character of a number is only ever
+        # rendered once, as font rendering is slow
+        image = self.words.get(text)
+        if image is None:
+            image = self.words[text] = self.font.render(text, True, COLOUR_TEXT)
+        return image
+
+    def drawRow(self, row, cells):
+
+        y = 2 + row * OVERLAY_LINE_HEIGHT
+        self.text.fill(COLOUR_OVERLAY, (0, y, OVERLAY_WIDTH, OVERLAY_LINE_HEIGHT))
+        self.text.blit(self.word(cells[0]), (4, y))
+        # numbers lined up on their right hand ends
+        for column, value in enumerate(cells[1:]):
+            x = OVERLAY_COLUMNS[column]
+            for char in reversed(value if row else [value]):
+                image = self.word(char)
+                x -= image.get_width()
+                self.text.blit(image, (x, y))
+
+    def updateText(self):
+
+        # one row is worked out and redrawn each frame, so the cost
+        # is spread out rather than all landing on one frame
+        names = self.profiler.names()
+        height = (len(names) + 1) * OVERLAY_LINE_HEIGHT + 4
+        if self.text is None or self.text.get_height() != height:
+            self.text = self.pygame.Surface((OVERLAY_WIDTH, height)).convert()
+            self.text.fill(COLOUR_OVERLAY)
+            self.drawRow(0, ('ms', 'p50', 'p95', 'p99'))
+            self.row = 0
+
+        name = names[self.row % len(names)]
+        times = self.profiler.percentiles(self.profiler.series(name))
+        self.drawRow(1 + self.row % len(names), (name, '{:.2f}'.format(times['p50_ms']),
+                                                  '{:.2f}'.format(times['p95_ms']),
+                                                  '{:.2f}'.format(times['p99_ms'])))
+        self.row += 1
+
+    def updateGraph(self):
+
+        # scroll the graph left one pixel for each frame since
+        # the last draw and add a bar for each
+        graph = self.graph
+        height = OVERLAY_GRAPH_HEIGHT
+        new = min(self.profiler.frames - self.graphed, OVERLAY_WIDTH)
+        self.graphed = self.profiler.frames
+        if new <= 0:
+            return
+        graph.scroll(-new, 0)
+        graph.fill(COLOUR_OVERLAY, (OVERLAY_WIDTH - new, 0, new, height))
+        work = list(self.profiler.work)[-new:]
+        for i, spent in enumerate(work):
+            x = OVERLAY_WIDTH - len(work) + i
+            bar = min(height, int(1000 * spent / OVERLAY_GRAPH_MS * height))
+            slow = self.budget is not None and spent > self.budget
+            graph.fill(COLOUR_BAR_SLOW if slow else COLOUR_BAR, (x, height - bar, 1, bar))
+
+    def draw(self, surface):
+
+        # returns the rects drawn to
+        if not self.visible:
+            self.graphed = self.profiler.frames
+            return []
+        self.updateText()
+        self.updateGraph()
+
+        rects = [surface.blit(self.text, (0, 0))]
+        top = self.text.get_height()
+        rects.append(surface.blit(self.graph, (0, top)))
+        if self.budget is not None:
+            y = top + OVERLAY_GRAPH_HEIGHT - int(1000 * self.budget / OVERLAY_GRAPH_MS * OVERLAY_GRAPH_HEIGHT)
+            rects.append(self.pygame.draw.line(surface, COLOUR_BUDGET, (0, y), (OVERLAY_WIDTH - 1, y)))
+        return rects
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  renderers.py
+#
+# ways of getting each frame onto the display.
+#
+# the game calls begin() before drawing a frame and end(rects) after,
+# where rects is every area it drew to. FullScreenRenderer clears and
+# flips the whole screen every frame. DirtyRectRenderer only clears what
+# was drawn last frame and only sends the changed areas to the display,
+# which is much faster on software rendered SDL where full screen fills
+# and flips take most of the frame.
+#
+# setBackground() gives a surface to clear with instead of the plain
+# colour, so anything that rarely changes can be drawn onto it once.
+
+import pygame
+
+# past this many rects it is quicker to just redraw the whole screen
+MAX_DIRTY_RECTS = 512
+
+#=======================================================================
+# FullScreenRenderer class
+#=======================================================================
+
+class FullScreenRenderer():
+
+    def __init__(self, screen, colour):
+
+        self.screen = screen
+        self.colour = colour
+        self.background = None
+
+    def setBackground(self, background):
+
+        self.background = background
+
+    def invalidate(self):
+
+        pass
+
+    def begin(self):
+
+        if self.background is None:
+            self.screen.fill(self.colour)
+        else:
+            self.screen.blit(self.background, (0, 0))
+
+    def end(self, rects):
+
+        pygame.display.flip()
+
+
+#=======================================================================
+# DirtyRectRenderer class
+#=======================================================================
+
+class DirtyRectRenderer():
+
+    def __init__(self, screen, colour):
+
+        self.screen = screen
+        self.colour = colour
+        self.background = None
+        self.previous = []
+        self.full = True
+
+    def setBackground(self, background):
+
+        # a new background means every pixel may have changed
+        if background is not self.background:
+            self.background = background
+            self.full = True
+
+    def clear(self, rect=None):
+
+        if self.background is None:
+            self.screen.fill(self.colour, rect)
+        elif rect is None:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            self.screen.blit(self.background, rect, rect)
+
+    def invalidate(self):
+
+        # clear and send the whole screen next frame
+        self.full = True
+
+    def begin(self):
+
+        if self.full or len(self.previous) > MAX_DIRTY_RECTS:
+            self.clear()
+            self.full = True
+        else:
+            # rub out everything drawn last frame
+            clear = self.clear
+            for rect in self.previous:
+                clear(rect)
+
+    def end(self, rects):
+
+        if self.full or len(rects) > MAX_DIRTY_RECTS:
+            pygame.display.flip()
+        else:
+            # both where things were and where they are now have changed
+            pygame.display.update(self.previous + rects)
+
+        self.previous = rects
+        self.full = False
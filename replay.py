@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  replay.py
+#
+# records and plays back matches.
+#
+# a Simulation is completely decided by its seed, tick rate and noise
+# backend plus the inputs given to each step, so that is all a replay
+# file holds. The inputs are one byte per tick, zlib compressed (they
+# are mostly zero so they squash down to almost nothing), followed by a
+# checksum of the final state so playback can prove it came out the
+# same bit for bit.
+#
+# to check a replay without a display:
+# >python3 replay.py match.replay
+
+import struct
+import zlib
+import argparse
+from simulation import Simulation, GAME_STATE_OVER
+
+REPLAY_MAGIC = b'PONGREPL'
+REPLAY_VERSION = 2
+
+# magic, version, tick rate, noise backend, seed, tick count, checksum
+REPLAY_HEADER = struct.Struct('<8sBHBqII')
+
+NOISE_BACKENDS = ['fast', 'opensimplex']
+
+# the seeds a replay can keep, the header packs it as a signed 64 bit number
+MIN_SEED = -2**63
+MAX_SEED = 2**63 - 1
+
+def stateChecksum(sim):
+
+    # a crc of everything that decides what happens next in a
+    # simulation, if two of these match the matches are identical
+    return zlib.crc32(sim.snapshot())
+
+#=======================================================================
+# ReplayRecorder class
+#=======================================================================
+
+class ReplayRecorder():
+
+    def __init__(self, seed, tick_rate, noise_backend):
+
+        # find out now rather than in save() after the whole match
+        if not MIN_SEED <= seed <= MAX_SEED:
+            raise ValueError('a replay can only keep a seed from {} to {}'.format(MIN_SEED, MAX_SEED))
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.noise_backend = noise_backend
+        self.inputs = bytearray()
+
+    def record(self, inputs):
+
+        # call once per tick with the inputs given to that step
+        self.inputs.append(inputs)
+
+    def truncate(self, ticks):
+
+        # forget everything after the first ticks ticks
+        del self.inputs[ticks:]
+
+    def save(self, path, sim):
+
+        header = REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, self.tick_rate,
+                                    NOISE_BACKENDS.index(self.noise_backend), self.seed,
+                                    len(self.inputs), stateChecksum(sim))
+        with open(path, 'wb') as f:
+            f.write(header)
+            f.write(zlib.compress(bytes(self.inputs), 9))
+
+
+#=======================================================================
+# Replay class
+#=======================================================================
+
+class Replay():
+
+    def __init__(self, seed, tick_rate, noise_backend, inputs, checksum):
+
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.noise_backend = noise_backend
+        self.inputs = inputs
+        self.checksum = checksum
+
+    @classmethod
+    def load(cls, path):
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version, tick_rate, backend, seed, ticks, checksum = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC:
+            raise ValueError('{} is not a pong replay'.format(path))
+        if version != REPLAY_VERSION:
+            raise ValueError('{} is replay version {}, expected {}'.format(path, version, REPLAY_VERSION))
+
+        inputs = zlib.decompress(data[REPLAY_HEADER.size:])
+        if len(inputs) != ticks:
+            raise ValueError('{} is truncated'.format(path))
+
+        return cls(seed, tick_rate, NOISE_BACKENDS[backend], inputs, checksum)
+
+    def __len__(self):
+
+        return len(self.inputs)
+
+    def makeSimulation(self):
+
+        return Simulation(self.seed, self.tick_rate, self.noise_backend)
+
+    def matches(self, sim):
+
+        # true if sim finished in exactly the recorded state
+        return stateChecksum(sim) == self.checksum
+
+
+def playHeadless(replay, ticks=None):
+
+    # run the replay (or just the first ticks of it) without drawing
+    # anything and return the simulation
+    sim = replay.makeSimulation()
+    for inputs in replay.inputs[:ticks]:
+        sim.step(inputs)
+    return sim
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='check a pong replay without a display')
+    parser.add_argument('replay', help='replay file to play')
+    args = parser.parse_args()
+
+    replay = Replay.load(args.replay)
+    sim = playHeadless(replay)
+
+    print('ticks: {} at {}Hz'.format(len(replay), replay.tick_rate))
+    print('score: {} - {}{}'.format(sim.player_score, sim.opponent_score,
+                                    ' (game over)' if sim.gamestate == GAME_STATE_OVER else ''))
+    if replay.matches(sim):
+        print('final state matches the recording')
+    else:
+        print('final state does NOT match the recording')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  rollback.py
+#
+# peer to peer two player pong with rollback, in the style of GGPO.
+#
+# there is no server. Both peers run the whole match and send each other
+# their inputs. A key pressed now is used input_delay ticks in the
+# future, which gives it time to reach the other peer before it is
+# needed. When the other peer's input for a tick hasn't arrived the tick
+# is run anyway guessing nothing was pressed (key presses are taps, so
+# that is nearly always right). If an input turns up that was guessed
+# wrong the match is restored to the snapshot from just before it and
+# the ticks since are run again with the right inputs, all before the
+# next frame is drawn. A peer that gets more than max_rollback ticks
+# ahead of what it has heard from the other waits for it.
+#
+# the test harness runs two peers in one process over a link that
+# delays, jitters and drops packets, and checks every tick both peers
+# have confirmed came out the same:
+# >python3 rollback.py test --latency-ms 100 --loss 0.1
+#
+# to play over a network both peers need the same seed and tick rate:
+# >python3 pong.py --seed 7 --listen 6000 --peer otherhost:6001 --side left
+# >python3 pong.py --seed 7 --listen 6001 --peer firsthost:6000 --side right
+
+import argparse
+import collections
+import heapq
+import random
+import socket
+import struct
+import time
+import zlib
+from simulation import Simulation, BASE_TICK_RATE, INPUT_NONE
+from noiseengine import BACKEND_FAST
+from netplay import splitInputs, printStats, botInputs, SIDE_LEFT, SIDE_RIGHT
+from stats import percentile
+
+DEFAULT_INPUT_DELAY = 2
+DEFAULT_MAX_ROLLBACK = 8
+
+# the most inputs sent in one packet
+MAX_SENT_INPUTS = 64
+# how many confirmed ticks keep a checksum for checking the peers agree
+SYNC_HISTORY = 1024
+
+# ack (last tick heard from the peer), first tick, number of inputs
+INPUTS_HEADER = struct.Struct('<IIB')
+
+#=======================================================================
+# RollbackSession class
+#=======================================================================
+
+class RollbackSession():
+
+    def __init__(self, transport, side, input_delay=DEFAULT_INPUT_DELAY, max_rollback=DEFAULT_MAX_ROLLBACK):
+
+        self.transport = transport
+        self.side = side
+        self.input_delay = input_delay
+        self.max_rollback = max_rollback
+        self.sim = None
+        # inputs by tick, remote ones only up to remote_confirmed
+        self.local_inputs = {}
+        self.remote_inputs = {}
+        self.remote_confirmed = 0
+        self.peer_ack = 0
+        # snapshots by tick, taken after the tick is run
+        self.states = {}
+        self.checksums = collections.OrderedDict()
+        self.checked = 0
+        self.rollbacks = 0
+        self.resimulated = 0
+        self.max_depth = 0
+        self.stalls = 0
+        self.held = INPUT_NONE
+        self.rollback_times = collections.deque(maxlen=1000)
+
+    def attach(self, sim):
+
+        # sim must have the same seed and tick rate on both peers
+        self.sim = sim
+        self.states[sim.frame] = sim.snapshot()
+        self.remote_confirmed = self.peer_ack = self.checked = sim.frame
+
+    def latestLocal(self):
+
+        # the last tick this peer has decided its input for. The
+        # input for the next tick run is decided as it is run
+        return self.sim.frame + self.input_delay
+
+    def send(self):
+
+        # every input the peer hasn't acknowledged yet
+        first = self.peer_ack + 1
+        last = min(self.latestLocal(), first + MAX_SENT_INPUTS - 1)
+        inputs = bytes(self.local_inputs.get(tick, INPUT_NONE) for tick in range(first, last + 1))
+        self.transport.send(INPUTS_HEADER.pack(self.remote_confirmed, first, len(inputs)) + inputs)
+
+    def receive(self):
+
+        # take in the peer's inputs, returns the first tick already
+        # run that was guessed wrong or None
+        wrong = None
+        for data in self.transport.receive():
+            ack, first, count = INPUTS_HEADER.unpack_from(data)
+            self.peer_ack = max(self.peer_ack, ack)
+            if first > self.remote_confirmed + 1:
+                # a gap, wait for the packet that fills it
+                continue
+            inputs = data[INPUTS_HEADER.size:INPUTS_HEADER.size + count]
+            for tick in range(self.remote_confirmed + 1, first + count):
+                bits = inputs[tick - first]
+                self.remote_inputs[tick] = bits
+                if bits != INPUT_NONE and tick <= self.sim.frame and wrong is None:
+                    wrong = tick
+            self.remote_confirmed = max(self.remote_confirmed, first + count - 1)
+        return wrong
+
+    def inputsFor(self, tick):
+
+        # (left, right) inputs for a tick, guessing the peer's
+        local = self.local_inputs.get(tick, INPUT_NONE)
+        remote = self.remote_inputs.get(tick, INPUT_NONE)
+        if self.side == SIDE_LEFT:
+            return splitInputs(SIDE_LEFT, local, remote)
+        return splitInputs(SIDE_LEFT, remote, local)
+
+    def simulate(self):
+
+        # run the next tick and remember how it came out
+        sim = self.sim
+        events = sim.step(*self.inputsFor(sim.frame + 1))
+        self.states[sim.frame] = sim.snapshot()
+        return events
+
+    def rollback(self, tick):
+
+        # run everything from tick on again with the inputs now known
+        start = time.perf_counter()
+        sim = self.sim
+        current = sim.frame
+        sim.restore(self.states[tick - 1])
+        while sim.frame < current:
+            self.simulate()
+        depth = current - tick + 1
+        self.rollbacks += 1
+        self.resimulated += depth
+        self.max_depth = max(self.max_depth, depth)
+        self.rollback_times.append(time.perf_counter() - start)
+
+    def confirm(self):
+
+        # checksum every tick both peers now have all the inputs for,
+        # and forget snapshots that can never be rolled back to
+        confirmed = min(self.remote_confirmed, self.sim.frame)
+        for tick in range(self.checked + 1, confirmed + 1):
+            self.checksums[tick] = zlib.crc32(self.states[tick])
+            if len(self.checksums) > SYNC_HISTORY:
+                self.checksums.popitem(last=False)
+        for tick in range(self.checked, confirmed):
+            self.states.pop(tick, None)
+            self.remote_inputs.pop(tick, None)
+        self.checked = max(self.checked, confirmed)
+        # local inputs are kept until the peer says it has them and
+        # they can't be needed to roll back
+        done = min(self.peer_ack, self.checked)
+        for tick in [tick for tick in self.local_inputs if tick <= done]:
+            del self.local_inputs[tick]
+
+    def step(self, inputs=INPUT_NONE):
+
+        # one tick, returns its events. Nothing happens (and no events
+        # come back) while waiting for the peer to catch up
+        wrong = self.receive()
+        if wrong is not None:
+            self.rollback(wrong)
+        self.confirm()
+
+        events = []
+        # keys pressed while waiting are used on the next tick that runs
+        self.held |= inputs
+        if self.sim.frame + 1 - self.remote_confirmed > self.max_rollback:
+            self.stalls += 1
+        else:
+            self.local_inputs[self.latestLocal() + 1] = self.held
+            self.held = INPUT_NONE
+            events = self.simulate()
+
+        self.send()
+        return events
+
+    def stats(self):
+
+        times = list(self.rollback_times)
+        return {'side': self.side,
+                'frame': self.sim.frame,
+                'rollbacks': self.rollbacks,
+                'resimulated_ticks': self.resimulated,
+                'max_rollback_depth': self.max_depth,
+                'stalls': self.stalls,
+                'rollback_ms_p50': 1000 * percentile(times, 50),
+                'rollback_ms_max': 1000 * max(times) if times else 0.0}
+
+    def close(self):
+
+        self.transport.close()
+
+
+#=======================================================================
+# UdpTransport class
+#=======================================================================
+
+class UdpTransport():
+
+    def __init__(self, port, peer):
+
+        self.peer = peer
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('0.0.0.0', port))
+        self.socket.setblocking(False)
+
+    def send(self, data):
+
+        try:
+            self.socket.sendto(data, self.peer)
+        except ConnectionError:
+            pass
+
+    def receive(self):
+
+        packets = []
+        while True:
+            try:
+                data, address = self.socket.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                return packets
+            except ConnectionError:
+                # the peer isn't listening yet
+                continue
+            packets.append(data)
+
+    def close(self):
+
+        self.socket.close()
+
+
+#=======================================================================
+# LossyLink class
+# a pretend network between two peers in the same process
+#=======================================================================
+
+class LossyLink():
+
+    def __init__(self, latency=0, jitter=0, loss=0.0, seed=None):
+
+        # latency and jitter are in ticks, loss is the chance
+        # each packet is dropped
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.now = 0
+        self.order = 0
+        self.queues = ([], [])
+        self.sent = 0
+        self.dropped = 0
+        self.bytes = 0
+
+    def tick(self):
+
+        self.now += 1
+
+    def post(self, to, data):
+
+        self.sent += 1
+        self.bytes += len(data)
+        if self.random.random() < self.loss:
+            self.dropped += 1
+            return
+        arrives = self.now + self.latency + self.random.randint(0, self.jitter)
+        # jitter lets packets overtake each other, just like udp
+        heapq.heappush(self.queues[to], (arrives, self.order, data))
+        self.order += 1
+
+    def collect(self, to):
+
+        queue = self.queues[to]
+        packets = []
+        while queue and queue[0][0] <= self.now:
+            packets.append(heapq.heappop(queue)[2])
+        return packets
+
+    def endpoint(self, side):
+
+        return LinkEndpoint(self, side)
+
+
+class LinkEndpoint():
+
+    def __init__(self, link, side):
+
+        self.link = link
+        self.side = side
+
+    def send(self, data):
+
+        self.link.post(1 - self.side, data)
+
+    def receive(self):
+
+        return self.link.collect(self.side)
+
+    def close(self):
+
+        pass
+
+
+def runTest(ticks, latency, jitter, loss, input_delay, max_rollback, seed=1):
+
+    # two bots playing over a LossyLink. Returns the stats of both
+    # peers and the number of confirmed ticks that were checked
+    link = LossyLink(latency, jitter, loss, seed)
+    peers = []
+    for side in (SIDE_LEFT, SIDE_RIGHT):
+        session = RollbackSession(link.endpoint(side), side, input_delay, max_rollback)
+        session.attach(Simulation(seed, BASE_TICK_RATE, BACKEND_FAST))
+        peers.append(session)
+
+    generators = [random.Random(seed + 1), random.Random(seed + 2)]
+    compared = 0
+    for i in range(ticks):
+        for session, generator in zip(peers, generators):
+            session.step(botInputs(generator, session.sim))
+        link.tick()
+
+        # every confirmed tick both peers have a checksum for must match
+        left, right = peers[0].checksums, peers[1].checksums
+        for tick in list(left):
+            if tick in right:
+                if left[tick] != right[tick]:
+                    raise AssertionError('the peers disagree about tick {}'.format(tick))
+                compared += 1
+                del left[tick]
+                del right[tick]
+
+    return peers, link, compared
+
+def main():
+
+    parser = argparse.ArgumentParser(description='rollback netcode for two player pong')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    test = commands.add_parser('test', help='play two bots over a pretend lossy network and check they agree')
+    test.add_argument('--seconds', type=float, default=60, help='match time to play (default %(default)s)')
+    test.add_argument('--latency-ms', type=float, default=80, help='one way delay (default %(default)s)')
+    test.add_argument('--jitter-ms', type=float, default=20, help='extra random delay (default %(default)s)')
+    test.add_argument('--loss', type=float, default=0.05, help='chance a packet is lost (default %(default)s)')
+    test.add_argument('--input-delay', type=int, default=DEFAULT_INPUT_DELAY,
+                      help='ticks before a key press is used (default %(default)s)')
+    test.add_argument('--max-rollback', type=int, default=DEFAULT_MAX_ROLLBACK,
+                      help='most ticks a peer runs ahead of its peer (default %(default)s)')
+    test.add_argument('--seed', type=int, default=1, help='seed for the match and the link (default %(default)s)')
+    args = parser.parse_args()
+
+    ticks_per_ms = BASE_TICK_RATE / 1000
+    start = time.perf_counter()
+    peers, link, compared = runTest(int(args.seconds * BASE_TICK_RATE), round(args.latency_ms * ticks_per_ms),
+                                    round(args.jitter_ms * ticks_per_ms), args.loss, args.input_delay,
+                                    args.max_rollback, args.seed)
+    elapsed = time.perf_counter() - start
+
+    for session in peers:
+        printStats('peer on side {}'.format(session.side), session.stats())
+    print('link: {} packets, {} dropped, {:.0f} bytes/s each way'.format(
+        link.sent, link.dropped, link.bytes / 2 / args.seconds))
+    print('{} confirmed ticks identical on both peers ({:.1f}s to run)'.format(compared, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,616 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  simulation.py
+#
+# the rules and physics of pong with no pygame dependency.
+#
+# create a Simulation and call step(inputs) once per tick, where inputs
+# is a bitmask of the INPUT_ constants below. Anything the front end
+# needs to react to (sounds, partical bursts) is reported in the events
+# list, which is refilled on every step as (event, x, y) tuples.
+#
+# this lets matches run headless, thousands of frames per second, and
+# pong.py just draws whatever state the simulation is in.
+#
+# snapshot() packs everything that changes during a match into a few
+# hundred bytes and restore() puts it back, so a match can be rewound or
+# branched off to try something else. A snapshot only makes sense to a
+# Simulation made with the same seed, tick rate and noise backend.
+
+import random
+import struct
+from noiseengine import NoiseEngine1D, BACKEND_AUTO
+from vector import Vector2
+from sweptcollision import sweepBox, sweepWalls, MAX_BOUNCES
+
+# ======================================================================
+# constants to help code readability
+# ======================================================================
+
+GAME_STATE_INTRO       = 0
+GAME_STATE_IN_PROGRESS = 1
+GAME_STATE_SCORED      = 2
+GAME_STATE_OVER        = 3
+SCREEN_WIDTH = 1200
+SCREEN_HEIGHT = 600
+ORIGINX = SCREEN_WIDTH // 2
+ORIGINY = SCREEN_HEIGHT // 2
+
+# input bits passed to step()
+INPUT_NONE  = 0
+INPUT_UP    = 1
+INPUT_DOWN  = 2
+INPUT_SERVE = 4
+
+# the two bats, the player's is on the left
+SIDE_LEFT  = 0
+SIDE_RIGHT = 1
+
+# events reported by step()
+EVENT_WALL_BOUNCE     = 0
+EVENT_PLAYER_HIT      = 1
+EVENT_OPPONENT_HIT    = 2
+EVENT_PLAYER_SCORED   = 3
+EVENT_OPPONENT_SCORED = 4
+EVENT_SERVE           = 5
+
+WINNING_SCORE = 5
+SCORED_PAUSE_FRAMES = 180
+
+# all speeds and accelerations are in pixels per frame at this rate.
+# a Simulation running at any other tick rate scales them by dt
+BASE_TICK_RATE = 60
+
+# ball position, previous position, velocity and acceleration, the
+# y position, previous y, velocity and acceleration of each bat, wind,
+# random state, noise position, frame, scored pause, scores, gamestate
+# and who serves
+SNAPSHOT_FORMAT = struct.Struct('<18dQqIIBBBB')
+
+# where the frame number is in a snapshot
+SNAPSHOT_FRAME = 20
+
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+#=======================================================================
+# some utility functions
+#=======================================================================
+
+def maprange( a, b, val):
+    # map val from range a to range b
+    (a1, a2), (b1, b2) = a, b
+    return  b1 + ((val - a1) * (b2 - b1) / (a2 - a1))
+
+def clamp(n, minn, maxn):
+
+    if n < minn:
+        return minn
+    elif n > maxn:
+        return maxn
+    else:
+        return n
+
+def snapshotFrame(snapshot):
+
+    # the frame a snapshot was taken on, without restoring it
+    return SNAPSHOT_FORMAT.unpack(snapshot)[SNAPSHOT_FRAME]
+
+#=======================================================================
+# SplitMix64 class
+#=======================================================================
+
+class SplitMix64():
+
+    # a tiny random number generator whose whole state is one 64 bit
+    # number, so saving it costs 8 bytes rather than the 2.5k that
+    # random.Random needs
+
+    def __init__(self, seed=None):
+
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.state = seed & MASK64
+
+    def next(self):
+
+        # the next random 64 bit number
+        self.state = (self.state + 0x9E3779B97F4A7C15) & MASK64
+        z = self.state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+        return z ^ (z >> 31)
+
+    def randint(self, a, b):
+
+        # random integer in range a..b inclusive, like random.randint
+        return a + self.next() % (b - a + 1)
+
+    def getstate(self):
+
+        return self.state
+
+    def setstate(self, state):
+
+        self.state = state
+
+
+#=======================================================================
+# Player class
+#=======================================================================
+
+class Player():
+
+    def __init__(self, x, y, w, h, maxspeed):
+
+        self.width = w
+        self.height = h
+        self.maxspeedy = maxspeed
+        self.maxposition_y = SCREEN_HEIGHT - self.height
+        self.start_position = Vector2(x, y)
+        self.position = Vector2(self.start_position.x, self.start_position.y)
+        self.previous_position = Vector2(self.start_position.x, self.start_position.y)
+        self.velocity = Vector2(0,0)
+        self.acceleration = Vector2(0,0)
+        self.acceleration_step = 1.5
+
+    def reset(self):
+
+        self.position.set(self.start_position)
+        self.previous_position.set(self.position)
+        self.velocity.zero()
+        self.acceleration.zero()
+
+    def up(self, scale=1.0):
+
+        # acceleration is a kick to the velocity on the next update,
+        # scale it down for kicks that are applied every tick
+        self.acceleration.y -= self.acceleration_step * scale
+
+    def down(self, scale=1.0):
+
+        self.acceleration.y += self.acceleration_step * scale
+
+    def constrain(self):
+
+        # constrain movement to screen bounds
+        if self.position.y < 0:
+            self.position.y = 0
+            self.velocity.y = 0
+        elif self.position.y > self.maxposition_y:
+            self.position.y = self.maxposition_y
+            self.velocity.y = 0
+
+    def update(self, dt=1.0):
+
+        self.velocity.add(self.acceleration)
+
+        # limit the speed
+        self.velocity.y = clamp(self.velocity.y, -self.maxspeedy, self.maxspeedy)
+
+        # add velocity to position
+        self.position.addScaled(self.velocity, dt)
+        # clear out the accumulated acceleration
+        self.acceleration.zero()
+
+        self.constrain()
+
+
+#=======================================================================
+# Ball class
+#=======================================================================
+
+class Ball():
+
+    def __init__(self, size):
+
+        self.mass = 8
+        self.width = size
+        self.height = size
+        self.position = Vector2(SCREEN_WIDTH // 2 - self.width // 2, SCREEN_HEIGHT // 2 - self.height // 2)
+        self.previous_position = self.position.getCopy()
+        self.velocity = Vector2(-5,0)
+        self.acceleration = Vector2(0,0)
+
+    def reset(self, ballx, bally):
+
+        self.position.setFromValues(SCREEN_WIDTH // 2 - self.width // 2, SCREEN_HEIGHT // 2 - self.height // 2)
+        self.previous_position.set(self.position)
+        self.velocity.setFromValues(ballx, bally)
+
+    def applyForce(self, f):
+
+        # divide the force by our mass, without touching f itself
+        self.acceleration.addScaled(f, 1.0 / self.mass)
+
+    def update(self, dt=1.0):
+
+        # add acceleration to velocity. The ball's position is moved by
+        # Simulation.moveBall so that it bounces off things on the way
+        self.velocity.addScaled(self.acceleration, dt)
+
+        # important to clear out the accumulated acceleration each frame
+        self.acceleration.zero()
+
+
+#=======================================================================
+# Simulation class
+# Handles collisions and constraints and player movement
+#=======================================================================
+
+class Simulation():
+
+    def __init__(self, seed=None, tick_rate=BASE_TICK_RATE, noise_backend=BACKEND_AUTO):
+
+        # every random number the rules need comes from here so that
+        # a match can be repeated exactly from its seed
+        self.random = SplitMix64(seed)
+
+        # dt is the length of one tick measured in base frames
+        self.tick_rate = tick_rate
+        self.dt = BASE_TICK_RATE / tick_rate
+        self.scored_pause_ticks = round(SCORED_PAUSE_FRAMES / self.dt)
+
+        # player size and limits
+        playerwidth = 20
+        playerheight = 80
+        playerspeed = 3.0
+        opponentspeed = 2.8
+        ballsize = 8
+        player_edge_offset = 10
+
+        # ball limits
+        self.ball_max_speed_x = 8.0
+        self.ball_max_speed_y = 8.0
+        self.ball_speed_step = 1.2
+
+        self.playerserve = True # this toggles who serves
+
+        self.gamestate = GAME_STATE_INTRO
+        self.scored_frames_elapsed = 0
+        self.player_score = 0
+        self.opponent_score = 0
+        self.wind = Vector2(0,0)
+        self.wind_strength = 0.4
+        self.frame = 0
+        self.events = []
+
+        self.player      = Player(player_edge_offset, (SCREEN_HEIGHT // 2) - playerheight // 2, playerwidth, playerheight, playerspeed)
+        self.opponent    = Player(SCREEN_WIDTH - (player_edge_offset + playerwidth), (SCREEN_HEIGHT // 2) - playerheight // 2, playerwidth, playerheight, opponentspeed)
+        self.ball        = Ball(ballsize)
+        self.noiseengine = NoiseEngine1D(self.random.randint(1,100), noise_backend)
+
+    def emit(self, event, x, y):
+
+        self.events.append((event, x, y))
+
+    def bounceOffWall(self):
+
+        # the ball has just touched the top or bottom edge of the
+        # court, reverse the y velocity and sit it exactly on the edge
+        ball = self.ball
+
+        if ball.velocity.y < 0:
+            ball.position.y = 0
+        else:
+            ball.position.y = SCREEN_HEIGHT - ball.height
+        ball.velocity.y = -ball.velocity.y
+
+        self.emit(EVENT_WALL_BOUNCE, ball.position.x, ball.position.y)
+
+    def batMove(self, player):
+
+        # how far a bat has moved this tick
+        return player.position.y - player.previous_position.y
+
+    def sweepBat(self, player, dx, dy, elapsed, remaining):
+
+        # find when the ball moving by dx, dy over the remaining part
+        # of the tick first touches a bat. The bat is moving too, so
+        # the ball is swept by its motion relative to the bat.
+        # returns (t, axis) like sweepBox or None
+        ball = self.ball
+        bat_move = self.batMove(player)
+        bat_y = player.previous_position.y + bat_move * elapsed
+
+        contact = sweepBox(ball.position.x, ball.position.y, ball.width, ball.height,
+                           dx, dy - bat_move * remaining,
+                           player.position.x, bat_y, player.width, player.height)
+        if contact is None:
+            return None
+
+        if player is self.player:
+            towards = ball.velocity.x < 0
+        else:
+            towards = ball.velocity.x > 0
+
+        t, axis = contact
+        if t < 0:
+            # already overlapping, count it as a hit on the face of the
+            # bat if the ball is heading into it
+            if towards:
+                return 0.0, 0
+            return None
+        return t, axis
+
+    def bounceOffBat(self, player, axis, elapsed):
+
+        # the ball has just touched a bat elapsed of the way through
+        # the tick
+        ball = self.ball
+        bat_y = player.previous_position.y + self.batMove(player) * elapsed
+
+        if axis == 1:
+            # glanced off the top or bottom end of the bat
+            if ball.position.y < bat_y:
+                ball.position.y = bat_y - ball.height
+            else:
+                ball.position.y = bat_y + player.height
+            ball.velocity.y = -ball.velocity.y
+            return
+
+        # work out where on the bat the ball hit here
+        ball.velocity.y = self.reflectAngle(player, bat_y)
+        ball.velocity.x = -ball.velocity.x
+
+        # and sit the ball exactly against the face of the bat
+        if player is self.player:
+            ball.position.x = player.position.x + player.width
+            self.batHit()
+            self.emit(EVENT_PLAYER_HIT, ball.position.x, ball.position.y)
+        else:
+            ball.position.x = player.position.x - ball.width
+            self.batHit()
+            self.emit(EVENT_OPPONENT_HIT, ball.position.x, ball.position.y)
+
+    def moveBall(self):
+
+        # move the ball for one tick. Each time round the loop finds
+        # the first thing the ball touches before the end of the tick,
+        # moves it there, bounces it and carries on with whatever part
+        # of the tick is left
+        ball = self.ball
+        remaining = 1.0
+
+        for bounce in range(MAX_BOUNCES):
+
+            dx = ball.velocity.x * self.dt * remaining
+            dy = ball.velocity.y * self.dt * remaining
+            elapsed = 1.0 - remaining
+
+            first = sweepWalls(ball.position.y, ball.height, dy, 0, SCREEN_HEIGHT)
+            hit = None
+            axis = 1
+
+            for player in (self.player, self.opponent):
+                contact = self.sweepBat(player, dx, dy, elapsed, remaining)
+                if contact is not None and (first is None or contact[0] < first):
+                    first, axis = contact
+                    hit = player
+
+            if first is None:
+                ball.position.addValues(dx, dy)
+                return
+
+            ball.position.addValues(dx * first, dy * first)
+            remaining *= 1.0 - first
+
+            if hit is None:
+                self.bounceOffWall()
+            else:
+                self.bounceOffBat(hit, axis, 1.0 - remaining)
+
+    def batHit(self):
+
+        # called when the ball has hit either bat
+        self.setWind()
+
+        # increase the ball x velocity each hit
+        # but keep it limited to x max speed
+        if self.ball.velocity.x < self.ball_max_speed_x:
+            self.ball.velocity.x *= self.ball_speed_step
+        else:
+            self.ball.velocity.x = self.ball_max_speed_x
+
+        # reflectangle has already been applied so just
+        # keep vel y within bounds
+        if self.ball.velocity.y > self.ball_max_speed_y:
+            self.ball.velocity.y = self.ball_max_speed_y
+
+    def setWind(self):
+
+        # gets a random direction and strength for the wind effect
+        # the effect is mostly on the balls vertical movement
+        # called when the ball hits a bat
+        self.wind.x = self.noiseengine.next(100) * (self.wind_strength / 4)
+        self.wind.y = self.noiseengine.next() * self.wind_strength
+
+    def reflectAngle(self, player, bat_y=None):
+
+        # returns an y velocity to reflect the ball at.
+        # subtract paddle y pos from ball y pos to get the position that
+        # the ball is on the paddle
+        # then / by player height to get a normalised 0 to 1.0 value
+        # then add -0.5 to shift the range from -0.5 to 0.5 which
+        # can then be multiplied to produce a y velocity for the ball
+        # bat_y is where the bat was when the ball touched it
+
+        if bat_y is None:
+            bat_y = player.position.y
+        return (((self.ball.position.y - bat_y) / player.height) + -0.5) * 8
+
+    def moveOpponent(self):
+
+        # the built in opponent just chases the ball, a smarter one
+        # is policies.PredictPolicy
+
+        if self.opponent.position.y < self.ball.position.y - self.opponent.height // 2:
+            self.opponent.down(self.dt)
+        elif self.opponent.position.y > self.ball.position.y - self.opponent.height // 2:
+            self.opponent.up(self.dt)
+
+    def checkBallInScorePosition(self):
+
+        # if true score and reset game
+
+        if self.ball.position.x < 0:
+            self.opponent_score += 1
+            self.emit(EVENT_OPPONENT_SCORED, self.ball.position.x, self.ball.position.y)
+            self.gamestate = GAME_STATE_SCORED
+        elif self.ball.position.x > SCREEN_WIDTH:
+            self.player_score += 1
+            self.emit(EVENT_PLAYER_SCORED, self.ball.position.x, self.ball.position.y)
+            self.gamestate = GAME_STATE_SCORED
+
+    def resetFromScore(self):
+
+        # called after a score has been made
+        # reset the player positions and
+        # zero the wind effect and
+        # toggle the server
+
+        self.playerserve = not self.playerserve
+        self.resetPositions()
+
+        # check if either player has won the game
+        # and switch the gamestate to gameover if it has
+
+        if self.player_score == WINNING_SCORE or self.opponent_score == WINNING_SCORE:
+            self.gamestate = GAME_STATE_OVER
+        else:
+            self.gamestate = GAME_STATE_IN_PROGRESS
+
+    def resetFromWin(self):
+
+        # called after a game win
+        # resets score and positions etc
+        self.player_score = 0
+        self.opponent_score = 0
+        self.resetPositions()
+
+    def resetPositions(self):
+
+        # called at each serve
+        bally = self.random.randint(-1,1)
+        ballx = 4
+
+        if self.playerserve:
+            ballx = -ballx
+
+        self.ball.reset(ballx, bally)
+        self.player.reset()
+        self.opponent.reset()
+        self.wind.zero()
+        self.emit(EVENT_SERVE, ORIGINX, ORIGINY)
+
+    def switchGameState(self):
+
+        if self.gamestate == GAME_STATE_INTRO:
+
+            self.gamestate = GAME_STATE_IN_PROGRESS
+            self.resetPositions()
+
+        elif self.gamestate == GAME_STATE_OVER:
+
+            self.resetFromWin()
+            self.gamestate = GAME_STATE_INTRO
+
+    def isOver(self):
+
+        return self.gamestate == GAME_STATE_OVER
+
+    def snapshot(self):
+
+        # the whole state of the match as bytes
+        ball = self.ball
+        player = self.player
+        opponent = self.opponent
+        return SNAPSHOT_FORMAT.pack(
+            ball.position.x, ball.position.y,
+            ball.previous_position.x, ball.previous_position.y,
+            ball.velocity.x, ball.velocity.y,
+            ball.acceleration.x, ball.acceleration.y,
+            player.position.y, player.previous_position.y,
+            player.velocity.y, player.acceleration.y,
+            opponent.position.y, opponent.previous_position.y,
+            opponent.velocity.y, opponent.acceleration.y,
+            self.wind.x, self.wind.y,
+            self.random.getstate(), self.noiseengine.x, self.frame,
+            self.scored_frames_elapsed, self.player_score,
+            self.opponent_score, self.gamestate, self.playerserve)
+
+    def restore(self, snapshot):
+
+        # go back to the state snapshot() returned
+        ball = self.ball
+        player = self.player
+        opponent = self.opponent
+        (ball.position.x, ball.position.y,
+         ball.previous_position.x, ball.previous_position.y,
+         ball.velocity.x, ball.velocity.y,
+         ball.acceleration.x, ball.acceleration.y,
+         player.position.y, player.previous_position.y,
+         player.velocity.y, player.acceleration.y,
+         opponent.position.y, opponent.previous_position.y,
+         opponent.velocity.y, opponent.acceleration.y,
+         self.wind.x, self.wind.y,
+         random_state, self.noiseengine.x, self.frame,
+         self.scored_frames_elapsed, self.player_score,
+         self.opponent_score, self.gamestate, playerserve) = SNAPSHOT_FORMAT.unpack(snapshot)
+
+        self.random.setstate(random_state)
+        self.playerserve = bool(playerserve)
+        self.events = []
+
+    def step(self, inputs=INPUT_NONE, opponent_inputs=None, opponent_held=True):
+
+        # advance the simulation by one tick. opponent_inputs replaces
+        # the built in opponent with up/down bits, like inputs. They
+        # are taken as held down every tick, as a policy gives them, so
+        # they are scaled by dt like the built in opponent's and move
+        # the bat as fast at any tick rate. opponent_held False takes
+        # them as key presses, which act once like inputs
+        self.events = []
+        self.frame += 1
+
+        # remember where everything was so the front end can draw
+        # in between ticks
+        self.ball.previous_position.set(self.ball.position)
+        self.player.previous_position.set(self.player.position)
+        self.opponent.previous_position.set(self.opponent.position)
+
+        if inputs & INPUT_SERVE:
+            self.switchGameState()
+        if inputs & INPUT_UP:
+            self.player.up()
+        if inputs & INPUT_DOWN:
+            self.player.down()
+
+        if self.gamestate == GAME_STATE_IN_PROGRESS:
+
+            # the bats move first so that the ball can be swept
+            # against where they go during the tick
+            if opponent_inputs is None:
+                self.moveOpponent()
+            else:
+                scale = self.dt if opponent_held else 1.0
+                if opponent_inputs & INPUT_UP:
+                    self.opponent.up(scale)
+                if opponent_inputs & INPUT_DOWN:
+                    self.opponent.down(scale)
+            self.player.update(self.dt)
+            self.opponent.update(self.dt)
+            self.ball.applyForce(self.wind)
+            self.ball.update(self.dt)
+            self.moveBall()
+            self.checkBallInScorePosition()
+
+        elif self.gamestate == GAME_STATE_SCORED:
+
+            self.scored_frames_elapsed += 1
+
+            if self.scored_frames_elapsed > self.scored_pause_ticks:
+                self.scored_frames_elapsed = 0
+                self.resetFromScore()
+
+        return self.events
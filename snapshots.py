@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  snapshots.py
+#
+# a fixed size ring of the most recent snapshots, for rewinding.
+#
+# push a snapshot after every tick and rewind(ticks) goes back that many.
+# once the ring is full the oldest snapshot is overwritten, so it holds
+# the last capacity ticks. Snapshots can be anything, Simulation.snapshot
+# bytes or the bigger tuples from Game.snapshot.
+
+#=======================================================================
+# SnapshotRing class
+#=======================================================================
+
+class SnapshotRing():
+
+    def __init__(self, capacity):
+
+        self.capacity = capacity
+        self.snapshots = [None] * capacity
+        self.head = 0
+        self.count = 0
+
+    def clear(self):
+
+        self.head = 0
+        self.count = 0
+
+    def push(self, snapshot):
+
+        # overwrite the oldest snapshot once the ring is full
+        self.snapshots[self.head] = snapshot
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest(self):
+
+        if self.count == 0:
+            return None
+        return self.snapshots[self.head - 1]
+
+    def rewind(self, ticks):
+
+        # throw away the newest ticks snapshots and return the newest
+        # one left, which becomes the latest. The oldest snapshot is
+        # always kept so rewinding too far stops there
+        if self.count == 0:
+            return None
+        ticks = min(ticks, self.count - 1)
+        for i in range(ticks):
+            self.head = (self.head - 1) % self.capacity
+            self.snapshots[self.head] = None
+        self.count -= ticks
+        return self.latest()
+
+    def __len__(self):
+
+        return self.count
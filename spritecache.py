@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  spritecache.py
+#
+# a cache of small filled squares used for stars, particals and the
+# ball trail.
+#
+# creating a pygame.Surface for every star or partical is slow and makes
+# frames stutter when a big burst spawns, so every square is made once,
+# keyed by (size, colour, alpha level), and shared by everything that
+# draws it. Alpha is quantised to steps of alpha_step so that there is a
+# fixed, small number of faded copies of each square.
+#
+# call build() at startup with everything the game will need. get() will
+# still make any missing square on demand.
+
+import pygame
+
+class SpriteCache():
+
+    def __init__(self, alpha_step=8):
+
+        self.alpha_step = alpha_step
+        self.levels = 256 // alpha_step
+        self.top = self.levels - 1
+        self.sprites = {}
+
+    def level(self, alpha):
+
+        # the quantised alpha level for an alpha value of 0..255,
+        # 255 always lands on the top (opaque) level
+        return int(alpha) * self.top // 255
+
+    def alpha(self, level):
+
+        return level * 255 // self.top
+
+    def make(self, size, colour, level):
+
+        image = pygame.Surface([size, size])
+        image.fill(colour)
+        alpha = self.alpha(level)
+        if alpha < 255:
+            image.set_alpha(alpha)
+        return image
+
+    def getLevel(self, size, colour, level):
+
+        key = (size, tuple(colour), level)
+        image = self.sprites.get(key)
+        if image is None:
+            image = self.make(size, colour, level)
+            self.sprites[key] = image
+        return image
+
+    def get(self, size, colour, alpha=255):
+
+        return self.getLevel(size, colour, self.level(alpha))
+
+    def build(self, sizes, colours, faded=False):
+
+        # make every size and colour up front, and every alpha
+        # level of them too if faded is set
+        levels = range(self.levels) if faded else [self.top]
+        for size in sizes:
+            for colour in colours:
+                for level in levels:
+                    self.getLevel(size, colour, level)
+
+    def table(self, sizes, colours):
+
+        # returns a nested list of faded squares indexed by
+        # [colour index][size][level] for fast lookups in draw loops.
+        # sizes not in sizes are left as None
+        table = []
+        for colour in colours:
+            bysize = [None] * (max(sizes) + 1)
+            for size in sizes:
+                bysize[size] = [self.getLevel(size, colour, level) for level in range(self.levels)]
+            table.append(bysize)
+        return table
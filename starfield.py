@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  starfield.py
+#
+# NOTE!:
+# pip3 install numpy
+#
+# the falling star background.
+#
+# every star is a row in a few numpy arrays (position, velocity, size
+# and layer) so that thousands of them update in a handful of array
+# operations and draw with a single Surface.blits call.
+#
+# stars are split over one or more parallax layers. Layer 0 is the
+# furthest away, its stars fall slowest and are drawn smallest and
+# dimmest. With one layer it looks just like the original star field.
+
+import numpy as np
+from vector import Vector2Array
+
+STAR_GRAVITY = 0.05
+STAR_MIN_SPEED = 1
+STAR_SPEED_RANGE = 10
+STAR_MAX_SIZE = 4
+
+#=======================================================================
+# StarField class
+#=======================================================================
+
+class StarField():
+
+    def __init__(self, width, height, max_stars=40, layers=1, seed=None):
+
+        self.width = width
+        self.height = height
+        self.max_stars = max_stars
+        self.layers = layers
+        self.random = np.random.default_rng(seed)
+
+        n = max_stars
+        # spread the stars evenly over the layers
+        self.layer = np.arange(n) % layers
+        self.speed_scale = self.layerScale()[self.layer]
+        self.largest = np.maximum(1, np.round(STAR_MAX_SIZE * self.speed_scale)).astype(np.int32)
+
+        self.position = Vector2Array(n)
+        self.position.setFromValues(self.random.integers(0, width + 1, n),
+                                    self.random.integers(0, height + 1, n))
+        self.velocity = Vector2Array(n)
+        self.velocity.y = self.startSpeed(n, self.speed_scale)
+        self.size = self.random.integers(1, self.largest + 1).astype(np.int32)
+
+    def layerScale(self):
+
+        # how fast and big each layer is compared to the nearest one
+        return (np.arange(self.layers) + 1) / self.layers
+
+    def layerColour(self, colour, layer):
+
+        # the colour of stars in a layer, further layers are dimmer
+        shade = 0.4 + 0.6 * (layer + 1) / self.layers
+        return [int(c * shade) for c in colour]
+
+    def startSpeed(self, count, scale):
+
+        return (STAR_MIN_SPEED + self.random.random(count) * STAR_SPEED_RANGE) * scale
+
+    def update(self):
+
+        # add a little to vel each frame to make it look a bit
+        # like gravity is pulling it down like rain
+        self.velocity.y += STAR_GRAVITY * self.speed_scale
+        self.position.add(self.velocity)
+
+        # stars that have fallen off the bottom start again at the
+        # top with a new speed
+        fallen = np.flatnonzero(self.position.y > self.height)
+        if len(fallen):
+            count = len(fallen)
+            self.position.data[fallen, 0] = self.random.integers(0, self.width + 1, count)
+            self.position.data[fallen, 1] = 0
+            self.velocity.data[fallen, 1] = self.startSpeed(count, self.speed_scale[fallen])
+
+    def draw(self, surface, images):
+
+        # images[layer][size] is the square to draw each star with.
+        # returns the rects drawn to
+        positions = np.round(self.position.data).astype(np.int32).tolist()
+        return surface.blits([(images[layer][size], position) for layer, size, position in
+                              zip(self.layer.tolist(), self.size.tolist(), positions)])
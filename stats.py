@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  stats.py
+#
+# small helpers for the timings that netplay.py, rollback.py and the
+# policies report, kept on their own so a policy can use them without
+# importing the network code.
+
+def percentile(values, p):
+
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
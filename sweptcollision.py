@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  sweptcollision.py
+#
+# continuous (swept) collision tests for axis aligned boxes.
+#
+# rather than moving the ball and then checking if it overlaps a bat,
+# these work out the exact fraction of a move at which the ball first
+# touches something. The ball can then be moved to that point, bounced,
+# and moved on for the rest of the tick, however fast it is going, so
+# it can never tunnel through a bat or a wall.
+#
+# all times are fractions 0..1 of the move (dx, dy).
+
+INFINITY = float('inf')
+
+# the most bounces worked out for the ball in one tick
+MAX_BOUNCES = 4
+
+def sweepAxis(a, asize, d, b, bsize):
+
+    # entry and exit times along one axis of a span a..a+asize moving
+    # by d against a still span b..b+bsize
+    if d > 0:
+        return (b - (a + asize)) / d, (b + bsize - a) / d
+    elif d < 0:
+        return (b + bsize - a) / d, (b - (a + asize)) / d
+    elif a + asize <= b or a >= b + bsize:
+        # not moving on this axis and not lined up, so never touches
+        return INFINITY, -INFINITY
+    else:
+        return -INFINITY, INFINITY
+
+def sweepBox(x, y, w, h, dx, dy, bx, by, bw, bh):
+
+    # sweep box x, y, w, h by dx, dy against the still box bx, by, bw, bh
+    # returns (t, axis) where t is the time of first contact and axis
+    # is 0 if the boxes meet on their left/right faces or 1 for
+    # top/bottom faces. t is negative if the boxes already overlap.
+    # returns None if they do not touch during this move.
+
+    x_entry, x_exit = sweepAxis(x, w, dx, bx, bw)
+    y_entry, y_exit = sweepAxis(y, h, dy, by, bh)
+
+    entry = max(x_entry, y_entry)
+    exit = min(x_exit, y_exit)
+
+    if entry > exit or entry >= 1 or exit <= 0:
+        return None
+
+    if x_entry > y_entry:
+        return entry, 0
+    else:
+        return entry, 1
+
+def sweepWalls(y, h, dy, top, bottom):
+
+    # time that a box at y of height h moving by dy reaches the
+    # top or bottom wall, or None if it does not get there this move
+    if dy < 0:
+        t = (top - y) / dy
+    elif dy > 0:
+        t = (bottom - (y + h)) / dy
+    else:
+        return None
+
+    if t < 1:
+        return max(t, 0.0)
+    return None
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  test_pongenv.py
+#
+# checks BatchPongEnv plays a match just like PongEnv.
+# >python3 -m pytest test_pongenv.py
+
+import numpy as np
+from simulation import SplitMix64, INPUT_SERVE
+from batchsim import BatchSimulation
+from noiseengine import NoiseEngine1D, BACKEND_FAST
+from pongenv import PongEnv, BatchPongEnv, ACTION_INPUTS
+
+
+class MirroredRandom():
+
+    # gives BatchSimulation the same random numbers as a Simulation
+    # made with seed, in the same order
+
+    def __init__(self, generator):
+
+        self.generator = generator
+
+    def integers(self, low, high, size):
+
+        return np.array([self.generator.randint(low, high - 1) for i in range(size)])
+
+
+def mirroredEnvs(seed, frame_skip):
+
+    # a PongEnv and a one match BatchPongEnv that start from the same
+    # serve, with the same wind and random numbers after it
+    env = PongEnv(seed, frame_skip=frame_skip)
+    env.reset(seed=seed)
+
+    batch_env = BatchPongEnv(1, frame_skip=frame_skip)
+    generator = SplitMix64(seed)
+    batch = BatchSimulation(1, noise_backend=BACKEND_FAST)
+    batch.noiseengines[0] = NoiseEngine1D(generator.randint(1, 100), BACKEND_FAST)
+    batch.random = MirroredRandom(generator)
+    # what PongEnv.reset does, serve and play the first tick
+    batch.step(np.array([INPUT_SERVE]))
+    batch_env.batch = batch
+    return env, batch_env
+
+def testBatchMatchesScalarOverScoringSteps():
+
+    for seed in (1, 2, 3):
+        env, batch_env = mirroredEnvs(seed, frame_skip=4)
+        actions = np.random.default_rng(seed)
+        points = 0
+        for step in range(5000):
+            action = int(actions.integers(len(ACTION_INPUTS)))
+            observation, reward, terminated, truncated, info = env.step(action)
+            observations, rewards, batch_terminated, batch_truncated, info = batch_env.step(np.array([action]))
+
+            assert rewards[0] == reward, (seed, step)
+            assert batch_terminated[0] == terminated, (seed, step)
+            if terminated:
+                # the batch has already started its next match
+                break
+            assert np.allclose(observations[0], observation, atol=1e-5), (seed, step)
+            points += reward != 0
+        assert points > 0
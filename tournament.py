@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#  tournament.py
+#
+# plays computer policies against each other, headless, on every core.
+#
+# every ordered pair of the policies given plays matches matches, so
+# each policy gets the same number of games on both sides. Match i of
+# a pairing uses seed + i, which makes any match easy to play again.
+# matches are shared out over a pool of worker processes and each
+# result is sent back to be added to the totals as soon as it is done.
+#
+# >python3 tournament.py chase lazy random --matches 1000
+# >python3 tournament.py chase lazy --matches 10000 --results results.jsonl --json summary.json
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import time
+from simulation import (Simulation, BASE_TICK_RATE, INPUT_SERVE,
+                        GAME_STATE_INTRO, EVENT_PLAYER_HIT, EVENT_OPPONENT_HIT,
+                        EVENT_PLAYER_SCORED, EVENT_OPPONENT_SCORED, SIDE_LEFT,
+                        SIDE_RIGHT)
+from noiseengine import BACKEND_FAST
+from policies import makePolicy, POLICIES
+
+# the longest a match can go on for, in seconds of match time.
+# two good policies can rally forever
+DEFAULT_MAX_SECONDS = 600
+
+def playMatch(job):
+
+    # play one match and return what happened as a dict. job is
+    # (left policy, right policy, seed, max ticks, noise backend)
+    left_name, right_name, seed, max_ticks, noise_backend = job
+    sim = Simulation(seed, BASE_TICK_RATE, noise_backend)
+    left = makePolicy(left_name, seed)
+    right = makePolicy(right_name, seed + 1)
+    left.reset(sim, SIDE_LEFT)
+    right.reset(sim, SIDE_RIGHT)
+
+    rallies = []
+    rally = 0
+    hits = [0, 0]
+    winds = []
+
+    while not sim.isOver() and sim.frame < max_ticks:
+
+        inputs = left.act()
+        if sim.gamestate == GAME_STATE_INTRO:
+            inputs |= INPUT_SERVE
+
+        for event, x, y in sim.step(inputs, right.act()):
+            if event == EVENT_PLAYER_HIT or event == EVENT_OPPONENT_HIT:
+                hits[event == EVENT_OPPONENT_HIT] += 1
+                rally += 1
+                winds.append(math.hypot(sim.wind.x, sim.wind.y))
+            elif event == EVENT_PLAYER_SCORED or event == EVENT_OPPONENT_SCORED:
+                rallies.append(rally)
+                rally = 0
+
+    return {'left': left_name,
+            'right': right_name,
+            'seed': seed,
+            'score': [sim.player_score, sim.opponent_score],
+            'finished': sim.isOver(),
+            'ticks': sim.frame,
+            'rallies': rallies,
+            'hits': hits,
+            'wind_mean': sum(winds) / len(winds) if winds else 0.0,
+            'wind_max': max(winds) if winds else 0.0}
+
+#=======================================================================
+# TournamentStats class
+# adds up match results as they come in
+#=======================================================================
+
+class TournamentStats():
+
+    def __init__(self):
+
+        self.pairings = {}
+        self.policies = {}
+        self.matches = 0
+
+    def add(self, result):
+
+        self.matches += 1
+        key = '{} v {}'.format(result['left'], result['right'])
+        pairing = self.pairings.get(key)
+        if pairing is None:
+            pairing = self.pairings[key] = {'matches': 0, 'left_wins': 0, 'right_wins': 0, 'unfinished': 0,
+                                            'points': [0, 0], 'hits': [0, 0], 'rallies': 0,
+                                            'rally_hits': 0, 'longest_rally': 0, 'wind_total': 0.0,
+                                            'wind_max': 0.0, 'ticks': 0}
+        left_score, right_score = result['score']
+        pairing['matches'] += 1
+        pairing['ticks'] += result['ticks']
+        pairing['points'][0] += left_score
+        pairing['points'][1] += right_score
+        pairing['hits'][0] += result['hits'][0]
+        pairing['hits'][1] += result['hits'][1]
+        pairing['rallies'] += len(result['rallies'])
+        pairing['rally_hits'] += sum(result['rallies'])
+        pairing['longest_rally'] = max([pairing['longest_rally']] + result['rallies'])
+        pairing['wind_total'] += result['wind_mean']
+        pairing['wind_max'] = max(pairing['wind_max'], result['wind_max'])
+
+        winner = None
+        if not result['finished']:
+            pairing['unfinished'] += 1
+        elif left_score > right_score:
+            pairing['left_wins'] += 1
+            winner = result['left']
+        else:
+            pairing['right_wins'] += 1
+            winner = result['right']
+
+        for name in (result['left'], result['right']):
+            policy = self.policies.setdefault(name, {'matches': 0, 'wins': 0})
+            policy['matches'] += 1
+            policy['wins'] += name == winner
+
+    def summary(self):
+
+        pairings = {}
+        for key, pairing in self.pairings.items():
+            n = pairing['matches']
+            pairings[key] = {'matches': n,
+                             'left_wins': pairing['left_wins'],
+                             'right_wins': pairing['right_wins'],
+                             'unfinished': pairing['unfinished'],
+                             'mean_score': [pairing['points'][0] / n, pairing['points'][1] / n],
+                             'mean_hits': [pairing['hits'][0] / n, pairing['hits'][1] / n],
+                             'mean_rally': pairing['rally_hits'] / pairing['rallies'] if pairing['rallies'] else 0.0,
+                             'longest_rally': pairing['longest_rally'],
+                             'mean_wind': pairing['wind_total'] / n,
+                             'max_wind': pairing['wind_max'],
+                             'mean_match_seconds': pairing['ticks'] / n / BASE_TICK_RATE}
+        policies = {name: dict(policy, win_rate=policy['wins'] / policy['matches'])
+                    for name, policy in self.policies.items()}
+        return {'matches': self.matches, 'pairings': pairings, 'policies': policies}
+
+    def report(self):
+
+        summary = self.summary()
+        print('{:<20} {:>7} {:>6} {:>6} {:>6} {:>11} {:>6} {:>6} {:>6}'.format(
+            'pairing', 'matches', 'left', 'right', 'unfin', 'score', 'rally', 'max', 'wind'))
+        for key, pairing in sorted(summary['pairings'].items()):
+            print('{:<20} {:>7} {:>6} {:>6} {:>6} {:>5.2f}-{:<5.2f} {:>6.2f} {:>6} {:>6.3f}'.format(
+                key, pairing['matches'], pairing['left_wins'], pairing['right_wins'],
+                pairing['unfinished'], pairing['mean_score'][0], pairing['mean_score'][1],
+                pairing['mean_rally'], pairing['longest_rally'], pairing['mean_wind']))
+        print()
+        for name, policy in sorted(summary['policies'].items(), key=lambda item: -item[1]['win_rate']):
+            print('{:<20} won {:>6} of {:>6} ({:.1%})'.format(name, policy['wins'], policy['matches'],
+                                                             policy['win_rate']))
+
+
+def makeJobs(policies, matches, seed, max_ticks, noise_backend):
+
+    for left in policies:
+        for right in policies:
+            if left == right and len(policies) > 1:
+                continue
+            for i in range(matches):
+                yield (left, right, seed + i, max_ticks, noise_backend)
+
+def main():
+
+    parser = argparse.ArgumentParser(description='play computer policies against each other')
+    parser.add_argument('policies', nargs='+', choices=sorted(POLICIES),
+                        help='policies to play, every ordered pair plays')
+    parser.add_argument('--matches', type=int, default=100,
+                        help='matches for each pair of policies (default %(default)s)')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the first match (default %(default)s)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='worker processes (default one per core, %(default)s)')
+    parser.add_argument('--max-seconds', type=float, default=DEFAULT_MAX_SECONDS,
+                        help='match time before a match is stopped unfinished (default %(default)s)')
+    parser.add_argument('--chunk', type=int, default=8,
+                        help='matches sent to a worker at a time (default %(default)s)')
+    parser.add_argument('--results', metavar='FILE', help='write every match result to FILE as json lines')
+    parser.add_argument('--json', metavar='FILE', help='write the totals to FILE as json')
+    args = parser.parse_args()
+
+    jobs = makeJobs(args.policies, args.matches, args.seed,
+                    int(args.max_seconds * BASE_TICK_RATE), BACKEND_FAST)
+    stats = TournamentStats()
+    results = open(args.results, 'w') if args.results else None
+    start = time.perf_counter()
+
+    with multiprocessing.Pool(args.workers) as pool:
+        for result in pool.imap_unordered(playMatch, jobs, args.chunk):
+            stats.add(result)
+            if results is not None:
+                results.write(json.dumps(result) + '\n')
+
+    elapsed = time.perf_counter() - start
+    if results is not None:
+        results.close()
+
+    stats.report()
+    print('\n{} matches in {:.1f}s on {} workers ({:.0f} matches/s)'.format(
+        stats.matches, elapsed, args.workers, stats.matches / elapsed))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(stats.summary(), f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,62 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 #
+# Vector2 is a single 2D vector.
+#
+# Vector2Array (needs numpy) holds many vectors in one (n, 2) array and
+# has the same methods as Vector2, each working on every vector at
+# once. Indexing it with a number gives a Vector2View, a Vector2 that
+# reads and writes that row of the array in place, and slicing it gives
+# another Vector2Array sharing the same memory.
 import math
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 class Vector2(object):
     
+    # slots keep each vector small and attribute access quick.
+    # all the methods change the vector in place rather than making
+    # new ones, so the per frame code makes no garbage
+    __slots__ = ('x', 'y')
+    
     def __init__(self,x,y):
         
-        self.x = float(x)
-        self.y = float(y)
+        self.x = x
+        self.y = y
+        
+    def __repr__(self):
+        
+        return 'Vector2({}, {})'.format(self.x, self.y)
                 
     def add(self, v):
         
         self.x += v.x
         self.y += v.y
+        
+    def addValues(self, x, y):
+        
+        self.x += x
+        self.y += y
+        
+    def addScaled(self, v, s):
+        
+        # add v multiplied by s, without making a copy of v
+        self.x += v.x * s
+        self.y += v.y * s
     
     def sub(self, v):
         
         self.x -= v.x
         self.y -= v.y
         
+    def subValues(self, x, y):
+        
+        self.x -= x
+        self.y -= y
+        
     def mult(self, m):
         
         self.x *= m
@@ -27,8 +64,37 @@ class Vector2(object):
     
     def div(self, d):
         
-        self.x /= float(d)
-        self.y /= float(d)
+        self.x /= d
+        self.y /= d
+        
+    def zero(self):
+        
+        self.x = 0.0
+        self.y = 0.0
+        
+    def __iadd__(self, v):
+        
+        self.x += v.x
+        self.y += v.y
+        return self
+        
+    def __isub__(self, v):
+        
+        self.x -= v.x
+        self.y -= v.y
+        return self
+        
+    def __imul__(self, m):
+        
+        self.x *= m
+        self.y *= m
+        return self
+        
+    def __itruediv__(self, d):
+        
+        self.x /= d
+        self.y /= d
+        return self
         
     def mag(self):
         
@@ -55,8 +121,8 @@ class Vector2(object):
     def setFromValues(self, x, y):
         
         # set this vector to x y passed in
-        self.x = float(x)
-        self.y = float(y)
+        self.x = x
+        self.y = y
         
     def setFromAngle(self, angle_degrees):
         
@@ -133,7 +199,236 @@ class Vector2(object):
         # returns angle in degrees between this vector and other vector
         # below the line it goes 0-180, above -180-0
         return math.degrees(self.angleBetween(other))
+
+
+#=======================================================================
+# Vector2View class
+#=======================================================================
+
+class Vector2View(Vector2):
+    
+    # a Vector2 that is a row of a Vector2Array, so changing it
+    # changes the array
+    __slots__ = ('row',)
+    
+    def __init__(self, row):
         
+        self.row = row
+        
+    def getX(self):
+        
+        return float(self.row[0])
+        
+    def setX(self, x):
+        
+        self.row[0] = x
+        
+    def getY(self):
+        
+        return float(self.row[1])
+        
+    def setY(self, y):
+        
+        self.row[1] = y
+        
+    x = property(getX, setX)
+    y = property(getY, setY)
+    
+    def getCopy(self):
+        
+        return Vector2(self.x, self.y)
+
+
+#=======================================================================
+# Vector2Array class
+#=======================================================================
 
+def arrayValues(v):
     
+    # the numbers in v as something numpy can broadcast against an
+    # (n, 2) array, v can be a Vector2, a Vector2Array or an array
+    if isinstance(v, Vector2Array):
+        return v.data
+    if isinstance(v, Vector2):
+        return np.array([v.x, v.y])
+    return np.asarray(v, dtype=float)
+    
+def columnValues(m):
+    
+    # a scalar stays as it is, an array of one value per vector is
+    # turned into a column so it scales both x and y
+    if np.ndim(m) == 0:
+        return m
+    return np.asarray(m, dtype=float)[:, None]
 
+class Vector2Array(object):
+    
+    def __init__(self, count=0, data=None):
+        
+        if np is None:
+            raise ImportError('numpy not found. To install numpy: pip3 install numpy')
+        
+        if data is None:
+            self.data = np.zeros((count, 2))
+        else:
+            # no copy is made if data is already a float (n, 2) array
+            self.data = np.asarray(data, dtype=float).reshape(-1, 2)
+            
+    @classmethod
+    def fromVectors(cls, vectors):
+        
+        return cls(data=[(v.x, v.y) for v in vectors])
+        
+    def __len__(self):
+        
+        return len(self.data)
+        
+    def __getitem__(self, index):
+        
+        if isinstance(index, (int, np.integer)):
+            return Vector2View(self.data[index])
+        return Vector2Array(data=self.data[index])
+        
+    def __setitem__(self, index, v):
+        
+        self.data[index] = arrayValues(v)
+        
+    def __repr__(self):
+        
+        return 'Vector2Array({})'.format(self.data.tolist())
+        
+    def getX(self):
+        
+        return self.data[:, 0]
+        
+    def setX(self, x):
+        
+        self.data[:, 0] = x
+        
+    def getY(self):
+        
+        return self.data[:, 1]
+        
+    def setY(self, y):
+        
+        self.data[:, 1] = y
+        
+    x = property(getX, setX)
+    y = property(getY, setY)
+        
+    def add(self, v):
+        
+        self.data += arrayValues(v)
+        
+    def addValues(self, x, y):
+        
+        self.data[:, 0] += x
+        self.data[:, 1] += y
+        
+    def addScaled(self, v, s):
+        
+        self.data += arrayValues(v) * columnValues(s)
+        
+    def sub(self, v):
+        
+        self.data -= arrayValues(v)
+        
+    def subValues(self, x, y):
+        
+        self.data[:, 0] -= x
+        self.data[:, 1] -= y
+        
+    def mult(self, m):
+        
+        self.data *= columnValues(m)
+        
+    def div(self, d):
+        
+        self.data /= columnValues(d)
+        
+    def zero(self):
+        
+        self.data[:] = 0
+        
+    def mag(self):
+        
+        # the length of every vector
+        return np.hypot(self.data[:, 0], self.data[:, 1])
+        
+    def normalise(self):
+        
+        # vectors of length 0 are left alone
+        m = self.mag()
+        m[m == 0] = 1
+        self.data /= m[:, None]
+        
+    def getCopy(self):
+        
+        return Vector2Array(data=self.data.copy())
+        
+    def set(self, v):
+        
+        self.data[:] = arrayValues(v)
+        
+    def setFromValues(self, x, y):
+        
+        self.data[:, 0] = x
+        self.data[:, 1] = y
+        
+    def setFromAngle(self, angle_degrees):
+        
+        # set the vectors to angle_degrees (0..360), one angle for
+        # all of them or one each
+        radians = np.radians(angle_degrees)
+        self.data[:, 0] = np.cos(radians)
+        self.data[:, 1] = np.sin(radians)
+        
+    def rotate(self, angle_radians):
+        
+        # rotate the vectors by angle_radians, one angle for all
+        # of them or one each
+        cos = np.cos(angle_radians)
+        sin = np.sin(angle_radians)
+        x = self.data[:, 0] * cos - self.data[:, 1] * sin
+        y = self.data[:, 0] * sin + self.data[:, 1] * cos
+        self.data[:, 0] = x
+        self.data[:, 1] = y
+        
+    def rotate_degrees(self, angle_degrees):
+        
+        self.rotate(np.radians(angle_degrees))
+        
+    def headingRadians(self):
+        
+        # atan2 already gives 0 for vectors of length 0
+        return np.arctan2(self.data[:, 1], self.data[:, 0])
+        
+    def headingDeg180(self):
+        
+        return np.degrees(self.headingRadians())
+        
+    def headingDeg360(self):
+        
+        return self.headingDeg180() % 360
+        
+    def limit(self, minn, maxn):
+        
+        np.clip(self.data, minn, maxn, out=self.data)
+        
+    def dot(self, other):
+        
+        # dot product of each vector with other
+        o = arrayValues(other)
+        return self.data[:, 0] * o[..., 0] + self.data[:, 1] * o[..., 1]
+        
+    def angleBetween(self, other):
+        
+        # angle in radians between each vector and other
+        o = arrayValues(other)
+        cross = self.data[:, 0] * o[..., 1] - self.data[:, 1] * o[..., 0]
+        dot = self.data[:, 0] * o[..., 0] + self.data[:, 1] * o[..., 1]
+        return np.arctan2(cross, dot)
+        
+    def angleBetweenDegrees180(self, other):
+        
+        return np.degrees(self.angleBetween(other))